@@ -1 +1,179 @@
-# --- Build Version: v5.1.7 | generated 2025-10-03 21:38:21 ---\n\n# --- Unified sidebar user box ---\nimport streamlit as st\nif st.session_state.get("auth"):\n    with st.sidebar:\n        st.caption(f"Eingeloggt als: **{st.session_state['auth']['username']}**")\n        if st.button("Logout", key="logout_btn"):\n            st.session_state.pop("auth", None)\n            st.rerun()\n# --- Build Version: v5.1.6 | generated 2025-10-03 21:20:38 ---\nimport datetime as dt\nimport streamlit as st\nfrom core.db import init_db, SessionCtx, UserProfile, get_engine\nfrom core.i18n import t\n\n# DB initialisieren (Schema-Version an deine aktuelle anpassen, z.B. 3)\ninit_db(schema_version=8)\n\n# Seiten-Setup\nst.set_page_config(page_title=t("app_title"), page_icon="🏠", layout="wide")\n\n# Sidebar-Navigation verstecken, solange nicht eingeloggt\ndef _hide_nav_when_logged_out():\n    import streamlit as st\n    if not st.session_state.get("auth"):\n        st.markdown("""\n            <style>\n              [data-testid="stSidebarNav"] { display: none !important; }\n              [data-testid="stSidebar"] [data-testid="stSidebarNav"] ~ div { display: none !important; }\n            </style>\n        """, unsafe_allow_html=True)\n\n_hide_nav_when_logged_out()\n\n# ----------------------- SIMPLE LOGIN GATE -----------------------\nimport streamlit as st\nfrom core.db import ensure_admin_user, SessionCtx, User\nfrom core.auth import hash_password, verify_password\n\ntry:\n    ensure_admin_user("hannes", hash_password("hannes"), role="admin", email=None, full_name="hannes")\nexcept Exception:\n    pass\n\ndef _do_login(u, p):\n    with SessionCtx() as s:\n        user = s.query(User).filter(User.username == u, User.is_active == True).one_or_none()\n        if user and verify_password(p, user.password_hash):\n            st.session_state.auth = {"username": user.username, "name": user.full_name or user.username, "role": user.role}\n            return True\n    return False\n\ndef _do_register(u, mail, name, p1, p2):\n    if not u or not p1:\n        return "Bitte Benutzername und Passwort ausfüllen."\n    if p1 != p2:\n        return "Passwörter stimmen nicht überein."\n    with SessionCtx() as s:\n        exists = s.query(User).filter(User.username == u).one_or_none()\n        if exists:\n            return "Benutzername ist bereits vergeben."\n        s.add(User(username=u, email=mail or None, full_name=name or u, password_hash=hash_password(p1), role="viewer", is_active=True))\n        s.commit()\n    return None\n\nif not st.session_state.get("auth"):\n    st.subheader("Willkommen – bitte anmelden oder registrieren")\n    tab_login, tab_register = st.tabs(["Anmelden", "Registrieren"])\n    with tab_login:\n        with st.form("login_form", clear_on_submit=False):\n            col1, col2 = st.columns(2)\n            with col1:\n                u = st.text_input("Benutzername", value="", key="login_user")\n            with col2:\n                p = st.text_input("Passwort", type="password", value="", key="login_pass")\n            ok = st.form_submit_button("Anmelden")\n        if ok:\n            if _do_login(u.strip(), p):\n                st.success("Erfolgreich angemeldet.")\n                st.rerun()\n            else:\n                st.error("Benutzername oder Passwort falsch.")\n    with tab_register:\n        with st.form("register_form"):\n            u2 = st.text_input("Benutzername")\n            name2 = st.text_input("Vollständiger Name", value="")\n            mail2 = st.text_input("E-Mail (optional)", value="")\n            c1, c2 = st.columns(2)\n            with c1:\n                p1 = st.text_input("Passwort", type="password")\n            with c2:\n                p2 = st.text_input("Passwort wiederholen", type="password")\n            okr = st.form_submit_button("Registrieren")\n        if okr:\n            err = _do_register(u2.strip(), mail2.strip(), name2.strip(), p1, p2)\n            if err:\n                st.error(err)\n            else:\n                st.success("Registrierung erfolgreich – bitte jetzt anmelden.")\n    st.stop()\n\n        st.session_state.pop("auth", None)\n        st.rerun()\n# -----------------------------------------------------------------\n\n# ----------------------- SIMPLE LOGIN GATE -----------------------\nimport streamlit as st\nfrom core.db import ensure_admin_user, SessionCtx, User\nfrom core.auth import hash_password, verify_password\n\ntry:\n    ensure_admin_user("hannes", hash_password("hannes"), role="admin", email=None, full_name="hannes")\nexcept Exception:\n    pass\n\ndef _do_login(u, p):\n    with SessionCtx() as s:\n        user = s.query(User).filter(User.username == u, User.is_active == True).one_or_none()\n        if user and verify_password(p, user.password_hash):\n            st.session_state.auth = {"username": user.username, "name": user.full_name or user.username, "role": user.role}\n            return True\n    return False\n\nif not st.session_state.get("auth"):\n    st.subheader("Login")\n    with st.form("login_form", clear_on_submit=False):\n        col1, col2 = st.columns(2)\n        with col1:\n            u = st.text_input("Benutzername", value="", key="login_user")\n        with col2:\n            p = st.text_input("Passwort", type="password", value="", key="login_pass")\n        ok = st.form_submit_button("Anmelden")\n    if ok:\n        if _do_login(u.strip(), p):\n            st.success("Erfolgreich angemeldet.")\n            st.rerun()\n        else:\n            st.error("Benutzername oder Passwort falsch.")\n    st.stop()\n\n        st.session_state.pop("auth", None)\n        st.rerun()\n# -----------------------------------------------------------------\n\n# --- Hide Wohnung-Detail page entry robustly ---\nst.markdown(\n    """\n<style>\n/* Hide links that contain the slug anywhere */\nsection[data-testid="stSidebar"] a[href*="a_Wohnung_Detail"] { display:none !important; }\n/* Fallback for query-router */\nsection[data-testid="stSidebar"] a[href*="page=a%20Wohnung%20Detail"] { display:none !important; }\n</style>\n""",\n    unsafe_allow_html=True\n)\n\n\n# --- Hide Wohnung-Detail page entry from the sidebar navigation (robust for both routers) ---\nst.markdown(\n    """\n    <style>\n    /* Hide by path slug (new router with path segments) */\n    section[data-testid="stSidebar"] a[href$="/a_Wohnung_Detail"] { display:none !important; }\n    section[data-testid="stSidebar"] a[href$="a_Wohnung_Detail"] { display:none !important; }\n    /* Hide by query router (?page=...) as fallback */\n    section[data-testid="stSidebar"] a[href*="page=a%20Wohnung%20Detail"] { display:none !important; }\n    </style>\n    """,\n    unsafe_allow_html=True\n)\n\n\n# --- Hide detail subpage from sidebar navigation ---\nst.markdown(\n    """\n    <style>\n    /* Hide the Wohnung-Detail page link in the sidebar nav */\n    section[data-testid="stSidebar"] a[href*="03a_Wohnung_Detail"] { display: none !important; }\n    </style>\n    """,\n    unsafe_allow_html=True\n)\n\n\n# Sidebar-Kopf\nwith st.sidebar:\n    st.markdown("## 🏠 " + t("app_title"))\n    st.markdown("—")\n    st.caption(t("local_data_hint"))\n\n# --- Nutzerprofil-Tabelle sicherstellen (idempotent) ---\nUserProfile.__table__.create(bind=get_engine(), checkfirst=True)\n\n# --- Begrüßung: Tageszeit + Saison + Vorname ---\ndef _time_greeting(hour: int) -> str:\n    if 5 <= hour < 11:   return t("greet_morning")\n    if 11 <= hour < 17:  return t("greet_afternoon")\n    if 17 <= hour < 23:  return t("greet_evening")\n    return t("greet_night")\n\ndef _season(month: int) -> tuple[str, str]:\n    if month in (3, 4, 5):    return (t("spring"), "🌷")\n    if month in (6, 7, 8):    return (t("summer"), "☀️")\n    if month in (9, 10, 11):  return (t("autumn"), "🍂")\n    return (t("winter"), "❄️")\n\nnow = dt.datetime.now()\ngreet = _time_greeting(now.hour)\nseason_label, season_emoji = _season(now.month)\n\nwith SessionCtx() as s:\n    profile = s.query(UserProfile).limit(1).first()\nfirst_name = (profile.first_name or "").strip() if profile else ""\n\n# --- Startbildschirm (statt Dashboard) ---\nst.markdown(\n    f"### {greet}{', ' + first_name if first_name else ''}! {season_emoji} "\n    + t("season_greeting").format(season=season_label)\n)\n\nst.write("—")\nst.write("Wähle links eine Seite aus (Dashboard, Objekte, …).")\n
\ No newline at end of file
+# --- Build Version: v5.1.8 ---
+import datetime as dt
+import time
+import streamlit as st
+from core.auth import LoginThrottled, authenticate, bootstrap_admin, register, session_auth
+from core.db import init_db, SessionCtx, UserProfile
+from core.i18n import translator; t = translator()
+from core import sessions
+
+# Seiten-Setup
+st.set_page_config(page_title=t("app_title"), page_icon="🏠", layout="wide")
+
+
+# Einmal je Prozess: Schema migrieren, Admin-Zugang sicherstellen (bcrypt nur, wenn er fehlt),
+# abgelaufene Sitzungen aufräumen
+@st.cache_resource(show_spinner=False)
+def _startup() -> bool:
+    init_db()
+    try:
+        bootstrap_admin("hannes", "hannes", role="admin", email=None, full_name="hannes")
+    except Exception:
+        pass
+    sessions.sweep()
+    return True
+
+_startup()
+
+
+# Sidebar-Navigation verstecken, solange nicht eingeloggt
+def _hide_nav_when_logged_out():
+    if not st.session_state.get("auth"):
+        st.markdown("""
+            <style>
+              [data-testid="stSidebarNav"] { display: none !important; }
+              [data-testid="stSidebar"] [data-testid="stSidebarNav"] ~ div { display: none !important; }
+            </style>
+        """, unsafe_allow_html=True)
+
+
+# Cookie setzen/löschen erst im Lauf nach An-/Abmeldung (kein st.rerun() direkt danach,
+# sonst erreicht der Befehl den Browser nicht)
+def _flush_cookie():
+    pending = st.session_state.pop("cookie_pending", None)
+    if not pending:
+        return
+    import extra_streamlit_components as stx
+    cm = stx.CookieManager(key="cookie_manager")
+    if pending[0] == "set":
+        cm.set(sessions.SESSION_COOKIE, pending[1], key="cookie_set", expires_at=pending[2],
+               max_age=sessions.SESSION_DAYS * 86400)
+    else:   # überschreiben statt cm.delete(): das braucht das Cookie im (beim ersten Rendern leeren) Cache
+        cm.set(sessions.SESSION_COOKIE, "", key="cookie_delete", expires_at=dt.datetime(1970, 1, 1), max_age=0)
+
+logged_in = session_auth() is not None
+_hide_nav_when_logged_out()
+_flush_cookie()
+
+
+# ----------------------- LOGIN GATE -----------------------
+def _client_ip() -> str | None:
+    try:
+        ip = st.context.ip_address
+    except Exception:
+        return None
+    return ip if isinstance(ip, str) else None
+
+def _start_session(auth: dict) -> None:
+    issued = sessions.issue(auth["username"], ip=_client_ip(), user_agent=st.context.headers.get("User-Agent"))
+    st.session_state.update(auth=auth, auth_checked=time.monotonic())
+    if issued:
+        st.session_state.update(session_cookie=issued[0], cookie_pending=("set", *issued))
+
+def _logout() -> None:
+    sessions.revoke(st.session_state.get("session_cookie") or st.context.cookies.get(sessions.SESSION_COOKIE))
+    for key in ("auth", "session_cookie", "auth_checked"):
+        st.session_state.pop(key, None)
+    st.session_state["cookie_pending"] = ("delete",)
+
+if not logged_in:
+    st.subheader("Willkommen – bitte anmelden oder registrieren")
+    tab_login, tab_register = st.tabs(["Anmelden", "Registrieren"])
+    with tab_login:
+        with st.form("login_form", clear_on_submit=False):
+            col1, col2 = st.columns(2)
+            with col1:
+                u = st.text_input("Benutzername", value="", key="login_user")
+            with col2:
+                p = st.text_input("Passwort", type="password", value="", key="login_pass")
+            ok = st.form_submit_button("Anmelden")
+        if ok:
+            try:
+                auth = authenticate(u.strip(), p, ip=_client_ip())
+            except LoginThrottled as exc:
+                st.error(str(exc))
+            else:
+                if auth:
+                    _start_session(auth)
+                    st.rerun()
+                st.error("Benutzername oder Passwort falsch.")
+    with tab_register:
+        with st.form("register_form"):
+            u2 = st.text_input("Benutzername")
+            name2 = st.text_input("Vollständiger Name", value="")
+            mail2 = st.text_input("E-Mail (optional)", value="")
+            c1, c2 = st.columns(2)
+            with c1:
+                p1 = st.text_input("Passwort", type="password")
+            with c2:
+                p2 = st.text_input("Passwort wiederholen", type="password")
+            okr = st.form_submit_button("Registrieren")
+        if okr:
+            try:
+                err = register(u2.strip(), p1, p2, email=mail2.strip(), full_name=name2.strip(), ip=_client_ip())
+            except LoginThrottled as exc:
+                err = str(exc)
+            if err:
+                st.error(err)
+            else:
+                st.success("Registrierung erfolgreich – bitte jetzt anmelden.")
+    st.stop()
+# ----------------------------------------------------------
+
+
+# --- Unified sidebar user box ---
+with st.sidebar:
+    st.caption(f"Eingeloggt als: **{st.session_state['auth']['username']}**")
+    if st.button("Logout", key="logout_btn"):
+        _logout()
+        st.rerun()
+
+# --- Hide Wohnung-Detail page entry from the sidebar navigation (robust for both routers) ---
+st.markdown(
+    """
+    <style>
+    /* Hide by path slug (new router with path segments) */
+    section[data-testid="stSidebar"] a[href*="a_Wohnung_Detail"] { display:none !important; }
+    /* Hide by query router (?page=...) as fallback */
+    section[data-testid="stSidebar"] a[href*="page=a%20Wohnung%20Detail"] { display:none !important; }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+
+# Sidebar-Kopf
+with st.sidebar:
+    st.markdown("## 🏠 " + t("app_title"))
+    st.markdown("—")
+    st.caption(t("local_data_hint"))
+
+# --- Begrüßung: Tageszeit + Saison + Vorname ---
+def _time_greeting(hour: int) -> str:
+    if 5 <= hour < 11:   return t("greet_morning")
+    if 11 <= hour < 17:  return t("greet_afternoon")
+    if 17 <= hour < 23:  return t("greet_evening")
+    return t("greet_night")
+
+def _season(month: int) -> tuple[str, str]:
+    if month in (3, 4, 5):    return (t("spring"), "🌷")
+    if month in (6, 7, 8):    return (t("summer"), "☀️")
+    if month in (9, 10, 11):  return (t("autumn"), "🍂")
+    return (t("winter"), "❄️")
+
+now = dt.datetime.now()
+greet = _time_greeting(now.hour)
+season_label, season_emoji = _season(now.month)
+
+with SessionCtx() as s:
+    profile = s.query(UserProfile).limit(1).first()
+first_name = (profile.first_name or "").strip() if profile else ""
+
+# --- Startbildschirm (statt Dashboard) ---
+st.markdown(
+    f"### {greet}{', ' + first_name if first_name else ''}! {season_emoji} "
+    + t("season_greeting").format(season=season_label)
+)
+
+st.write("—")
+st.write("Wähle links eine Seite aus (Dashboard, Objekte, …).")
@@ -0,0 +1,141 @@
+# core/__main__.py — Kommandozeile ohne Streamlit (Cron, Worker, Jahresabschluss)
+#
+# Aufruf (aus dem Verzeichnis mit data.db):
+#   python -m core statements --year 2024 [--property 1] [--out bka.zip] [--workers 4]
+#   python -m core export --format xlsx|csv|parquet [--since CURSOR] [--out DATEI]
+#   python -m core import KONTOAUSZUG [--category Miete] [--no-learn-iban] [--dry-run]
+#   python -m core maintenance migrate|vacuum|rent-roll|session-sweep|blob-sweep|journal-prune
+#
+# Caches laufen hier im Prozess (core.cache.MemoryBackend); Schreibzugriffe werden über das
+# Änderungsjournal auch von laufenden Streamlit-Instanzen gesehen.
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+from collections import Counter
+
+
+def _print_progress(done: int, total: int, label: str = "") -> None:
+    print(f"\r{done}/{total} {label}".rstrip().ljust(40), end="", file=sys.stderr, flush=True)
+
+
+def cmd_statements(args, rest: list[str]) -> int:
+    from . import statements
+    return statements.main(rest)
+
+
+def cmd_export(args, rest: list[str]) -> int:
+    from . import export
+    if args.since is None:
+        path, until = export.build(args.format, progress=_print_progress), None
+    else:
+        try:
+            path, until = export.build_changes(args.format, args.since, progress=_print_progress)
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+    print(file=sys.stderr)
+    if args.out:
+        shutil.copyfile(path, args.out)
+        path = args.out
+    print(path)
+    if until is not None:
+        print(f"Cursor für den nächsten Änderungsexport: {until}")
+    return 0
+
+
+def cmd_import(args, rest: list[str]) -> int:
+    from .bankimport import STATUS_NEW, import_payments, review
+    from .i18n import translator
+
+    with open(args.file, "rb") as fh:
+        frame = review(fh, args.file)
+    counts = Counter(frame["status"])
+    print(f"{len(frame)} Buchungen: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    unmatched = int(((frame["status"] == STATUS_NEW) & frame["lease_id"].isna() & (frame["amount"] > 0)).sum())
+    print(f"{int(frame['import'].sum())} zur Übernahme, {unmatched} ohne Vertrag (nur über die Seite zuordenbar)")
+    if args.dry_run:
+        return 0
+    result = import_payments(frame, args.category or translator()("cat_rent"), learn_iban=args.learn_iban)
+    print("{inserted} Zahlungen übernommen, {skipped} übersprungen ({leases} Verträge)".format(**result))
+    return 0
+
+
+def cmd_maintenance(args, rest: list[str]) -> int:
+    from .db import get_engine
+    engine = get_engine()                       # migriert beim ersten Zugriff
+
+    if args.task == "migrate":
+        from .migrations import current_version
+        with engine.connect() as con:
+            print(f"Schema-Version {current_version(con)}")
+    elif args.task == "vacuum":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as con:
+            con.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            con.exec_driver_sql("VACUUM")
+            con.exec_driver_sql("PRAGMA optimize")
+        print("VACUUM fertig")
+    elif args.task == "rent-roll":
+        from .reconciliation import sync_ledger
+        from .rentroll import refresh
+        stats = refresh()
+        print("Sollstellungen:", ", ".join(f"{k}={v}" for k, v in stats.items()))
+        print(f"Offene Posten: {sync_ledger()} Verträge abgeglichen")
+    elif args.task == "session-sweep":
+        from .sessions import sweep
+        print(f"{sweep()} Sitzungen gelöscht")
+    elif args.task == "blob-sweep":
+        from . import blobstore, thumbnails
+        with engine.connect() as con:
+            keep = blobstore.referenced(con)
+        count, size = blobstore.sweep(keep, min_age=args.min_age, dry_run=args.dry_run)
+        thumbs = thumbnails.sweep(dry_run=args.dry_run)
+        verb = "würden gelöscht" if args.dry_run else "gelöscht"
+        print(f"{count} Blobs ({size / 1e6:.1f} MB) und {thumbs} Vorschauen {verb}; {len(keep)} referenziert")
+    elif args.task == "journal-prune":
+        from . import journal
+        before = args.before if args.before is not None else journal.current_cursor()
+        print(f"{journal.prune(before)} Journaleinträge bis Cursor {before} gelöscht")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m core", description="Immobilien-Manager ohne Oberfläche")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("statements", add_help=False, help="Betriebskostenabrechnungen als ZIP (Optionen: siehe core.statements)")
+    p.set_defaults(func=cmd_statements, passthrough=True)
+
+    p = sub.add_parser("export", help="Voll- oder Änderungsexport")
+    p.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx")
+    p.add_argument("--since", type=int, default=None, help="nur Änderungen seit diesem Journal-Cursor")
+    p.add_argument("--out", default=None, help="Kopie an diesen Pfad (Standard: Pfad unter data/exports ausgeben)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="Kontoauszug (CSV, CAMT.053, MT940) als Zahlungen übernehmen")
+    p.add_argument("file")
+    p.add_argument("--category", default=None, help="Zahlungskategorie (Standard: Miete)")
+    p.add_argument("--no-learn-iban", dest="learn_iban", action="store_false")
+    p.add_argument("--dry-run", action="store_true", help="nur prüfen, nichts schreiben")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("maintenance", help="Wartung")
+    p.add_argument("task", choices=["migrate", "vacuum", "rent-roll", "session-sweep", "blob-sweep", "journal-prune"])
+    p.add_argument("--before", type=int, default=None, help="journal-prune: bis zu diesem Cursor (Standard: aktueller)")
+    p.add_argument("--min-age", type=float, default=3600, help="blob-sweep: nur Dateien älter als so viele Sekunden")
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_maintenance)
+    return ap
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = build_parser()
+    args, rest = ap.parse_known_args(argv)
+    if rest and not getattr(args, "passthrough", False):
+        ap.error("unbekannte Argumente: " + " ".join(rest))
+    return args.func(args, rest)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+# core/allocation.py — Umlage-Engine für Betriebskosten
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+ALLOCATION_METHODS = ("AREA", "UNITS", "PERSONS", "WATER_M3", "HEAT_SPLIT_70_30", "FIXED")
+
+BLOCK_HEATING = "Heizung"
+BLOCK_OPERATING = "Betriebskosten"
+
+DEFAULT_SETTINGS = {"heat_ratio_consumption": 70, "persons_default": 2, "water_allocation_fallback": "PERSONS"}
+
+
+def _normalize(v: np.ndarray) -> np.ndarray | None:
+    """Anteilsvektor (Summe 1) oder None, wenn nichts zu verteilen ist."""
+    total = float(v.sum())
+    return v / total if total > 0 else None
+
+
+@dataclass(frozen=True)
+class Allocation:
+    """Ergebnis einer Umlage: Anteilsmatrix Wohnungen × Kostenzeilen.
+
+    `shares[i, j]` ist der Anteil der Wohnung `unit_ids[i]` an Kostenzeile `costs.iloc[j]`.
+    Vorschau und Einzelabrechnung werden beide aus dieser einen Matrix abgeleitet.
+    """
+    unit_ids: np.ndarray
+    costs: pd.DataFrame
+    shares: np.ndarray
+    heating_codes: frozenset
+
+    @property
+    def amounts(self) -> np.ndarray:
+        return self.shares * self.costs["amount_gross"].to_numpy(dtype=float)[None, :]
+
+    def totals(self) -> pd.Series:
+        """Summe (brutto) je Wohnung, Index = unit_id."""
+        return pd.Series(self.amounts.sum(axis=1), index=pd.Index(self.unit_ids, name="id"), name="sum")
+
+    def detail(self, unit_id: int | None = None) -> pd.DataFrame:
+        """Verteilung je Originalrechnung inkl. Netto/USt und Block (Heizung/Betriebskosten).
+
+        Zeilen ohne Betrag (z. B. Direktkosten anderer Wohnungen) entfallen.
+        """
+        amounts = self.amounts
+        unit_ids = self.unit_ids
+        if unit_id is not None:
+            rows = np.flatnonzero(unit_ids == int(unit_id))
+            amounts = amounts[rows]
+            unit_ids = unit_ids[rows]
+        n_units, n_costs = amounts.shape
+        codes = self.costs["category_code"].to_numpy(dtype=object)
+        vat = self.costs["vat_rate"].fillna(0).to_numpy(dtype=float)
+        gross = amounts.ravel()
+        vat_rate = np.tile(vat, n_units)
+        net = gross / (1.0 + vat_rate / 100.0)
+        category = np.tile(codes, n_units)
+        is_heating = np.isin(category, list(self.heating_codes))
+        out = pd.DataFrame({
+            "unit_id": np.repeat(unit_ids, n_costs),
+            "cost_id": np.tile(self.costs["id"].to_numpy(), n_units),
+            "category": category,
+            "gross": gross,
+            "vat_rate": vat_rate,
+            "net": net,
+            "vat_amount": gross - net,
+            "block": np.where(is_heating, BLOCK_HEATING, BLOCK_OPERATING),
+        })
+        return out[out["gross"] != 0].reset_index(drop=True)
+
+
+def allocate(
+    units: pd.DataFrame,
+    costs: pd.DataFrame,
+    categories: pd.DataFrame,
+    settings: dict | None = None,
+    persons_map: dict | None = None,
+    consumption: Callable[[str], dict] | None = None,
+) -> Allocation:
+    """Verteilt alle Kostenzeilen eines Objekts/Jahres auf die Wohnungen.
+
+    units:       id, living_area_sqm
+    costs:       id, category_code, unit_id, amount_gross, vat_rate
+    categories:  code, allocation_method, is_heating
+    consumption: liefert {unit_id: Verbrauch} für 'water' bzw. 'heat'; wird nur
+                 aufgerufen, wenn eine Kostenzeile den Schlüssel auch benötigt.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    persons_map = persons_map or {}
+    unit_ids = units["id"].to_numpy(dtype=np.int64)
+    n = len(unit_ids)
+    costs = costs.reset_index(drop=True)
+
+    cats = categories.set_index("code") if "code" in categories.columns else categories
+    methods = costs["category_code"].map(cats["allocation_method"]).fillna("UNITS").to_numpy(dtype=object)
+    heating_codes = frozenset(cats.index[cats["is_heating"].fillna(False).astype(bool)])
+
+    # Basisvektoren je Umlageschlüssel (eine Spalte je Schlüssel)
+    equal = np.full(n, 1.0 / n) if n else np.zeros(0)
+    area = units["living_area_sqm"].fillna(0).to_numpy(dtype=float)
+    area_share = _normalize(area)
+    persons_default = settings.get("persons_default", 2)
+    persons = np.array([persons_map.get(int(u), persons_default) for u in unit_ids], dtype=float)
+    persons_share = _normalize(persons)
+    if persons_share is None:
+        persons_share = equal
+
+    basis = {"UNITS": equal, "FIXED": equal, "AREA": area_share if area_share is not None else equal, "PERSONS": persons_share}
+    used = set(methods)
+
+    def _consumption_share(kind: str) -> np.ndarray | None:
+        cons = consumption(kind) if consumption else {}
+        return _normalize(np.array([float(cons.get(int(u), 0.0)) for u in unit_ids]))
+
+    if "WATER_M3" in used:
+        water = _consumption_share("water")
+        if water is None:
+            water = equal if settings.get("water_allocation_fallback", "PERSONS") == "UNITS" else persons_share
+        basis["WATER_M3"] = water
+    if "HEAT_SPLIT_70_30" in used:
+        cons_ratio = int(settings.get("heat_ratio_consumption", 70)) / 100.0
+        base = area_share if area_share is not None else equal
+        heat = _consumption_share("heat")
+        basis["HEAT_SPLIT_70_30"] = cons_ratio * (heat if heat is not None else base) + (1.0 - cons_ratio) * base
+
+    keys = list(basis)
+    key_idx = np.array([keys.index(m) if m in basis else keys.index("UNITS") for m in methods], dtype=np.int64)
+    shares = np.column_stack([basis[k] for k in keys])[:, key_idx] if len(costs) else np.zeros((n, 0))
+
+    # Einzelwohnungs-Rechnungen: gehen vollständig an die angegebene Wohnung
+    direct = costs["unit_id"].fillna(0).to_numpy(dtype=np.int64)
+    direct_cols = np.flatnonzero(direct > 0)
+    if len(direct_cols):
+        shares[:, direct_cols] = 0.0
+        rows = pd.Index(unit_ids).get_indexer(direct[direct_cols])
+        found = rows >= 0
+        shares[rows[found], direct_cols[found]] = 1.0
+
+    return Allocation(unit_ids=unit_ids, costs=costs, shares=shares, heating_codes=heating_codes)
@@ -0,0 +1,179 @@
+# core/amortization.py — Tilgungspläne für Finanzierungen (Annuitätendarlehen)
+#
+# Alle Darlehen werden gemeinsam als Matrix (Darlehen × Monate) in geschlossener Form
+# gerechnet: Restschuld B_k = P·q^k − R·(q^k − 1)/i mit Monatszins i und q = 1 + i.
+# Fehlt die Monatsrate, gilt die übliche Annuität aus Sollzins + anfänglicher Tilgung:
+# R = P · (Zins% + Tilgung%) / 100 / 12. Nach Ende der Zinsbindung wird mit unverändertem
+# Zins weitergerechnet (Anschlusskonditionen sind unbekannt). Pläne werden je Darlehen und
+# Revision (Fingerabdruck der planrelevanten Felder) zwischengespeichert; nach einer
+# Änderung wird nur das geänderte Darlehen neu gerechnet.
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .queries import df_financings
+
+MAX_MONTHS = 600            # Planhorizont höchstens 50 Jahre (z. B. tilgungsfreie Darlehen)
+CACHE_SIZE = 2048           # Darlehens-Revisionen im Prozess-Cache
+
+SCHEDULE_COLUMNS = ["financing_id", "month", "payment", "interest", "principal", "balance"]
+_FP_COLUMNS = ["start_date", "end_date", "principal_amount", "interest_rate", "repayment_rate", "monthly_payment"]
+
+_lock = threading.Lock()
+_schedules: "OrderedDict[tuple[int, int], pd.DataFrame]" = OrderedDict()
+
+
+def annuity_payment(principal, interest_rate, repayment_rate) -> np.ndarray:
+    """Monatsrate aus Darlehen, Sollzins % p. a. und anfänglicher Tilgung % p. a."""
+    p = np.asarray(principal, dtype=float)
+    r = np.nan_to_num(np.asarray(interest_rate, dtype=float))
+    a = np.nan_to_num(np.asarray(repayment_rate, dtype=float))
+    return p * (r + a) / 100.0 / 12.0
+
+
+def effective_payment(fins: pd.DataFrame) -> np.ndarray:
+    """Hinterlegte Monatsrate oder, falls leer/0, die abgeleitete Annuität."""
+    given = fins["monthly_payment"].astype(float).to_numpy()
+    derived = annuity_payment(fins["principal_amount"], fins["interest_rate"], fins["repayment_rate"])
+    return np.where(np.isnan(given) | (given <= 0), derived, given)
+
+
+def payoff_months(principal, monthly_rate, payment) -> np.ndarray:
+    """Laufzeit bis zur vollständigen Tilgung in Monaten (MAX_MONTHS, wenn die Rate nicht reicht)."""
+    p, i, m = (np.asarray(x, dtype=float) for x in (principal, monthly_rate, payment))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n_int = np.ceil(-np.log1p(-p * i / m) / np.log1p(i))
+        n_zero = np.ceil(p / m)
+    n = np.where(i > 0, n_int, n_zero)
+    n = np.where((m <= p * i) | (m <= 0) | ~np.isfinite(n), MAX_MONTHS, n)
+    return np.clip(np.where(p > 0, n, 0), 0, MAX_MONTHS).astype(np.int64)
+
+
+def schedule_matrix(principal, monthly_rate, payment, months: int) -> dict[str, np.ndarray]:
+    """Zins, Tilgung, Rate und Restschuld je Darlehen (Zeilen) und Monat 1..months (Spalten)."""
+    p = np.asarray(principal, dtype=float)[:, None]
+    i = np.asarray(monthly_rate, dtype=float)[:, None]
+    m = np.asarray(payment, dtype=float)[:, None]
+    k = np.arange(1, months + 1, dtype=float)[None, :]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        q = (1.0 + i) ** k
+        balance = np.where(i > 0, p * q - m * (q - 1.0) / i, p - m * k)
+    balance = np.clip(np.nan_to_num(balance, nan=0.0, posinf=0.0), 0.0, None)
+    prev = np.concatenate([p, balance[:, :-1]], axis=1)
+    interest = prev * i
+    principal_part = prev - balance
+    return {"interest": interest, "principal": principal_part, "payment": interest + principal_part, "balance": balance}
+
+
+def fingerprints(fins: pd.DataFrame) -> np.ndarray:
+    h = pd.util.hash_pandas_object(fins[_FP_COLUMNS].astype(str), index=False).to_numpy()
+    return (h >> np.uint64(1)).astype(np.int64)
+
+
+def compute(fins: pd.DataFrame) -> pd.DataFrame:
+    """Tilgungspläne (SCHEDULE_COLUMNS) für alle übergebenen Darlehen in einem Durchgang.
+
+    Die erste Rate ist im Monat nach dem Auszahlungs-/Startdatum fällig; mit `end_date`
+    endet der Plan dort (Restschuld bleibt als Restschuld zum Vertragsende stehen).
+    """
+    if fins.empty:
+        return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "month" else float) for c in SCHEDULE_COLUMNS})
+    p = fins["principal_amount"].astype(float).fillna(0.0).to_numpy()
+    i = np.nan_to_num(fins["interest_rate"].astype(float).to_numpy()) / 100.0 / 12.0
+    m = effective_payment(fins)
+    start = pd.to_datetime(fins["start_date"], errors="coerce")
+    m0 = start.to_numpy().astype("datetime64[M]").astype(np.int64)
+    n = payoff_months(p, i, m)
+    end = pd.to_datetime(fins["end_date"], errors="coerce")
+    until_end = end.to_numpy().astype("datetime64[M]").astype(np.int64) - m0
+    n = np.where(end.isna(), n, np.clip(np.minimum(n, until_end), 0, None))
+    n = np.where(start.isna(), 0, n)
+
+    mat = schedule_matrix(p, i, m, int(n.max()) if len(n) else 0)
+    rows, cols = np.nonzero(np.arange(1, mat["balance"].shape[1] + 1)[None, :] <= n[:, None])
+    month = (m0[rows] + cols + 1).astype("datetime64[M]").astype("datetime64[ns]")
+    return pd.DataFrame({
+        "financing_id": fins["id"].to_numpy(dtype=np.int64)[rows],
+        "month": month,
+        **{c: np.round(mat[c][rows, cols], 2) for c in ("payment", "interest", "principal", "balance")},
+    })
+
+
+def schedules(fins: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Pläne aller Darlehen; nur neue oder geänderte Darlehen werden (gemeinsam) neu gerechnet."""
+    fins = df_financings() if fins is None else fins
+    if fins is None or fins.empty:
+        return compute(pd.DataFrame(columns=["id", *_FP_COLUMNS]))
+    keys = list(zip(fins["id"].astype(int), fingerprints(fins).tolist()))
+    with _lock:
+        missing = [pos for pos, key in enumerate(keys) if key not in _schedules]
+    if missing:
+        fresh = compute(fins.iloc[missing])
+        parts = dict(tuple(fresh.groupby("financing_id", sort=False)))
+        with _lock:
+            for pos in missing:
+                key = keys[pos]
+                _schedules[key] = parts.get(key[0], fresh.iloc[:0]).reset_index(drop=True)
+            while len(_schedules) > CACHE_SIZE:
+                _schedules.popitem(last=False)
+    with _lock:
+        for key in keys:
+            _schedules.move_to_end(key)
+        frames = [_schedules[key] for key in keys]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _balance_at(sched: pd.DataFrame, ids: pd.Series, when: pd.Series) -> pd.Series:
+    """Restschuld je Darlehen nach der letzten Rate bis einschließlich Monat `when` (je id)."""
+    cutoff = sched["financing_id"].map(pd.Series(when.to_numpy(), index=ids.to_numpy()))
+    return sched[sched["month"] <= cutoff].groupby("financing_id")["balance"].last().reindex(ids)
+
+
+def loan_status(as_of=None, fins: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Je Darlehen zum Stichtag: Rate, Restschuld, Zinsen/Tilgung im laufenden Jahr,
+    Restschuld bei Ende der Zinsbindung und Monat der vollständigen Tilgung (falls im Plan)."""
+    fins = df_financings() if fins is None else fins
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    cols = ["financing_id", "payment", "remaining_balance", "interest_ytd", "principal_ytd", "balance_fixed_end", "payoff_month"]
+    if fins is None or fins.empty:
+        return pd.DataFrame(columns=cols)
+    sched = schedules(fins)
+    ids = fins["id"].astype(int).reset_index(drop=True)
+    principal = fins["principal_amount"].astype(float).fillna(0.0).to_numpy()
+    start = pd.to_datetime(fins["start_date"], errors="coerce").reset_index(drop=True)
+    month_now = as_of.to_period("M").start_time
+
+    # vor der ersten Rate: volle Darlehenssumme, sofern bereits ausgezahlt
+    now = _balance_at(sched, ids, pd.Series(month_now, index=ids.index)).to_numpy()
+    now = np.where(np.isnan(now), np.where(start <= as_of, principal, 0.0), now)
+    fixed = pd.to_datetime(fins["fixed_rate_until"], errors="coerce").reset_index(drop=True)
+    at_fixed = _balance_at(sched, ids, fixed.dt.to_period("M").dt.start_time).to_numpy()
+    at_fixed = np.where(fixed.isna(), np.nan, np.where(np.isnan(at_fixed), principal, at_fixed))
+
+    this_year = sched[(sched["month"] <= month_now) & (sched["month"] >= as_of.replace(month=1, day=1))]
+    ytd = this_year.groupby("financing_id")[["interest", "principal"]].sum().reindex(ids).fillna(0.0)
+    last = sched.groupby("financing_id").agg(month=("month", "max"), balance=("balance", "last")).reindex(ids)
+
+    return pd.DataFrame({
+        "financing_id": ids.to_numpy(),
+        "payment": np.round(effective_payment(fins), 2),
+        "remaining_balance": np.round(now, 2),
+        "interest_ytd": ytd["interest"].round(2).to_numpy(),
+        "principal_ytd": ytd["principal"].round(2).to_numpy(),
+        "balance_fixed_end": np.round(at_fixed, 2),
+        "payoff_month": last["month"].where(last["balance"] < 0.005).to_numpy(),
+    })[cols]
+
+
+def monthly_totals(until=None, fins: pd.DataFrame | None = None, since=None) -> pd.DataFrame:
+    """Summe Zinsen/Tilgung/Rate aller Darlehen je Monat (Index: Monat als Timestamp), optional ab `since`."""
+    sched = schedules(fins)
+    if since is not None:
+        sched = sched[sched["month"] >= pd.Timestamp(since).to_period("M").start_time]
+    if until is not None:
+        sched = sched[sched["month"] <= pd.Timestamp(until)]
+    return sched.groupby("month")[["interest", "principal", "payment"]].sum().round(2)
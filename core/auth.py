@@ -1,6 +1,20 @@
+import threading
+import time
+from collections import deque
+
 import bcrypt
 from dataclasses import dataclass
 
+# Anmeldeversuche: bcrypt kostet je Prüfung ~0,2 s CPU. Fehlversuche werden je Benutzername
+# und je IP gezählt; über dem Limit wird gesperrt (Dauer verdoppelt sich je weiterem Versuch),
+# und es laufen nie mehr als MAX_CONCURRENT_CHECKS Prüfungen gleichzeitig.
+FAILURE_WINDOW = 15 * 60                  # Sekunden
+FAILURE_LIMITS = {"user": 5, "ip": 20}    # Fehlversuche im Fenster bis zur Sperre
+LOCKOUT_SECONDS = 30
+MAX_LOCKOUT_SECONDS = 15 * 60
+MAX_CONCURRENT_CHECKS = 2
+
+
 def hash_password(p: str) -> str:
     return bcrypt.hashpw(p.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
@@ -11,9 +25,155 @@ def verify_password(p: str, h: str) -> bool:
         return False
 
 
+class LoginThrottled(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Zu viele Anmeldeversuche – bitte in {int(retry_after) + 1} s erneut versuchen.")
+        self.retry_after = retry_after
+
+
+class LoginThrottle:
+    """Zählt Fehlversuche je Schlüssel ("user:<name>", "ip:<adresse>") im gleitenden Fenster."""
+
+    def __init__(self, limits: dict = FAILURE_LIMITS, window: float = FAILURE_WINDOW):
+        self.limits, self.window = limits, window
+        self._failures: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, key: str, now: float) -> deque:
+        hits = self._failures.get(key, deque())
+        while hits and hits[0] < now - self.window:
+            hits.popleft()
+        if not hits:
+            self._failures.pop(key, None)
+        return hits
+
+    def retry_after(self, key: str, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            hits = self._expire(key, now)
+            over = len(hits) - self.limits[key.split(":", 1)[0]] + 1
+            if over <= 0:
+                return 0.0
+            wait = min(LOCKOUT_SECONDS * 2 ** (over - 1), MAX_LOCKOUT_SECONDS)
+            return max(0.0, hits[-1] + wait - now)
+
+    def check(self, *keys: str) -> None:
+        wait = max((self.retry_after(k) for k in keys), default=0.0)
+        if wait > 0:
+            raise LoginThrottled(wait)
+
+    def record(self, *keys: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                hits = self._expire(key, now)
+                hits.append(now)
+                self._failures[key] = hits
+
+    def reset(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._failures.pop(key, None)
+
+
+_throttle = LoginThrottle()
+_checks = threading.BoundedSemaphore(MAX_CONCURRENT_CHECKS)
+
+
+def _keys(username: str, ip: str | None) -> list[str]:
+    return [f"user:{username.strip().lower()}"] + ([f"ip:{ip}"] if ip else [])
+
+
+def authenticate(username: str, password: str, ip: str | None = None) -> dict | None:
+    """Prüft die Anmeldedaten (gedrosselt); gibt den auth-Eintrag für session_state oder None zurück.
+
+    Wirft LoginThrottled, solange Benutzername oder IP gesperrt sind.
+    """
+    from sqlalchemy import select
+    from .db import User, get_engine
+
+    keys = _keys(username, ip)
+    _throttle.check(*keys)
+    if not _checks.acquire(timeout=5):
+        raise LoginThrottled(1)
+    try:
+        with get_engine().connect() as con:
+            row = con.execute(
+                select(User.username, User.full_name, User.role, User.password_hash)
+                .where(User.username == username, User.is_active == True)  # noqa: E712
+            ).one_or_none()
+        ok = row is not None and verify_password(password, row.password_hash or "")
+    finally:
+        _checks.release()
+    if not ok:
+        _throttle.record(*keys)
+        return None
+    _throttle.reset(keys[0])
+    return {"username": row.username, "name": row.full_name or row.username, "role": row.role}
+
+
+def register(username: str, password: str, password2: str, email: str | None = None,
+             full_name: str | None = None, ip: str | None = None) -> str | None:
+    """Legt einen Betrachter-Zugang an; gibt eine Fehlermeldung oder None zurück."""
+    from .db import SessionCtx, User
+
+    if not username or not password:
+        return "Bitte Benutzername und Passwort ausfüllen."
+    if password != password2:
+        return "Passwörter stimmen nicht überein."
+    keys = _keys("", ip)[1:]          # Registrierungen nur je IP begrenzen
+    _throttle.check(*keys)
+    with SessionCtx() as s:
+        if s.query(User.id).filter(User.username == username).first():
+            return "Benutzername ist bereits vergeben."
+        _throttle.record(*keys)
+        s.add(User(username=username, email=email or None, full_name=full_name or username,
+                   password_hash=hash_password(password), role="viewer", is_active=True))
+        s.commit()
+    return None
+
+
+def bootstrap_admin(username: str, password: str, role: str = "admin", email: str | None = None,
+                    full_name: str | None = None) -> bool:
+    """Stellt den Admin-Zugang sicher; bcrypt nur, wenn Zeile oder Hash fehlen. True = angelegt/ergänzt."""
+    from .db import SessionCtx, User, ensure_admin_user
+
+    with SessionCtx() as s:
+        u = s.query(User.password_hash, User.role, User.is_active).filter(User.username == username).one_or_none()
+    if u is not None and u.password_hash and u.role and u.is_active:
+        return False
+    ensure_admin_user(username, hash_password(password), role=role, email=email, full_name=full_name)
+    return True
+
+
+REVALIDATE_SECONDS = 60     # Widerruf/Ablauf greift in offenen Tabs spätestens nach dieser Zeit
+
+
+def session_auth() -> dict | None:
+    """auth aus session_state; sonst (Reload, neuer Tab) aus dem Sitzungs-Cookie — ohne bcrypt.
+
+    Sitzungen mit Cookie werden höchstens alle REVALIDATE_SECONDS erneut gegen die Tabelle geprüft.
+    """
+    import streamlit as st
+    from .sessions import SESSION_COOKIE, validate
+
+    auth = st.session_state.get("auth")
+    cookie = st.session_state.get("session_cookie") or st.context.cookies.get(SESSION_COOKIE)
+    cookie = cookie if isinstance(cookie, str) else None
+    if auth and (not cookie or time.monotonic() - st.session_state.get("auth_checked", 0) < REVALIDATE_SECONDS):
+        return auth
+    auth = validate(cookie) if cookie else None
+    if auth:
+        st.session_state.update(auth=auth, session_cookie=cookie, auth_checked=time.monotonic())
+    else:
+        for key in ("auth", "session_cookie", "auth_checked"):
+            st.session_state.pop(key, None)
+    return auth
+
+
 def require_login() -> dict:
     import streamlit as st
-    if not st.session_state.get("auth"):
+    if not session_auth():
         try:
             st.switch_page("app.py")
         except Exception:
@@ -0,0 +1,482 @@
+# core/bankimport.py — Kontoauszüge (CSV / CAMT.053 / MT940) einlesen und Mietverträgen zuordnen
+#
+# Die Parser sind Generatoren über dem hochgeladenen Datenstrom: CSV und MT940 zeilenweise,
+# CAMT.053 per iterparse mit elem.clear() je Buchung — die Datei liegt nie komplett als
+# Baum im Speicher. Zuordnung (nur Gutschriften) vektorisiert in dieser Reihenfolge:
+#   1. IBAN des Mieters (tenants.iban) -> am Buchungstag aktiver Vertrag des Mieters
+#   2. Vertragsnummer im Verwendungszweck ("MV 12", "Mietvertrag #12", ...)
+#   3. Betrag = Warm- bzw. Kaltmiete eines aktiven Vertrags und Nachname im Namen des Zahlers
+# Jede Buchung bekommt eine stabile bank_ref (Hash der Felder + laufende Nummer bei
+# identischen Buchungen); der eindeutige Index auf payments.bank_ref verhindert Doppelimporte.
+from __future__ import annotations
+
+import codecs
+import csv
+import datetime as dt
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+from collections import Counter
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from .db import get_engine
+from .occupancy import lease_index
+from .queries import df_leases, df_tenants
+from .reconciliation import sync_ledger
+
+RULE_IBAN = "iban"
+RULE_REF = "ref"
+RULE_AMOUNT_NAME = "amount_name"
+
+STATUS_NEW = "new"
+STATUS_DUPLICATE = "duplicate"              # bank_ref bereits importiert
+STATUS_POSSIBLE_DUPLICATE = "possible"      # gleicher Vertrag/Tag/Betrag ohne bank_ref (manuell erfasst)
+STATUS_DEBIT = "debit"                      # Lastschrift/Abbuchung -> keine Mietzahlung
+
+LEASE_REF_RE = r"\b(?:MV|Mietvertrag|Vertrag|Lease)\s*(?:Nr\.?|#)?\s*(\d+)\b"
+
+REVIEW_COLUMNS = ["import", "booking_date", "amount", "counterparty", "iban", "purpose",
+                  "lease_id", "rule", "status", "bank_ref"]
+
+
+@dataclass(frozen=True, slots=True)
+class Transaction:
+    booking_date: dt.date
+    amount: float          # Gutschrift positiv, Belastung negativ
+    counterparty: str = ""
+    iban: str = ""
+    purpose: str = ""
+
+
+def normalize_iban(value) -> str:
+    return re.sub(r"\s+", "", str(value or "")).upper()
+
+
+# --------------------
+# Gemeinsame Helfer
+# --------------------
+def _text_lines(stream: BinaryIO, encoding: str | None = None) -> Iterator[str]:
+    """Binärstrom -> Textzeilen; ohne Angabe UTF-8 (mit BOM), sonst Fallback cp1252."""
+    if hasattr(stream, "seek"):
+        stream.seek(0)
+    if encoding is None:
+        head = stream.read(64 * 1024)
+        stream.seek(0)
+        try:
+            head.decode("utf-8-sig")
+            encoding = "utf-8-sig"
+        except UnicodeDecodeError as exc:
+            # nur ein am Blockende abgeschnittenes Zeichen ist kein Grund für cp1252
+            encoding = "utf-8-sig" if exc.start >= len(head) - 3 else "cp1252"
+    reader = codecs.getreader(encoding)(stream, errors="replace")
+    yield from reader
+
+
+_DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d", "%d/%m/%Y", "%Y%m%d")
+
+
+def _date(value: str) -> dt.date | None:
+    value = (value or "").strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return dt.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _amount(value: str, decimal: str = ",") -> float | None:
+    """'1.234,56', '-1234.56 €', '+50,00' -> float; `decimal` entscheidet bei nur einem Trennzeichen."""
+    s = re.sub(r"[^\d,.\-+]", "", value or "")
+    if not s or not re.search(r"\d", s):
+        return None
+    if "," in s and "." in s:
+        decimal = "," if s.rfind(",") > s.rfind(".") else "."
+    if decimal == ",":
+        s = s.replace(".", "").replace(",", ".")
+    else:
+        s = s.replace(",", "")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+# --------------------
+# CSV (Online-Banking-Export)
+# --------------------
+# normierte Spaltenköpfe (klein, ohne Leerzeichen/Satzzeichen) -> Feld; erste Fundstelle gewinnt
+_CSV_HEADERS = {
+    "date": ("buchungstag", "buchungsdatum", "buchung", "datum", "bookingdate", "date", "valutadatum", "wertstellung", "valuedate"),
+    "amount": ("betrag", "betrageur", "umsatz", "umsatzineur", "amount", "betragineur"),
+    "counterparty": ("beguenstigterzahlungspflichtiger", "begünstigterzahlungspflichtiger", "namezahlungsbeteiligter",
+                     "auftraggeberbegünstigter", "auftraggeberbeguenstigter", "zahlungspflichtiger", "auftraggeber",
+                     "empfänger", "name", "counterparty", "payee", "payer"),
+    "iban": ("ibanzahlungsbeteiligter", "kontonummeriban", "iban", "kontonummer", "counterpartyiban"),
+    "purpose": ("verwendungszweck", "purpose", "reference", "remittanceinformation", "buchungsdetails"),
+    "sign": ("sollhaben", "debitcredit"),
+}
+
+
+def _norm_header(cell: str) -> str:
+    return re.sub(r"[\s/()._\-]+", "", cell.strip().lower())
+
+
+def _csv_header(row: list[str]) -> dict | None:
+    cells = [_norm_header(c) for c in row]
+    found = {}
+    for field, names in _CSV_HEADERS.items():
+        for name in names:
+            if name in cells:
+                found[field] = cells.index(name)
+                break
+    return found if {"date", "amount"} <= found.keys() else None
+
+
+def parse_csv(stream: BinaryIO, encoding: str | None = None) -> Iterator[Transaction]:
+    """CSV mit erkanntem Trennzeichen; Vorspann vor der Kopfzeile (Kontoinfo, Salden) wird übersprungen."""
+    lines = _text_lines(stream, encoding)
+    head = []
+    for line in lines:
+        head.append(line)
+        if len(head) >= 30:
+            break
+    try:
+        dialect = csv.Sniffer().sniff("".join(head), delimiters=";,\t|")
+        delimiter = dialect.delimiter
+    except csv.Error:
+        delimiter = ";"
+    decimal = "," if delimiter in ";\t|" else "."
+
+    def _all_lines():
+        yield from head
+        yield from lines
+
+    cols = None
+    for row in csv.reader(_all_lines(), delimiter=delimiter, quotechar='"'):
+        if cols is None:
+            cols = _csv_header(row)
+            continue
+        get = lambda field: row[cols[field]].strip() if field in cols and cols[field] < len(row) else ""
+        booking = _date(get("date"))
+        amount = _amount(get("amount"), decimal)
+        if booking is None or amount is None:
+            continue
+        if get("sign").upper() in ("S", "D", "DEBIT", "SOLL"):
+            amount = -abs(amount)
+        yield Transaction(booking, amount, get("counterparty"), normalize_iban(get("iban")), " ".join(get("purpose").split()))
+
+
+# --------------------
+# CAMT.053 (ISO 20022 Kontoauszug)
+# --------------------
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(elem, *path: str):
+    """Kind über lokale Namen (namensraumunabhängig, alle camt.053-Versionen)."""
+    for name in path:
+        if elem is None:
+            return None
+        elem = next((c for c in elem if _local(c.tag) == name), None)
+    return elem
+
+
+def _text(elem, *path: str) -> str:
+    node = _child(elem, *path)
+    return (node.text or "").strip() if node is not None else ""
+
+
+def _camt_party(tx, credit: bool) -> tuple[str, str]:
+    """Gegenpartei: bei Gutschriften der Zahler (Dbtr), bei Belastungen der Empfänger (Cdtr)."""
+    role, acct = ("Dbtr", "DbtrAcct") if credit else ("Cdtr", "CdtrAcct")
+    parties = _child(tx, "RltdPties")
+    name = _text(parties, role, "Nm") or _text(parties, role, "Pty", "Nm")   # camt.053.001.08+: Pty
+    return name, normalize_iban(_text(parties, acct, "Id", "IBAN"))
+
+
+def _camt_purpose(tx) -> str:
+    rmt = _child(tx, "RmtInf")
+    if rmt is None:
+        return ""
+    parts = [(c.text or "").strip() for c in rmt if _local(c.tag) == "Ustrd"]
+    return " ".join(" ".join(parts).split())
+
+
+def parse_camt053(stream: BinaryIO) -> Iterator[Transaction]:
+    """Eine Transaktion je TxDtls (Sammelbuchungen werden aufgelöst), sonst je Ntry."""
+    if hasattr(stream, "seek"):
+        stream.seek(0)
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if _local(elem.tag) != "Ntry":
+            continue
+        credit = _text(elem, "CdtDbtInd") == "CRDT"
+        booking = _date(_text(elem, "BookgDt", "Dt") or _text(elem, "BookgDt", "DtTm")[:10]
+                        or _text(elem, "ValDt", "Dt"))
+        entry_amount = _amount(_text(elem, "Amt"), ".")
+        details = [tx for d in elem if _local(d.tag) == "NtryDtls" for tx in d if _local(tx.tag) == "TxDtls"]
+        if booking is not None:
+            for tx in details or [None]:
+                amount = entry_amount
+                if tx is not None and len(details) > 1:
+                    amount = _amount(_text(tx, "AmtDtls", "TxAmt", "Amt") or _text(tx, "Amt"), ".") or 0.0
+                name, iban = _camt_party(tx, credit) if tx is not None else ("", "")
+                purpose = _camt_purpose(tx) if tx is not None else ""
+                if not purpose:
+                    purpose = _text(elem, "AddtlNtryInf")
+                if amount is not None:
+                    yield Transaction(booking, abs(amount) if credit else -abs(amount), name, iban, purpose)
+        elem.clear()   # verarbeitete Buchung freigeben
+
+
+# --------------------
+# MT940 (SWIFT)
+# --------------------
+_MT_TAG_RE = re.compile(r"^:(\d{2}[A-Z]?):")
+_MT61_RE = re.compile(r"^(\d{2})(\d{2})(\d{2})(\d{4})?(R?[CD])[A-Z]?(\d+(?:,\d*)?)")
+
+
+def _mt_records(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """(Tag, Inhalt) mit zusammengefügten Folgezeilen."""
+    tag, buf = None, []
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        m = _MT_TAG_RE.match(line)
+        if m:
+            if tag:
+                yield tag, "\n".join(buf)
+            tag, buf = m.group(1), [line[m.end():]]
+        elif line.startswith("-") and line.strip() in ("-", "-}"):
+            if tag:
+                yield tag, "\n".join(buf)
+            tag, buf = None, []
+        elif tag:
+            buf.append(line)
+    if tag:
+        yield tag, "\n".join(buf)
+
+
+def _mt86_fields(text: str) -> tuple[str, str, str]:
+    """Strukturiertes :86: (GVC + ?xx-Felder) -> (Name, IBAN, Verwendungszweck); sonst Freitext."""
+    flat = text.replace("\n", "")
+    if len(flat) < 4 or not flat[:3].isdigit():
+        return "", "", " ".join(text.split())
+    sep = flat[3]
+    fields: dict[str, str] = {}
+    for part in flat[4:].split(sep):
+        if len(part) >= 2 and part[:2].isdigit():
+            fields[part[:2]] = fields.get(part[:2], "") + part[2:]
+    purpose = "".join(fields.get(f"{i:02d}", "") for i in [*range(20, 30), *range(60, 64)])
+    name = (fields.get("32", "") + fields.get("33", "")).strip()
+    return name, normalize_iban(fields.get("31", "")), " ".join(purpose.split())
+
+
+def parse_mt940(stream: BinaryIO, encoding: str | None = None) -> Iterator[Transaction]:
+    pending = None   # (Datum, Betrag) aus :61:, wartet auf :86:
+    for tag, body in _mt_records(_text_lines(stream, encoding)):
+        if tag == "61":
+            if pending:
+                yield Transaction(*pending)
+            m = _MT61_RE.match(body.replace("\n", ""))
+            if not m:
+                pending = None
+                continue
+            yy, vm, vd, entry, mark, amt = m.groups()
+            year = 2000 + int(yy)
+            month, day = (int(entry[:2]), int(entry[2:])) if entry else (int(vm), int(vd))
+            if entry and abs(month - int(vm)) > 6:   # Buchung im Nachbarjahr der Valuta
+                year += 1 if month < int(vm) else -1
+            try:
+                booking = dt.date(year, month, day)
+            except ValueError:
+                booking = dt.date(2000 + int(yy), int(vm), int(vd))
+            amount = _amount(amt, ",")
+            credit = mark in ("C", "RD")   # RD = Storno einer Belastung -> Gutschrift
+            pending = (booking, amount if credit else -amount)
+        elif tag == "86" and pending:
+            name, iban, purpose = _mt86_fields(body)
+            yield Transaction(*pending, counterparty=name, iban=iban, purpose=purpose)
+            pending = None
+    if pending:
+        yield Transaction(*pending)
+
+
+# --------------------
+# Einstieg
+# --------------------
+def detect_format(stream: BinaryIO, filename: str = "") -> str:
+    name = filename.lower()
+    if name.endswith(".xml"):
+        return "camt053"
+    if name.endswith((".sta", ".mt940", ".940")):
+        return "mt940"
+    stream.seek(0)
+    head = stream.read(4096).lstrip(b"\xef\xbb\xbf \r\n\t")
+    stream.seek(0)
+    if head.startswith(b"<"):
+        return "camt053"
+    if re.search(rb"^:20:", head, re.M) or b":61:" in head:
+        return "mt940"
+    return "csv"
+
+
+PARSERS = {"csv": parse_csv, "camt053": parse_camt053, "mt940": parse_mt940}
+
+
+def parse(stream: BinaryIO, filename: str = "") -> Iterator[Transaction]:
+    return PARSERS[detect_format(stream, filename)](stream)
+
+
+def bank_refs(frame: pd.DataFrame) -> pd.Series:
+    """Stabile ID je Buchung: Hash der Felder, identische Buchungen zusätzlich durchnummeriert."""
+    keys = (frame["booking_date"].astype(str) + "|" + (frame["amount"] * 100).round().astype("int64").astype(str)
+            + "|" + frame["iban"] + "|" + frame["counterparty"].str.lower() + "|" + frame["purpose"].str.lower())
+    seen: Counter = Counter()
+    refs = []
+    for key in keys:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+        refs.append(f"{digest}-{seen[digest]}")
+        seen[digest] += 1
+    return pd.Series(refs, index=frame.index, dtype=object)
+
+
+def to_frame(transactions: Iterable[Transaction]) -> pd.DataFrame:
+    rows = [(t.booking_date, t.amount, t.counterparty, t.iban, t.purpose) for t in transactions]
+    frame = pd.DataFrame.from_records(rows, columns=["booking_date", "amount", "counterparty", "iban", "purpose"])
+    frame["booking_date"] = pd.to_datetime(frame["booking_date"])
+    frame["amount"] = frame["amount"].astype(float).round(2)
+    for c in ("counterparty", "iban", "purpose"):
+        frame[c] = frame[c].fillna("").astype(str)
+    frame["bank_ref"] = bank_refs(frame) if not frame.empty else pd.Series(dtype=object)
+    return frame
+
+
+# --------------------
+# Zuordnung
+# --------------------
+def _first_unique(cand: pd.DataFrame) -> pd.Series:
+    """tx -> lease_id nur, wenn genau ein Kandidat übrig bleibt."""
+    cand = cand.drop_duplicates(["tx", "lease_id"])
+    n = cand.groupby("tx")["lease_id"].transform("size")
+    return cand[n == 1].set_index("tx")["lease_id"]
+
+
+def match(frame: pd.DataFrame) -> pd.DataFrame:
+    """Ergänzt lease_id (Int64) und rule; nur Gutschriften werden zugeordnet."""
+    frame = frame.copy()
+    frame["lease_id"] = pd.Series(pd.NA, index=frame.index, dtype="Int64")
+    frame["rule"] = ""
+    credits = frame[frame["amount"] > 0]
+    leases = df_leases()
+    if credits.empty or leases is None or leases.empty:
+        return frame
+
+    tx = pd.DataFrame({"tx": credits.index, "date": credits["booking_date"].dt.normalize()})
+    active = lease_index().active_by("tenant", tx["date"].unique())   # (date, tenant_id, lease_id)
+
+    def _assign(lease_ids: pd.Series, rule: str) -> None:
+        todo = lease_ids[frame.loc[lease_ids.index, "lease_id"].isna()]
+        frame.loc[todo.index, "lease_id"] = todo.astype("int64").to_numpy()
+        frame.loc[todo.index, "rule"] = rule
+
+    # 1. IBAN -> Mieter -> am Buchungstag aktiver Vertrag
+    tenants = df_tenants()
+    if "iban" in tenants.columns:
+        ibans = tenants.assign(iban=tenants["iban"].map(normalize_iban))[["id", "iban"]]
+        ibans = ibans[ibans["iban"] != ""].rename(columns={"id": "tenant_id"})
+        cand = (tx.assign(iban=credits["iban"].to_numpy())
+                  .merge(ibans, on="iban").merge(active, on=["date", "tenant_id"]))
+        _assign(_first_unique(cand), RULE_IBAN)
+
+    # 2. Vertragsnummer im Verwendungszweck
+    ref = credits["purpose"].str.extract(LEASE_REF_RE, flags=re.IGNORECASE)[0].dropna().astype("int64")
+    ref = ref[ref.isin(leases["id"])]
+    _assign(ref, RULE_REF)
+
+    # 3. Nachname als Wort im Zahlernamen, Betrag = Warm-/Kaltmiete, Vertrag am Buchungstag aktiv
+    rents = leases[["id", "rent_cold", "rent_warm", "tenant_name"]].rename(columns={"id": "lease_id"})
+    rents = rents.melt(id_vars=["lease_id", "tenant_name"], value_vars=["rent_warm", "rent_cold"], value_name="rent").dropna(subset=["rent"])
+    rents["cents"] = (rents["rent"].astype(float) * 100).round().astype("int64")
+    rents["token"] = rents["tenant_name"].fillna("").str.split().str[-1].str.lower()
+    words = (tx.assign(cents=(credits["amount"] * 100).round().astype("int64").to_numpy(),
+                       token=credits["counterparty"].str.lower().str.findall(r"\w+").to_numpy())
+               .explode("token").dropna(subset=["token"]))
+    cand = (words.merge(rents[["lease_id", "cents", "token"]], on=["token", "cents"])
+                 .merge(active[["date", "lease_id"]], on=["date", "lease_id"]))
+    _assign(_first_unique(cand), RULE_AMOUNT_NAME)
+    return frame
+
+
+def _existing(refs: list[str], lease_ids: list[int]) -> tuple[set, pd.DataFrame]:
+    with get_engine().connect() as con:
+        known = set()
+        for i in range(0, len(refs), 900):   # SQLite-Parametergrenze
+            chunk = refs[i:i + 900]
+            marks = ",".join("?" * len(chunk))
+            known.update(r for (r,) in con.exec_driver_sql(f"SELECT bank_ref FROM payments WHERE bank_ref IN ({marks})", tuple(chunk)))
+        manual = pd.DataFrame(columns=["lease_id", "pay_date", "amount"])
+        if lease_ids:
+            marks = ",".join("?" * len(lease_ids))
+            res = con.exec_driver_sql(
+                f"SELECT lease_id, pay_date, amount FROM payments WHERE bank_ref IS NULL AND lease_id IN ({marks})", tuple(lease_ids))
+            manual = pd.DataFrame.from_records(res.fetchall(), columns=["lease_id", "pay_date", "amount"])
+    return known, manual
+
+
+def review(stream: BinaryIO, filename: str = "") -> pd.DataFrame:
+    """Datei -> Prüftabelle (REVIEW_COLUMNS); `import` ist für neue, zugeordnete Gutschriften vorbelegt."""
+    frame = match(to_frame(parse(stream, filename)))
+    lease_ids = sorted({int(i) for i in frame["lease_id"].dropna()})
+    known, manual = _existing(frame["bank_ref"].tolist(), lease_ids)
+
+    status = np.where(frame["amount"] <= 0, STATUS_DEBIT, STATUS_NEW).astype(object)
+    if not manual.empty:
+        keys = set(zip(manual["lease_id"].astype(int), pd.to_datetime(manual["pay_date"]).dt.strftime("%Y-%m-%d"),
+                       (manual["amount"].astype(float) * 100).round().astype(int)))
+        probe = zip(frame["lease_id"].fillna(-1).astype(int), frame["booking_date"].dt.strftime("%Y-%m-%d"),
+                    (frame["amount"] * 100).round().astype(int))
+        status[np.fromiter((k in keys for k in probe), dtype=bool, count=len(frame))] = STATUS_POSSIBLE_DUPLICATE
+    status[frame["bank_ref"].isin(known).to_numpy()] = STATUS_DUPLICATE
+    frame["status"] = status
+    frame["import"] = (frame["status"] == STATUS_NEW) & frame["lease_id"].notna()
+    return frame[REVIEW_COLUMNS]
+
+
+def import_payments(frame: pd.DataFrame, category: str, learn_iban: bool = True) -> dict:
+    """Übernimmt markierte Zeilen mit einem executemany in einer Transaktion.
+
+    Bereits importierte bank_refs werden per INSERT OR IGNORE übersprungen. Mit `learn_iban`
+    wird die IBAN des Zahlers bei Mietern ohne hinterlegte IBAN gespeichert.
+    """
+    rows = frame[frame["import"].astype(bool) & frame["lease_id"].notna() & (frame["amount"] > 0)]
+    if rows.empty:
+        return {"inserted": 0, "skipped": 0, "leases": 0}
+    lease_ids = rows["lease_id"].astype(int).tolist()
+    notes = (rows["counterparty"].str.strip() + ": " + rows["purpose"].str.strip()).str.strip(": ").str.slice(0, 250)
+    params = list(zip(lease_ids, pd.to_datetime(rows["booking_date"]).dt.strftime("%Y-%m-%d"),
+                      rows["amount"].astype(float), [category] * len(rows), notes, rows["bank_ref"]))
+    with get_engine().begin() as con:
+        cur = con.exec_driver_sql(
+            "INSERT OR IGNORE INTO payments (lease_id, pay_date, amount, category, note, bank_ref) VALUES (?,?,?,?,?,?)",
+            params,
+        )
+        inserted = cur.rowcount
+        if learn_iban:
+            # nur IBANs, die in dieser Datei genau einem Vertrag zugeordnet wurden und noch keinem Mieter gehören
+            pairs = pd.DataFrame({"iban": rows["iban"].to_numpy(), "lease_id": lease_ids})
+            pairs = pairs[pairs["iban"] != ""].drop_duplicates()
+            learned = pairs[~pairs["iban"].duplicated(keep=False)]
+            if not learned.empty:
+                con.exec_driver_sql(
+                    "UPDATE tenants SET iban = ? WHERE id = (SELECT tenant_id FROM leases WHERE id = ?) "
+                    "AND (iban IS NULL OR iban = '') AND NOT EXISTS (SELECT 1 FROM tenants t WHERE t.iban = ?)",
+                    [(iban, int(lid), iban) for iban, lid in zip(learned["iban"], learned["lease_id"])],
+                )
+    touched = sorted(set(lease_ids))
+    sync_ledger(touched)
+    return {"inserted": inserted, "skipped": len(rows) - inserted, "leases": len(touched)}
@@ -0,0 +1,132 @@
+# core/blobstore.py — inhaltsadressierter Dateispeicher (SHA-256) für Fotos, Avatare, Belege
+#
+# Ablage unter <DATA_DIR>/blobs/<2 Zeichen>/<sha256>; identische Dateien liegen nur einmal
+# auf der Platte. In der Datenbank steht nur der Hash (bzw. bei Belegen der relative Pfad).
+# DATA_DIR ist wie data.db relativ zum Arbeitsverzeichnis, per IMMO_DATA_DIR änderbar.
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+DATA_DIR = Path(os.environ.get("IMMO_DATA_DIR", "data"))
+BLOB_DIR = DATA_DIR / "blobs"
+CHUNK_SIZE = 1 << 20   # 1 MiB je Lese-/Schreibvorgang
+
+
+def path_for(sha: str) -> Path:
+    return BLOB_DIR / sha[:2] / sha
+
+
+def ref_for(sha: str) -> str:
+    """Relativer Pfad (zu DATA_DIR) für Spalten wie OperatingCost.document_path."""
+    return f"blobs/{sha[:2]}/{sha}"
+
+
+def sha_from_ref(ref: str | None) -> str | None:
+    return Path(ref).name if ref else None
+
+
+def put_stream(fileobj: BinaryIO) -> tuple[str, int]:
+    """Schreibt einen Datenstrom blockweise auf die Platte und hasht dabei mit.
+
+    Gibt (sha256, Größe) zurück. Existiert der Inhalt schon, wird die Temp-Datei verworfen.
+    """
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=BLOB_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(CHUNK_SIZE):
+                h.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha = h.hexdigest()
+        target = path_for(sha)
+        if target.exists():
+            os.unlink(tmp)
+            os.utime(target)          # frisch benutzt: sweep() lässt ihn bis zur Referenz in Ruhe
+        else:
+            target.parent.mkdir(exist_ok=True)
+            os.replace(tmp, target)   # atomar: nie halb geschriebene Blobs unter dem Hash
+        return sha, size
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def put_bytes(data: bytes) -> tuple[str, int]:
+    sha = hashlib.sha256(data).hexdigest()
+    target = path_for(sha)
+    if target.exists():
+        os.utime(target)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".upload-")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, target)
+    return sha, len(data)
+
+
+def exists(sha: str | None) -> bool:
+    return bool(sha) and path_for(sha).is_file()
+
+
+def get_bytes(sha: str | None) -> bytes | None:
+    if not sha:
+        return None
+    try:
+        return path_for(sha).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def open_blob(sha: str) -> BinaryIO:
+    return path_for(sha).open("rb")
+
+
+
+# Spalten mit Verweisen auf Blobs: (Tabelle, Spalte, enthält relativen Pfad statt Hash)
+REFERENCE_COLUMNS = [("unit_photos", "image_sha256", False), ("tenants", "photo_sha256", False),
+                     ("user_profile", "avatar_sha256", False), ("operating_costs", "document_path", True)]
+
+
+def referenced(con) -> set[str]:
+    """Alle Hashes, auf die noch eine Zeile verweist (`con`: SQLAlchemy-Connection)."""
+    shas: set[str] = set()
+    for table, column, is_ref in REFERENCE_COLUMNS:
+        for (value,) in con.exec_driver_sql(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL"):
+            sha = sha_from_ref(value) if is_ref else value
+            if sha:
+                shas.add(sha)
+    return shas
+
+
+def sweep(keep: Iterable[str], min_age: float = 3600, dry_run: bool = False) -> tuple[int, int]:
+    """Löscht Blobs (und liegengebliebene Uploads), die nicht in `keep` stehen.
+
+    Nur Dateien, die älter als `min_age` Sekunden sind: ein gerade hochgeladener Blob, dessen
+    Zeile noch nicht committet ist, bleibt stehen. Gibt (Anzahl, Bytes) zurück.
+    """
+    keep = set(keep)
+    cutoff = time.time() - min_age
+    count = size = 0
+    candidates = [*BLOB_DIR.glob("*/*"), *BLOB_DIR.glob(".upload-*")] if BLOB_DIR.exists() else []
+    for path in candidates:
+        if path.name in keep or not path.is_file():
+            continue
+        info = path.stat()
+        if info.st_mtime > cutoff:
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        count, size = count + 1, size + info.st_size
+    return count, size
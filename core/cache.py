@@ -0,0 +1,283 @@
+# core/cache.py — Tabellen-Versionszähler & versionierte Query-Caches
+#
+# Jede Tabelle hat einen Änderungszähler. Schreibzugriffe (ORM-Flush wie auch rohe
+# exec_driver_sql-Statements) merken sich die betroffenen Tabellen an der Connection;
+# beim COMMIT werden deren Zähler erhöht, beim ROLLBACK verworfen. Gecachte Abfragen
+# deklarieren ihre Tabellen und verwenden die aktuellen Zählerstände als Teil des
+# Cache-Schlüssels — sie bleiben lange gültig und sehen Schreibzugriffe trotzdem sofort.
+# Schreibzugriffe anderer Prozesse (CLI, zweite Instanz) kommen über das Änderungsjournal
+# (change_log, core.journal): Es wird höchstens alle JOURNAL_POLL_SECONDS sowie beim ersten
+# gecachten Aufruf nach einem eigenen COMMIT gelesen.
+#
+# Wo zwischengespeichert wird, entscheidet das Cache-Backend: im Streamlit-Server
+# st.cache_data/st.cache_resource (core/streamlit_adapter.py), sonst (CLI, Worker, Tests)
+# MemoryBackend im Prozess. core importiert streamlit nur, wenn es schon geladen ist.
+from __future__ import annotations
+
+import functools
+import hashlib
+import pickle
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+_lock = threading.Lock()
+_versions: dict[str, int] = {}
+
+_PENDING_KEY = "immo_changed_tables"
+
+JOURNAL_POLL_SECONDS = 2.0
+_journal = {"engine": None, "cursor": None, "due": 0.0}
+_journal_lock = threading.Lock()
+
+_WRITE_RE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)"
+    r"\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def table_versions(tables) -> tuple:
+    """Aktuelle Zählerstände der angegebenen Tabellen (Teil des Cache-Schlüssels)."""
+    with _lock:
+        return tuple(_versions.get(t, 0) for t in tables)
+
+
+def bump(*tables: str) -> None:
+    """Erhöht die Zähler der Tabellen -> abhängige Caches sind ab sofort ungültig."""
+    if not tables:
+        return
+    with _lock:
+        for t in tables:
+            _versions[t] = _versions.get(t, 0) + 1
+
+
+def written_table(statement: str) -> str | None:
+    m = _WRITE_RE.match(statement or "")
+    return m.group(1).lower() if m else None
+
+
+def poll_journal(force: bool = False) -> None:
+    """Erhöht die Zähler aller Tabellen, die seit dem letzten Blick ins Journal geändert wurden."""
+    engine = _journal["engine"]
+    if engine is None or (not force and time.monotonic() < _journal["due"]):
+        return
+    if not _journal_lock.acquire(blocking=False):
+        return                      # ein anderer Thread liest gerade
+    try:
+        _journal["due"] = time.monotonic() + JOURNAL_POLL_SECONDS
+        with engine.connect() as con:
+            if _journal["cursor"] is None:          # beim ersten Blick nur den Stand übernehmen
+                _journal["cursor"] = con.exec_driver_sql("SELECT IFNULL(MAX(id), 0) FROM change_log").scalar()
+                return
+            rows = con.exec_driver_sql(
+                "SELECT tbl, MAX(id) FROM change_log WHERE id > ? GROUP BY tbl", (_journal["cursor"],)).fetchall()
+        if rows:
+            bump(*(r[0] for r in rows))
+            _journal["cursor"] = max(r[1] for r in rows)
+    except OperationalError:
+        pass                        # change_log existiert noch nicht (vor Migration 12)
+    finally:
+        _journal_lock.release()
+
+
+def _pending(conn) -> set:
+    return conn.info.setdefault(_PENDING_KEY, set())
+
+
+def install_change_tracking(engine) -> None:
+    """Registriert die Events an der Engine (einmal je Engine aufrufen)."""
+    _journal["engine"] = engine
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _track_write(conn, cursor, statement, parameters, context, executemany):
+        table = written_table(statement)
+        if table:
+            _pending(conn).add(table)
+
+    @event.listens_for(engine, "commit")
+    def _bump_on_commit(conn):
+        tables = conn.info.pop(_PENDING_KEY, None)
+        if tables:
+            bump(*tables)
+            _journal["due"] = 0.0   # nächster gecachter Aufruf liest das Journal
+
+    @event.listens_for(engine, "rollback")
+    def _discard_on_rollback(conn):
+        conn.info.pop(_PENDING_KEY, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    # ORM-Schreibzugriffe: Tabellen der geflushten Objekte an der Connection vormerken
+    tables = {
+        tbl.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        for tbl in getattr(getattr(obj, "__mapper__", None), "tables", ())
+    }
+    if tables:
+        _pending(session.connection()).update(tables)
+
+
+class _Memo:
+    """LRU mit TTL für eine Funktion; Ergebnisse liegen gepickelt vor (Aufrufer erhalten Kopien)."""
+
+    def __init__(self, fn, ttl: float | None, max_entries: int | None):
+        self.fn, self.ttl, self.max_entries = fn, ttl, max_entries
+        self._entries: OrderedDict[bytes, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, fn)
+
+    def __call__(self, *args, **kwargs):
+        try:
+            key = hashlib.blake2b(pickle.dumps((args, sorted(kwargs.items())), protocol=5), digest_size=16).digest()
+        except Exception:
+            return self.fn(*args, **kwargs)      # nicht serialisierbare Argumente: ungecacht
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit and (self.ttl is None or hit[0] > now):
+                self._entries.move_to_end(key)
+                return pickle.loads(hit[1])
+        value = self.fn(*args, **kwargs)
+        expires = now + self.ttl if self.ttl is not None else 0.0
+        with self._lock:
+            self._entries[key] = (expires, pickle.dumps(value, protocol=5))
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _Resource:
+    """Ein Objekt je Argumentsatz und Prozess (Engine, Sessionmaker); wird genau einmal erzeugt."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, fn)
+
+    def __call__(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self.fn(*args, **kwargs)
+            return self._values[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MemoryBackend:
+    """Cache im Prozess, ohne Streamlit (CLI, Hintergrundjobs, Tests)."""
+    name = "memory"
+
+    def memoize(self, fn, ttl: float | None = None, max_entries: int | None = None):
+        return _Memo(fn, ttl, max_entries)
+
+    def resource(self, fn):
+        return _Resource(fn)
+
+
+_backend = None
+
+
+def running_in_streamlit() -> bool:
+    """True im Streamlit-Server (auch AppTest); importiert streamlit nicht selbst."""
+    if "streamlit" not in sys.modules:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
+
+
+def get_backend():
+    """Aktives Cache-Backend; ohne set_backend() Streamlit im Server, sonst MemoryBackend."""
+    global _backend
+    if _backend is None:
+        if running_in_streamlit():
+            from .streamlit_adapter import StreamlitBackend
+            _backend = StreamlitBackend()
+        else:
+            _backend = MemoryBackend()
+    return _backend
+
+
+def set_backend(backend) -> None:
+    """Backend festlegen (Objekt mit memoize(fn, ttl, max_entries) und resource(fn)); None = automatisch.
+
+    Bereits dekorierte Funktionen wechseln beim nächsten Aufruf.
+    """
+    global _backend
+    _backend = backend
+
+
+def _bind(make):
+    """Dekorierte Funktion erst beim Aufruf ans aktive Backend binden (Import ohne Laufzeit möglich)."""
+    state = {"backend": None, "impl": None}
+    lock = threading.Lock()
+
+    def impl():
+        backend = get_backend()
+        if state["backend"] is not backend:
+            with lock:
+                if state["backend"] is not backend:
+                    state["impl"], state["backend"] = make(backend), backend
+        return state["impl"]
+
+    def clear():
+        if state["impl"] is not None:
+            state["impl"].clear()
+    return impl, clear
+
+
+def cache_resource(fn):
+    """Prozessweite Ressource (Engine, Sessionmaker) — ersetzt st.cache_resource in core."""
+    impl, clear = _bind(lambda backend: backend.resource(fn))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return impl()(*args, **kwargs)
+
+    wrapper.clear = clear
+    return wrapper
+
+
+def cached_query(*tables: str, ttl: int = 600, max_entries: int | None = None):
+    """Cache-Decorator für Abfragen, die nur von `tables` abhängen.
+
+    Die Zählerstände der Tabellen gehen in den Schlüssel ein: Ändert sich eine der
+    Tabellen, wird beim nächsten Aufruf neu geladen; sonst bleibt das Ergebnis bis zu
+    `ttl` Sekunden (Schutz gegen Änderungen aus anderen Prozessen) im Cache.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def _versioned(versions, *args, **kwargs):
+            return fn(*args, **kwargs)
+
+        impl, clear = _bind(lambda backend: backend.memoize(_versioned, ttl=ttl, max_entries=max_entries))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            poll_journal()
+            return impl()(table_versions(tables), *args, **kwargs)
+
+        wrapper.clear = clear
+        wrapper.tables = tables
+        return wrapper
+    return deco
@@ -0,0 +1,82 @@
+# core/consumption.py — Verbrauch je Wohnung aus Zählerständen (Wasser/Heizung)
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy import text
+
+from .cache import cached_query
+from .db import get_engine
+
+# Zählertypen werden per Teilstring erkannt (Freitextfeld meters.type)
+METER_KINDS = {
+    "water": ("water", "wasser", "h2o"),
+    "heat": ("heat", "heiz", "wärme", "warm", "therm"),
+}
+
+
+def load_readings(prop_id: int) -> pd.DataFrame:
+    """Alle Zählerstände eines Objekts in einer Abfrage (meter_id, unit_id, mtype, read_date, value)."""
+    sql = text("""
+        SELECT r.meter_id, m.unit_id, m.type AS mtype, r.read_date, r.value
+        FROM meter_readings r
+        JOIN meters m ON m.id = r.meter_id
+        JOIN units u ON u.id = m.unit_id
+        WHERE u.property_id = :pid
+        ORDER BY r.read_date, r.id
+    """)
+    df = pd.read_sql(sql, get_engine(), params={"pid": int(prop_id)})
+    df["read_date"] = pd.to_datetime(df["read_date"], errors="coerce")
+    return df.dropna(subset=["read_date"])
+
+
+def meter_consumption(readings: pd.DataFrame, year: int) -> pd.DataFrame:
+    """Verbrauch je Zähler im Jahr per As-of-Join (Stand zum 01.01. bzw. 31.12.).
+
+    Liegt kein Stand vor dem Stichtag, wird der erste bzw. letzte vorhandene Stand genutzt.
+    """
+    if readings.empty:
+        return pd.DataFrame(columns=["meter_id", "unit_id", "mtype", "consumption"])
+    rd = readings.sort_values("read_date", kind="stable")
+    meters = rd.groupby("meter_id", sort=False).agg(
+        unit_id=("unit_id", "first"), mtype=("mtype", "first"),
+        first_value=("value", "first"), last_value=("value", "last"),
+    ).reset_index()
+
+    start = pd.Timestamp(year=int(year), month=1, day=1)
+    end = pd.Timestamp(year=int(year), month=12, day=31)
+    right = rd[["read_date", "meter_id", "value"]]
+
+    def _value_at(ts: pd.Timestamp) -> pd.Series:
+        left = pd.DataFrame({"meter_id": meters["meter_id"], "read_date": ts})
+        hit = pd.merge_asof(left, right, on="read_date", by="meter_id", direction="backward")
+        return hit["value"]
+
+    v0 = _value_at(start).fillna(meters["first_value"])
+    v1 = _value_at(end).fillna(meters["last_value"])
+    meters["consumption"] = (v1 - v0).clip(lower=0.0)
+    return meters[["meter_id", "unit_id", "mtype", "consumption"]]
+
+
+def _kind_mask(mtype: pd.Series, kind: str) -> pd.Series:
+    pattern = "|".join(METER_KINDS.get(kind, ()))
+    if not pattern:
+        return pd.Series(False, index=mtype.index)
+    return mtype.fillna("").str.lower().str.contains(pattern, regex=True)
+
+
+@cached_query("meter_readings", "meters", "units", max_entries=256)
+def _consumption_cached(prop_id: int, year: int, kind: str) -> dict:
+    per_meter = meter_consumption(load_readings(prop_id), year)
+    per_meter = per_meter[_kind_mask(per_meter["mtype"], kind)]
+    if per_meter.empty:
+        return {}
+    by_unit = per_meter.groupby("unit_id")["consumption"].sum()
+    return {int(u): float(v) for u, v in by_unit.items()}
+
+
+def consumption_by_unit(prop_id: int, year: int, kind: str) -> dict:
+    """Verbrauch je Wohnung {unit_id: Menge} für Objekt/Jahr; kind = 'water' | 'heat'.
+
+    Gecacht je (Objekt, Jahr, Art), bis neue Zählerstände erfasst werden.
+    """
+    return _consumption_cached(int(prop_id), int(year), kind)
@@ -1,19 +1,76 @@
 from __future__ import annotations
-from sqlalchemy import ( Column, Integer, String, Float, Boolean, Date, ForeignKey, LargeBinary, create_engine )
-from sqlalchemy.orm import declarative_base, relationship, Session, sessionmaker
+import os
+from sqlalchemy import ( Column, Integer, String, Float, Boolean, Date, ForeignKey, LargeBinary, Index, create_engine, event, text )
+from sqlalchemy.orm import declarative_base, deferred, relationship, Session, sessionmaker
 
-import streamlit as st
 import datetime as dt
 
+from . import blobstore
+from .cache import cache_resource, install_change_tracking
+
 
 DB_URL = "sqlite:///data.db"
 
+# SQLite-Verbindungsprofil: WAL (Leser blockieren Schreiber nicht), Wartezeit statt
+# sofortigem "database is locked". Jeder Wert per Umgebungsvariable IMMO_SQLITE_<NAME>
+# überschreibbar, z. B. IMMO_SQLITE_BUSY_TIMEOUT=10000.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,        # ms
+    "cache_size": -65536,        # negativ = KiB -> 64 MiB je Verbindung
+    "mmap_size": 268435456,      # 256 MiB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+# Pool für parallele Leser (mehrere Streamlit-Sessions); IMMO_DB_POOL_SIZE / IMMO_DB_MAX_OVERFLOW
+POOL_DEFAULTS = {"pool_size": 8, "max_overflow": 8, "pool_timeout": 30}
+
+
+def sqlite_profile() -> dict:
+    """Konfiguriertes Pragma-Profil inkl. Überschreibungen aus der Umgebung."""
+    return {k: os.environ.get(f"IMMO_SQLITE_{k.upper()}", v) for k, v in SQLITE_PRAGMAS.items()}
+
+
+def pool_settings() -> dict:
+    return {k: int(os.environ.get(f"IMMO_DB_{k.upper()}", v)) for k, v in POOL_DEFAULTS.items()}
+
+
+def _apply_pragmas(dbapi_con, connection_record):
+    cur = dbapi_con.cursor()
+    try:
+        for key, value in sqlite_profile().items():
+            cur.execute(f"PRAGMA {key}={value}")
+    finally:
+        cur.close()
+
+
+def effective_settings(engine=None) -> dict:
+    """Tatsächlich wirksame Pragmas einer Verbindung und Pool-Größen (für die Versionsseite)."""
+    engine = engine or get_engine()
+    with engine.connect() as con:
+        out = {k: con.exec_driver_sql(f"PRAGMA {k}").scalar() for k in SQLITE_PRAGMAS}
+    out.update({f"pool.{k}": v for k, v in pool_settings().items()})
+    return out
+
+
 # Engine/Sessionmaker cachen
-@st.cache_resource
+@cache_resource
 def get_engine():
-    return create_engine(DB_URL, future=True)
-
-@st.cache_resource
+    profile = sqlite_profile()
+    engine = create_engine(
+        DB_URL, future=True,
+        connect_args={"timeout": int(profile["busy_timeout"]) / 1000, "check_same_thread": False},
+        **pool_settings(),
+    )
+    event.listen(engine, "connect", _apply_pragmas)
+    install_change_tracking(engine)   # Tabellen-Versionszähler für die Query-Caches
+    # einmal je Prozess; bei aktuellem Schema nur ein PRAGMA user_version
+    from .migrations import migrate
+    migrate(engine)
+    return engine
+
+@cache_resource
 def get_sessionmaker():
     return sessionmaker(bind=get_engine(), future=True, expire_on_commit=False)
 
@@ -78,8 +135,11 @@ class Tenant(BaseModel):
     email = Column(String, nullable=True)
     notes = Column(String, nullable=True)
     birth_date = Column(Date, nullable=True)
-    photo = Column(LargeBinary, nullable=True)
+    photo = deferred(Column(LargeBinary, nullable=True))   # Altbestand; Bilder liegen im Blob-Store
+    photo_sha256 = Column(String, nullable=True)             # core.blobstore
+    photo_size = Column(Integer, nullable=True)
     photo_filename = Column(String, nullable=True)
+    iban = Column(String, nullable=True)          # Zuordnung beim Bankimport (ohne Leerzeichen, Großbuchstaben)
 
     leases = relationship("Lease", back_populates="tenant", cascade="all, delete-orphan")
 
@@ -97,6 +157,8 @@ class Lease(BaseModel):
     tenant = relationship("Tenant", back_populates="leases")
     payments = relationship("Payment", back_populates="lease", cascade="all, delete-orphan")
 
+    __table_args__ = (Index("ix_leases_unit_start_end", "unit_id", "start_date", "end_date"),)
+
 class Payment(BaseModel):
     __tablename__ = "payments"
     lease_id = Column(Integer, ForeignKey("leases.id"), nullable=False)
@@ -104,9 +166,15 @@ class Payment(BaseModel):
     amount = Column(Float, nullable=False)
     category = Column(String, nullable=False, default="Miete")
     note = Column(String, nullable=True)
+    bank_ref = Column(String, nullable=True)      # Umsatz-ID aus dem Bankimport (Dublettenschutz)
 
     lease = relationship("Lease", back_populates="payments")
 
+    __table_args__ = (
+        Index("ix_payments_lease_pay_date", "lease_id", "pay_date"),
+        Index("ux_payments_bank_ref", "bank_ref", unique=True, sqlite_where=bank_ref.isnot(None)),
+    )
+
 class MaintenanceTask(BaseModel):
     __tablename__ = "maintenance_tasks"
     property_id = Column(Integer, ForeignKey("properties.id"), nullable=False)
@@ -124,7 +192,9 @@ class UserProfile(BaseModel):
     first_name = Column(String, nullable=True)
     last_name  = Column(String, nullable=True)
     email      = Column(String, nullable=True)
-    avatar     = Column(LargeBinary, nullable=True)  # <— NEU
+    avatar     = deferred(Column(LargeBinary, nullable=True))  # Altbestand; Bilder liegen im Blob-Store
+    avatar_sha256 = Column(String, nullable=True)               # core.blobstore
+    avatar_size   = Column(Integer, nullable=True)
 
 class Financing(BaseModel):
     __tablename__ = "financings"
@@ -154,7 +224,9 @@ class UnitPhoto(BaseModel):
     __tablename__ = "unit_photos"
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
     filename = Column(String, nullable=True)
-    image = Column(LargeBinary, nullable=False)  # gespeichertes Bild
+    image = deferred(Column(LargeBinary, nullable=False, default=b""))  # Altbestand (X''); Bild im Blob-Store
+    image_sha256 = Column(String, nullable=True)   # core.blobstore
+    image_size = Column(Integer, nullable=True)
     uploaded_at = Column(Date, nullable=False, default=dt.date.today)
     position = Column(Integer, nullable=True)  # Reihenfolge für Anzeige
 
@@ -189,6 +261,8 @@ class MeterReading(BaseModel):
 
     meter = relationship("Meter", back_populates="readings")
 
+    __table_args__ = (Index("ix_meter_readings_meter_read_date", "meter_id", "read_date"),)
+
 
 
 
@@ -200,6 +274,9 @@ class CostCategory(BaseModel):
     allocation_method = Column(String, nullable=False, default="UNITS")  # AREA, UNITS, PERSONS, WATER_M3, HEAT_SPLIT_70_30, FIXED
     is_heating = Column(Boolean, default=False)
 
+    # operating_costs.category_code verweist auf code -> muss eindeutig sein (sonst "foreign key mismatch")
+    __table_args__ = (Index("ux_cost_categories_code", "code", unique=True),)
+
 class OperatingCost(BaseModel):
     __tablename__ = "operating_costs"
     property_id = Column(Integer, ForeignKey("properties.id"), nullable=False)
@@ -213,7 +290,9 @@ class OperatingCost(BaseModel):
     supplier = Column(String, nullable=True)
     invoice_no = Column(String, nullable=True)
     description = Column(String, nullable=True)
-    document_path = Column(String, nullable=True)
+    document_path = Column(String, nullable=True)   # relativ zu blobstore.DATA_DIR
+
+    __table_args__ = (Index("ix_operating_costs_property_date", "property_id", "date"),)
 
 class PropertySetting(BaseModel):
     __tablename__ = "property_settings"
@@ -228,129 +307,65 @@ class UnitPersons(BaseModel):
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
     year = Column(Integer, nullable=False)
     persons = Column(Integer, nullable=False, default=0)
-# --------------------
-# DB-Init & Session-Kontext
-# --------------------
-# --- init_db anpassen (Schema-Version erhöhen & Spalten nachziehen) ---
-@st.cache_resource
-def init_db(schema_version: int = 8):
-    Base.metadata.create_all(get_engine())
 
-    # Ensure optional Tenant columns exist
-    try:
-        with get_engine().begin() as con:
-            cols = [r[1] for r in con.exec_driver_sql("PRAGMA table_info(tenants)").fetchall()]
-            if 'birth_date' not in cols:
-                con.exec_driver_sql("ALTER TABLE tenants ADD COLUMN birth_date DATE")
-            if 'photo' not in cols:
-                con.exec_driver_sql("ALTER TABLE tenants ADD COLUMN photo BLOB")
-            if 'photo_filename' not in cols:
-                con.exec_driver_sql("ALTER TABLE tenants ADD COLUMN photo_filename TEXT")
-    except Exception:
-        pass
-
-    # Seed default cost categories and property settings
-    try:
-        with get_engine().begin() as con:
-            # Seed categories if empty
-            cnt = con.exec_driver_sql("SELECT COUNT(*) FROM cost_categories").scalar()
-            if cnt is None or cnt == 0:
-                seed = [
-                    ('GRUNDSTEUER','Grundsteuer', 'Property tax', 'AREA', 0),
-                    ('GEB_VERS','Gebäudeversicherung', 'Building insurance', 'AREA', 0),
-                    ('HAUSSTROM','Allgemeinstrom', 'Common electricity', 'UNITS', 0),
-                    ('REINIGUNG','Hausreinigung', 'Cleaning', 'UNITS', 0),
-                    ('GARTEN','Gartenpflege', 'Garden', 'UNITS', 0),
-                    ('MUELL','Müll', 'Waste', 'PERSONS', 0),
-                    ('WASSER','Wasser/Abwasser', 'Water/Sewage', 'WATER_M3', 0),
-                    ('HEIZ_BRENN','Heizung Brennstoff', 'Heating fuel', 'HEAT_SPLIT_70_30', 1),
-                    ('HEIZ_WART','Heizung Wartung', 'Heating service', 'HEAT_SPLIT_70_30', 1),
-                    ('SCHORN','Schornsteinfeger', 'Chimney sweep', 'HEAT_SPLIT_70_30', 1),
-                    ('HAUSMEISTER','Hausmeister', 'Janitor', 'UNITS', 0),
-                    ('SONSTIGE_BK','Sonstige BK', 'Other costs', 'UNITS', 0)
-                ]
-                for code,n_de,n_en,alloc,heat in seed:
-                    con.exec_driver_sql(
-                        "INSERT INTO cost_categories (code,name,name_en,allocation_method,is_heating) VALUES (?,?,?,?,?)",
-                        (code,n_de,n_en,alloc,heat)
-                    )
-            # Ensure property_settings for all properties
-            try:
-                rows = con.exec_driver_sql("SELECT id FROM properties").fetchall()
-                for (pid,) in rows:
-                    ex = con.exec_driver_sql("SELECT 1 FROM property_settings WHERE property_id=?", (pid,)).fetchone()
-                    if not ex:
-                        con.exec_driver_sql("INSERT INTO property_settings (property_id,heat_ratio_consumption,persons_default,water_allocation_fallback) VALUES (?,?,?,?)", (pid,70,2,'PERSONS'))
-            except Exception:
-                pass
-    except Exception:
-        pass
+# Sollstellung (core.rentroll): abgeleitete Daten, werden aus `leases` neu berechnet
+class RentDue(BaseModel):
+    __tablename__ = "rent_due"
+    lease_id = Column(Integer, ForeignKey("leases.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)               # Monatserster
+    due_cold = Column(Float, nullable=False)           # anteilig bei Beginn/Ende im Monat
+    due_warm = Column(Float, nullable=False)
+
+    __table_args__ = (Index("ux_rent_due_lease_month", "lease_id", "month", unique=True),)
+
+class RentRollState(BaseModel):
+    __tablename__ = "rent_roll_state"
+    lease_id = Column(Integer, ForeignKey("leases.id", ondelete="CASCADE"), nullable=False, unique=True)
+    fingerprint = Column(Integer, nullable=False)      # Hash über Beginn/Ende/Mieten
+    through = Column(Date, nullable=True)              # letzter berechneter Monat
+
+# Offene-Posten-Liste (core.reconciliation): Sollposten nach FIFO mit Zahlungen verrechnet
+class OpenItem(BaseModel):
+    __tablename__ = "open_items"
+    lease_id = Column(Integer, ForeignKey("leases.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)
+    kind = Column(String, nullable=False)              # RENT | ADVANCE (NK-Vorauszahlung)
+    due_date = Column(Date, nullable=False)
+    amount = Column(Float, nullable=False)
+    paid = Column(Float, nullable=False)
+    open = Column(Float, nullable=False)
+    settled_on = Column(Date, nullable=True)           # Datum der Zahlung, die den Posten ausgeglichen hat
 
+    __table_args__ = (Index("ix_open_items_lease_due", "lease_id", "due_date"),)
 
-    # Seed: Finanzierung für Whg 1 im Objekt Musterstraße 1 (idempotent)
-    try:
-        from sqlalchemy import select
-        with get_engine().connect() as con:
-            # Fetch property id
-            pid = None
-            try:
-                rows = con.exec_driver_sql("SELECT id,label,name,address FROM properties").fetchall()
-                for r in rows:
-                    lbl = (r[1] or r[2] or "" ).lower()
-                    addr = (r[3] or "").lower()
-                    if "musterstraße 1" in lbl or "musterstraße 1" in addr:
-                        pid = r[0]; break
-            except Exception:
-                pid = None
-            if pid is not None:
-                # find unit with unit_label like '1' or id=1 in that property
-                rows = con.exec_driver_sql(f"SELECT id, unit_label FROM units WHERE property_id={pid}").fetchall()
-                uid = None
-                for r in rows:
-                    ulbl = (r[1] or "").strip()
-                    if ulbl == "1" or ulbl.lower().startswith("whg 1") or r[0] == 1:
-                        uid = r[0]; break
-                if uid is not None:
-                    # check existing financing for this unit
-                    rows = con.exec_driver_sql(f"SELECT COUNT(1) FROM financings WHERE unit_id={uid}").fetchone()
-                    has = int(rows[0]) if rows else 0
-                    if has == 0:
-                        # insert demo financing
-                        con.exec_driver_sql(
-                            "INSERT INTO financings (unit_id, bank, interest_rate, principal_amount, start_date, end_date, monthly_payment) "
-                            f"VALUES ({uid}, 'DemoBank', 3.2, 200000, date('now','-2 years'), NULL, 950)"
-                        )
-
-    except Exception as e:
-        pass
-    # Migration: UnitPhoto.position hinzufügen, falls fehlt
-    try:
-        eng = get_engine()
-        with eng.connect() as con:
-            cols = con.exec_driver_sql("PRAGMA table_info(unit_photos)").fetchall()
-            colnames = {c[1] for c in cols}
-            if 'position' not in colnames:
-                con.exec_driver_sql("ALTER TABLE unit_photos ADD COLUMN position INTEGER")
-    except Exception:
-        pass
-
-    # Lightweight migration: add Unit.notes if missing
-    try:
-        eng = get_engine()
-        with eng.connect() as con:
-            cols = con.exec_driver_sql("PRAGMA table_info(units)").fetchall()
-            colnames = {c[1] for c in cols}
-            if 'notes' not in colnames:
-                con.exec_driver_sql("ALTER TABLE units ADD COLUMN notes TEXT")
-    except Exception as _e:
-        pass
-    # falls du PRAGMA-basierte Migrationen hast (year_built, avatar, owned_by_me, features etc.),
-    # bitte UNVERÄNDERT beibehalten – create_all legt 'financings' automatisch an, wenn sie fehlt.
-    return True
+class LedgerState(BaseModel):
+    __tablename__ = "ledger_state"
+    lease_id = Column(Integer, ForeignKey("leases.id", ondelete="CASCADE"), nullable=False, unique=True)
+    stamp = Column(String, nullable=False)             # Fingerabdruck über Zahlungen + Sollposten des Vertrags
+    credit = Column(Float, nullable=False, default=0.0)  # Überzahlung
 
+# Änderungsjournal (core.journal): per Trigger befüllt, nur anhängen; id ist der Sync-Cursor
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    id = Column(Integer, primary_key=True)
+    tbl = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)           # id der geänderten Zeile (BaseModel.id)
+    op = Column(String(1), nullable=False)             # I | U | D
+    changed_at = Column(String, nullable=False, server_default=text("(strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"))
 
+    # AUTOINCREMENT: ids werden auch nach dem Ausdünnen nie wiederverwendet (Cursor bleibt monoton)
+    __table_args__ = (Index("ix_change_log_tbl_id", "tbl", "id"), {"sqlite_autoincrement": True})
 
 
+# --------------------
+# DB-Init & Session-Kontext
+# --------------------
+# Schema-Migrationen: core/migrations.py (Stand in PRAGMA user_version)
+@cache_resource
+def init_db(schema_version: int | None = None):
+    """Bringt das Schema auf den neuesten Stand; `schema_version` nur noch aus Kompatibilität."""
+    from .migrations import migrate
+    return migrate(get_engine())
 
 
 class SessionCtx:
@@ -405,7 +420,7 @@ Geburtsdatum, Foto) mit Demodaten. Existierende Werte werden nicht überschriebe
                 t.birth_date = _dt.date(year, month, day)
                 changed = True
             # Photo
-            if not getattr(t, "photo", None):
+            if not t.photo_sha256:
                 if pil_ok:
                     # Avatar mit Initialen
                     initials = "".join([part[0].upper() for part in t.full_name.split() if part])[:2] or "M"
@@ -420,7 +435,8 @@ Geburtsdatum, Foto) mit Demodaten. Existierende Werte werden nicht überschriebe
                         font = ImageFont.load_default()
                     w, htxt = draw.textsize(initials, font=font)
                     draw.text(((256-w)/2, (256-htxt)/2), initials, fill=(255,255,255), font=font)
-                    buf = io.BytesIO(); img.save(buf, format="PNG"); t.photo = buf.getvalue()
+                    buf = io.BytesIO(); img.save(buf, format="PNG")
+                    t.photo_sha256, t.photo_size = blobstore.put_bytes(buf.getvalue())
                     t.photo_filename = f"avatar_{t.id or 0}.png"
                     changed = True
             if changed:
@@ -441,6 +457,22 @@ class User(BaseModel):
     is_active = Column(Boolean, default=True)
     created_at = Column(Date, default=dt.date.today)
 
+# Anmeldesitzungen (core.sessions): im Cookie steht nur das signierte Token, hier dessen Hash
+class UserSession(BaseModel):
+    __tablename__ = "sessions"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    token_hash = Column(String, nullable=False)
+    created_at = Column(String, nullable=False)        # ISO-Zeitstempel UTC, textuell vergleichbar
+    expires_at = Column(String, nullable=False)
+    revoked_at = Column(String, nullable=True)
+    ip = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ux_sessions_token_hash", "token_hash", unique=True),
+        Index("ix_sessions_expires_at", "expires_at"),
+    )
+
 
 def ensure_admin_user(username: str, password_hash: str, role: str = "admin", email: str | None = None, full_name: str | None = None):
     with SessionCtx() as s:
@@ -467,11 +499,3 @@ def load_credentials_for_auth():
                 "password": u.password_hash,
             }
         return cred
-
-def _post_models_create_all():
-    try:
-        Base.metadata.create_all(get_engine())
-    except Exception:
-        pass
-
-_post_models_create_all()
@@ -0,0 +1,358 @@
+# core/export.py — Vollexport aller Tabellen (XLSX, CSV-ZIP, Parquet-ZIP)
+#
+# Jede Tabelle wird über einen SQL-Cursor in Blöcken (fetchmany) gelesen und sofort in die
+# Zieldatei geschrieben — es liegt nie eine ganze Tabelle, geschweige denn die ganze Datei,
+# im Speicher. XLSX über xlsxwriter im constant_memory-Modus (zeilenweise auf Platte),
+# CSV und Parquet als ZIP mit einer Datei je Tabelle. Exportdateien liegen unter
+# <DATA_DIR>/exports und tragen den Datenstand im Namen: Solange sich nichts ändert, wird die
+# vorhandene Datei wiederverwendet, nach einer Änderung neu erzeugt (nie veraltet).
+# Erzeugt wird im Hintergrund-Thread; die Seite fragt nur den Auftragsstatus ab.
+# Änderungsexport: nur die laut Journal (core.journal) seit einem Cursor geänderten Zeilen,
+# mit zusätzlicher Spalte _op (I/U/D); gelöschte Zeilen tragen nur _op und id.
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pandas as pd
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, LargeBinary, Numeric, Table
+
+from . import blobstore, journal
+from .cache import table_versions
+from .db import Base, get_engine
+
+EXPORT_DIR = blobstore.DATA_DIR / "exports"
+CHUNK_ROWS = 5_000
+IN_CHUNK = 500                      # ids je IN (...)-Abfrage im Änderungsexport
+KEEP_FILES = 2                      # je Format ältere Exporte darüber hinaus löschen
+XLSX_MAX_ROWS = 1_048_575           # Excel-Zeilenlimit ohne Kopfzeile
+
+# Nicht exportieren: Zugangsdaten und Alt-BLOBs (Inhalte liegen im Blob-Store)
+EXCLUDED_COLUMNS = {("users", "password_hash")}
+
+FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv.zip", "application/zip"),
+    "parquet": ("parquet.zip", "application/zip"),
+}
+
+
+def export_tables() -> list[Table]:
+    return [t for t in Base.metadata.sorted_tables if t.name not in journal.VOLATILE_TABLES]
+
+
+def export_columns(table: Table) -> list:
+    return [c for c in table.columns
+            if not isinstance(c.type, LargeBinary) and (table.name, c.name) not in EXCLUDED_COLUMNS]
+
+
+def data_version(tables: list[Table] | None = None) -> str:
+    """Kurzer Schlüssel über den Datenstand: Journal-Cursor (erfasst auch andere Prozesse) plus
+    Änderungszähler, Zeilenzahl und höchste rowid der nicht protokollierten abgeleiteten Tabellen."""
+    tables = export_tables() if tables is None else tables
+    names = [t.name for t in tables]
+    derived = [n for n in names if n in journal.DERIVED_TABLES]
+    with get_engine().connect() as con:
+        cursor = journal.current_cursor(con)
+        sizes = [tuple(con.exec_driver_sql(f'SELECT COUNT(*), IFNULL(MAX(rowid), 0) FROM "{n}"').one()) for n in derived]
+    return hashlib.sha1(repr((names, cursor, table_versions(derived), sizes)).encode()).hexdigest()[:16]
+
+
+# --------------------
+# Lesen
+# --------------------
+def _converter(sa_type) -> Callable | None:
+    """SQLite liefert Datum/Zeit als ISO-Text -> Python-Objekte für XLSX/Parquet."""
+    if isinstance(sa_type, DateTime):
+        return lambda v: dt.datetime.fromisoformat(v) if isinstance(v, str) else v
+    if isinstance(sa_type, Date):
+        return lambda v: dt.date.fromisoformat(v[:10]) if isinstance(v, str) else v
+    if isinstance(sa_type, Boolean):
+        return lambda v: None if v is None else bool(v)
+    return None
+
+
+def iter_chunks(table: Table, chunk_rows: int = CHUNK_ROWS, typed: bool = True,
+                ids: list[int] | None = None) -> Iterator[list[tuple]]:
+    """Zeilenblöcke einer Tabelle direkt vom Cursor; `typed` wandelt Datum/Bool um.
+
+    Mit `ids` nur die Zeilen mit diesen ids (Spalte id, nicht rowid: die ist nicht bei jeder
+    Tabelle der Schlüssel und kann sich durch VACUUM ändern).
+    """
+    cols = export_columns(table)
+    convert = [_converter(c.type) if typed else None for c in cols]
+    sql = "SELECT " + ", ".join(f'"{c.name}"' for c in cols) + f' FROM "{table.name}"'
+    with get_engine().connect() as con:
+        if ids is None:
+            batches = [con.exec_driver_sql(sql + " ORDER BY rowid")]
+        else:
+            batches = (con.exec_driver_sql(f"{sql} WHERE id IN ({','.join('?' * len(part))}) ORDER BY id", tuple(part))
+                       for part in (ids[i:i + IN_CHUNK] for i in range(0, len(ids), IN_CHUNK)))
+        for res in batches:
+            while rows := res.fetchmany(chunk_rows):
+                if any(convert):
+                    rows = [tuple(f(v) if f and v is not None else v for f, v in zip(convert, row)) for row in rows]
+                yield rows
+
+
+def header(table: Table, changes: pd.DataFrame | None = None) -> list[str]:
+    names = [c.name for c in export_columns(table)]
+    return names if changes is None else ["_op", *names]
+
+
+def table_rows(table: Table, changes: pd.DataFrame | None = None, typed: bool = True) -> Iterator[list[tuple]]:
+    """Zeilenblöcke für den Export: alle Zeilen, oder laut `changes` (journal.changes) nur geänderte."""
+    if changes is None:
+        yield from iter_chunks(table, typed=typed)
+        return
+    sel = changes[changes["tbl"] == table.name]
+    ops = dict(zip(sel["row_id"].astype(int), sel["op"]))
+    names = [c.name for c in export_columns(table)]
+    pos = names.index("id")
+    upserts = sorted(i for i, op in ops.items() if op != "D")
+    for rows in iter_chunks(table, typed=typed, ids=upserts):
+        yield [(ops[row[pos]], *row) for row in rows]
+    deleted = sorted(i for i, op in ops.items() if op == "D")
+    for i in range(0, len(deleted), CHUNK_ROWS):
+        yield [("D", *(pk if j == pos else None for j in range(len(names)))) for pk in deleted[i:i + CHUNK_ROWS]]
+
+
+# --------------------
+# Schreiben
+# --------------------
+Progress = Callable[[int, int, str], None]
+
+
+def write_xlsx(path: Path, tables: list[Table], progress: Progress | None = None,
+               changes: pd.DataFrame | None = None) -> None:
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(str(path), {"constant_memory": True, "default_date_format": "yyyy-mm-dd",
+                                         "strings_to_numbers": False, "strings_to_formulas": False, "strings_to_urls": False})
+    head = wb.add_format({"bold": True})
+    try:
+        for n, table in enumerate(tables):
+            names = header(table, changes)
+            ws, sheet_no, row_no = None, 0, 0
+            for rows in table_rows(table, changes):
+                for row in rows:
+                    if ws is None or row_no > XLSX_MAX_ROWS:
+                        sheet_no += 1
+                        ws = wb.add_worksheet(table.name[:28] if sheet_no == 1 else f"{table.name[:24]} ({sheet_no})")
+                        ws.write_row(0, 0, names, head)
+                        ws.freeze_panes(1, 0)
+                        row_no = 1
+                    ws.write_row(row_no, 0, row)
+                    row_no += 1
+            if ws is None:
+                ws = wb.add_worksheet(table.name[:28])
+                ws.write_row(0, 0, names, head)
+            if progress:
+                progress(n + 1, len(tables), table.name)
+    finally:
+        wb.close()
+
+
+def write_csv_zip(path: Path, tables: list[Table], progress: Progress | None = None,
+                  changes: pd.DataFrame | None = None) -> None:
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for n, table in enumerate(tables):
+            with zf.open(f"{table.name}.csv", "w") as raw, \
+                    io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as out:
+                writer = csv.writer(out, delimiter=";")
+                writer.writerow(header(table, changes))
+                for rows in table_rows(table, changes, typed=False):
+                    writer.writerows(rows)
+            if progress:
+                progress(n + 1, len(tables), table.name)
+
+
+def _arrow_schema(table: Table, changes: pd.DataFrame | None = None):
+    import pyarrow as pa
+
+    def _type(sa_type):
+        if isinstance(sa_type, Boolean):
+            return pa.bool_()
+        if isinstance(sa_type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(sa_type, Date):
+            return pa.date32()
+        if isinstance(sa_type, Integer):
+            return pa.int64()
+        if isinstance(sa_type, (Float, Numeric)):
+            return pa.float64()
+        return pa.string()
+    fields = [pa.field(c.name, _type(c.type)) for c in export_columns(table)]
+    if changes is not None:
+        fields = [pa.field("_op", pa.string()), *fields]
+    return pa.schema(fields)
+
+
+def write_parquet_zip(path: Path, tables: list[Table], progress: Progress | None = None,
+                      changes: pd.DataFrame | None = None) -> None:
+    """Eine Parquet-Datei je Tabelle (ein Row-Group je Block), gesammelt in einem ZIP."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf, \
+            tempfile.TemporaryDirectory(dir=path.parent) as tmp:
+        for n, table in enumerate(tables):
+            schema = _arrow_schema(table, changes)
+            part = Path(tmp) / f"{table.name}.parquet"
+            with pq.ParquetWriter(part, schema, compression="zstd") as writer:
+                for rows in table_rows(table, changes):
+                    columns = list(zip(*rows))
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema))
+            zf.write(part, part.name)
+            part.unlink()
+            if progress:
+                progress(n + 1, len(tables), table.name)
+
+
+WRITERS = {"xlsx": write_xlsx, "csv": write_csv_zip, "parquet": write_parquet_zip}
+
+
+def export_path(fmt: str, version: str) -> Path:
+    return EXPORT_DIR / f"immo-export-{version}.{FORMATS[fmt][0]}"
+
+
+def changes_path(fmt: str, since: int, until: int) -> Path:
+    return EXPORT_DIR / f"immo-changes-{since}-{until}.{FORMATS[fmt][0]}"
+
+
+def _prune(fmt: str, keep: Path, prefix: str = "immo-export-") -> None:
+    suffix = "." + FORMATS[fmt][0]
+    old = sorted((p for p in EXPORT_DIR.glob(prefix + "*" + suffix) if p != keep),
+                 key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in old[KEEP_FILES - 1:]:
+        p.unlink(missing_ok=True)
+
+
+def _write(fmt: str, target: Path, tables: list[Table], progress: Progress | None,
+           changes: pd.DataFrame | None = None) -> None:
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=EXPORT_DIR, prefix=".export-")
+    os.close(fd)
+    try:
+        WRITERS[fmt](Path(tmp), tables, progress, changes)
+        os.replace(tmp, target)    # erst fertige Dateien tragen den endgültigen Namen
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def build(fmt: str, version: str | None = None, progress: Progress | None = None) -> Path:
+    """Schreibt den Export (falls für diesen Datenstand noch nicht vorhanden) und gibt den Pfad zurück."""
+    tables = export_tables()
+    version = version or data_version(tables)
+    target = export_path(fmt, version)
+    if target.exists():
+        return target
+    _write(fmt, target, tables, progress)
+    _prune(fmt, target)
+    return target
+
+
+def build_changes(fmt: str, since: int, until: int | None = None, progress: Progress | None = None) -> tuple[Path, int]:
+    """Änderungsexport (since, until] — nur Tabellen mit Änderungen; gibt Pfad und neuen Cursor zurück."""
+    with get_engine().connect() as con:
+        until = journal.current_cursor(con) if until is None else int(until)
+        if not journal.covers(since, con):
+            raise ValueError(f"Änderungsjournal reicht nicht bis Cursor {since} zurück — bitte Vollexport erstellen.")
+    target = changes_path(fmt, since, until)
+    if not target.exists():
+        changes = journal.changes(since, until)
+        tables = [t for t in export_tables() if t.name in set(changes["tbl"])]
+        _write(fmt, target, tables, progress, changes)
+        _prune(fmt, target, "immo-changes-")
+    return target, until
+
+
+# --------------------
+# Hintergrundaufträge
+# --------------------
+@dataclass
+class ExportJob:
+    fmt: str
+    version: str
+    since: int | None = None            # gesetzt: Änderungsexport ab diesem Journal-Cursor
+    until: int | None = None
+    done: int = 0
+    total: int = 0
+    current: str = ""
+    path: Path | None = None
+    error: str | None = None
+    finished: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def running(self) -> bool:
+        return not self.finished.is_set()
+
+    def _progress(self, done: int, total: int, table: str) -> None:
+        self.done, self.total, self.current = done, total, table
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+_jobs: dict[tuple[str, str], ExportJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def _run(job: ExportJob) -> None:
+    try:
+        if job.since is None:
+            job.path = build(job.fmt, job.version, job._progress)
+        else:
+            job.path, _ = build_changes(job.fmt, job.since, job.until, job._progress)
+    except Exception as exc:   # Fehler im Auftrag anzeigen statt im Thread verschlucken
+        job.error = f"{type(exc).__name__}: {exc}"
+    finally:
+        job.finished.set()
+
+
+def _job_version(since: int | None) -> tuple[str, int | None]:
+    if since is None:
+        return data_version(), None
+    until = journal.current_cursor()
+    return f"changes-{int(since)}-{until}", until
+
+
+def start_export(fmt: str, since: int | None = None) -> ExportJob:
+    """Startet (oder findet) den Export für den aktuellen Datenstand; ein Auftrag je Format und Stand.
+
+    Mit `since` nur die Änderungen seit diesem Journal-Cursor.
+    """
+    version, until = _job_version(since)
+    with _jobs_lock:
+        job = _jobs.get((fmt, version))
+        if job is None or job.error:
+            job = ExportJob(fmt, version, since=since, until=until, total=len(export_tables()))
+            existing = export_path(fmt, version) if since is None else changes_path(fmt, since, until)
+            if existing.exists():
+                job.path, job.done = existing, job.total
+                job.finished.set()
+            else:
+                _executor.submit(_run, job)
+            _jobs[(fmt, version)] = job
+    return job
+
+
+def current_job(fmt: str, since: int | None = None) -> ExportJob | None:
+    """Auftrag zum aktuellen Datenstand, falls schon gestartet (oder Datei vorhanden)."""
+    version, until = _job_version(since)
+    with _jobs_lock:
+        job = _jobs.get((fmt, version))
+    path = export_path(fmt, version) if since is None else changes_path(fmt, since, until)
+    if job is None and path.exists():
+        return start_export(fmt, since)
+    return job
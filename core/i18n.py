@@ -1,367 +1,77 @@
-from __future__ import annotations
-import streamlit as st
-
-LANGS = ["de", "en", "fr", "es"]
-
-TRANSLATIONS = {
-    "de": {
-        # global
-        "app_title": "Property Manager",
-        "choose_section": "Bereich wählen",
-        "local_data_hint": "Daten liegen lokal in data.db. Zum Sichern: Datei kopieren oder Export nutzen.",
-        "save": "Speichern", "delete": "Löschen", "select": "Auswählen",
-        "created": "Angelegt.", "changes_saved": "Gespeichert.", "deleted": "Gelöscht.",
-        "not_available": "Noch keine Daten vorhanden.", "please_enter_name": "Bitte einen Namen angeben.",
-        "german": "Deutsch", "english": "Englisch", "french": "Französisch", "spanish": "Spanisch",
-        # dashboard
-        "dashboard": "Dashboard", "overview": "Überblick",
-        "properties_count": "Objekte", "units_count": "Wohnungen", "active_leases": "Aktive Mietverträge",
-        "rent_sum": "Kaltmiete/Monat (∑)", "latest_payments": "Letzte Zahlungen",
-        # settings
-        "settings": "Einstellungen", "language": "Sprache", "language_changed": "Sprache umgestellt.",
-        # properties
-        "properties": "Objekte", "property_overview": "Objektübersicht",
-        "create_property": "Neues Objekt anlegen", "edit_delete_property": "Objekt bearbeiten / löschen",
-        "name": "Name", "address": "Adresse", "postal_code": "PLZ", "city": "Ort",
-        "purchase_price": "Kaufpreis (€)", "size_sqm": "Fläche (m²)", "notes": "Notizen",
-        "select_property": "Objekt wählen", "no_properties": "Noch keine Objekte vorhanden.",
-        "cannot_delete_units": "Löschen nicht möglich: Es sind noch Wohnungen verknüpft.",
-        "actions_hint": "Aktionen: ➕ neues Objekt · 🛠️ bearbeiten/löschen (Hover für Erklärung)",
-        # units
-        "units": "Wohnungen", "new_unit": "Neue Wohnung anlegen", "edit_delete_unit": "Wohnung bearbeiten / löschen",
-        "property": "Objekt", "unit_label": "Wohnungsbezeichnung", "rooms": "Zimmer",
-        "living_area_sqm": "Wohnfläche (m²)", "rent_cold_current": "aktuelle Kaltmiete (€)", "is_rented": "vermietet",
-        "no_units": "Noch keine Wohnungen vorhanden.", "select_unit": "Wohnung wählen",
-        # tenants
-        "tenants": "Mieter", "new_tenant": "Neuen Mieter anlegen", "edit_delete_tenant": "Mieter bearbeiten / löschen",
-        "full_name": "Vollständiger Name", "phone": "Telefon", "email": "E-Mail", "no_tenants": "Noch keine Mieter vorhanden.",
-        "select_tenant": "Mieter wählen",
-        # leases
-        "leases": "Mietverträge", "new_lease": "Neuen Mietvertrag anlegen",
-        "select_lease": "Mietvertrag wählen", "end_lease_today": "Mietvertrag beenden (heute)", "delete_lease": "Mietvertrag löschen",
-        "unit": "Wohnung", "tenant": "Mieter", "start_date": "Startdatum", "end_date_optional": "Ende (optional)",
-        "rent_cold": "Kaltmiete (€)", "rent_warm": "Warmmiete (€)", "deposit": "Kaution (€)",
-        "no_leases": "Noch keine Mietverträge vorhanden.", "need_units_tenants_first": "Bitte zuerst Wohnungen und Mieter anlegen.",
-        # payments
-        "payments": "Zahlungen", "record_payment": "Zahlung erfassen", "date": "Datum", "amount": "Betrag (€)",
-        "category": "Kategorie", "note": "Notiz", "payment_recorded": "Zahlung erfasst.",
-        "need_lease_first": "Bitte zuerst einen Mietvertrag anlegen.",
-        "cat_rent": "Miete", "cat_nk": "NK", "cat_deposit": "Kaution", "cat_other": "Sonstiges",
-        # tasks
-        "tasks": "Wartung & Aufgaben", "new_task": "Neue Aufgabe", "edit_delete_task": "Aufgabe aktualisieren / löschen",
-        "status": "Status", "due_date": "Fällig am", "cost_estimate": "Kosten (geschätzt)", "task_title": "Titel",
-        "select_task": "Aufgabe wählen", "no_tasks": "Noch keine Aufgaben vorhanden.",
-        "status_open": "offen", "status_in_progress": "in Arbeit", "status_done": "erledigt",
-        # export
-        "export": "Export / Backup", "export_desc": "Exportiert alle Tabellen in eine Excel-Datei mit mehreren Sheets.",
-        "download_excel": "Excel herunterladen",
-        "user_account": "Nutzerkonto",
-        "first_name": "Vorname",
-        "last_name": "Nachname",
-        "email": "E-Mail",
-        "profile_saved": "Profil gespeichert.",
-        "edit_profile": "Profil bearbeiten",
-        "avatar": "Profilbild",
-        "upload_photo": "Bild hochladen (PNG/JPG)",
-        "remove_photo": "Bild entfernen",
-        "photo_saved": "Bild gespeichert.",
-        "photo_removed": "Bild entfernt.",
-        "invalid_image": "Ungültige Bilddatei.",
-        "greet_morning": "Guten Morgen",
-        "greet_afternoon": "Guten Tag",
-        "greet_evening": "Guten Abend",
-        "greet_night": "Gute Nacht",
-        "spring": "Frühling", "summer": "Sommer", "autumn": "Herbst", "winter": "Winter",
-        "season_greeting": "Schönen {season}!",
-        "year_built": "Baujahr",
-        "ownership_transfer_date": "Eigentumsübergang",
-        "balcony": "Balkon",
-        "cellar": "Keller",
-        "storage_room": "Abstellraum",
-        "garage": "Garage",
-        "parking_spot": "PKW-Stellplatz",
-        "owned_by_me": "In meinem Eigentum",
-        "financings": "Finanzierungen",
-        "financing": "Finanzierung",
-        "new_financing": "Neue Finanzierung",
-        "edit_delete_financing": "Finanzierung beenden / löschen",
-        "lender_name": "Kreditgeber",
-        "loan_number": "Darlehensnummer",
-        "principal_amount": "Darlehenssumme",
-        "interest_rate": "Sollzins (%)",
-        "repayment_rate": "Tilgung (%)",
-        "monthly_payment": "Monatsrate",
-        "fixed_rate_until": "Zinsbindung bis",
-        "remaining_balance": "Restschuld",
-        "purpose": "Verwendungszweck",
-        "collateral": "Sicherheit",
-        "select_financing": "Finanzierung auswählen",
-        "end_financing_today": "Finanzierung beenden (heute)",
-        "delete_financing": "Finanzierung löschen",
-
-
-    },
-    "en": {
-        "app_title": "Property Manager", "choose_section": "Choose section",
-        "local_data_hint": "Data is stored locally in data.db. Backup: copy file or use Export.",
-        "save": "Save", "delete": "Delete", "select": "Select", "created": "Created.", "changes_saved": "Saved.", "deleted": "Deleted.",
-        "not_available": "No data yet.", "please_enter_name": "Please enter a name.",
-        "german": "German", "english": "English", "french": "French", "spanish": "Spanish",
-        "dashboard": "Dashboard", "overview": "Overview", "properties_count": "Properties", "units_count": "Units",
-        "active_leases": "Active leases", "rent_sum": "Cold rent / month (∑)", "latest_payments": "Latest payments",
-        "settings": "Settings", "language": "Language", "language_changed": "Language updated.",
-        "properties": "Properties", "property_overview": "Property overview",
-        "create_property": "Create new property", "edit_delete_property": "Edit / delete property",
-        "name": "Name", "address": "Address", "postal_code": "Postal code", "city": "City",
-        "purchase_price": "Purchase price (€)", "size_sqm": "Size (sqm)", "notes": "Notes",
-        "select_property": "Select property", "no_properties": "No properties yet.",
-        "cannot_delete_units": "Cannot delete: units are linked.", "actions_hint": "Actions: ➕ add · 🛠️ edit/delete (hover for help)",
-        "units": "Units", "new_unit": "Add new unit", "edit_delete_unit": "Edit / delete unit",
-        "property": "Property", "unit_label": "Unit label", "rooms": "Rooms", "living_area_sqm": "Living area (sqm)",
-        "rent_cold_current": "current cold rent (€)", "is_rented": "rented", "no_units": "No units yet.", "select_unit": "Select unit",
-        "tenants": "Tenants", "new_tenant": "Add new tenant", "edit_delete_tenant": "Edit / delete tenant",
-        "full_name": "Full name", "phone": "Phone", "email": "Email", "no_tenants": "No tenants yet.", "select_tenant": "Select tenant",
-        "leases": "Leases", "new_lease": "Create new lease", "select_lease": "Select lease",
-        "end_lease_today": "End lease (today)", "delete_lease": "Delete lease",
-        "unit": "Unit", "tenant": "Tenant", "start_date": "Start date", "end_date_optional": "End (optional)",
-        "rent_cold": "Cold rent (€)", "rent_warm": "Warm rent (€)", "deposit": "Deposit (€)",
-        "no_leases": "No leases yet.", "need_units_tenants_first": "Please create units and tenants first.",
-        "payments": "Payments", "record_payment": "Record payment", "date": "Date",
-        "amount": "Amount (€)", "category": "Category", "note": "Note", "payment_recorded": "Payment recorded.",
-        "need_lease_first": "Please create a lease first.",
-        "cat_rent": "Rent", "cat_nk": "Service charges", "cat_deposit": "Deposit", "cat_other": "Other",
-        "tasks": "Maintenance & Tasks", "new_task": "New task", "edit_delete_task": "Update / delete task",
-        "status": "Status", "due_date": "Due date", "cost_estimate": "Cost estimate", "task_title": "Title",
-        "select_task": "Select task", "no_tasks": "No tasks yet.",
-        "status_open": "open", "status_in_progress": "in progress", "status_done": "done",
-        "export": "Export / Backup", "export_desc": "Exports all tables to a multi-sheet Excel file.", "download_excel": "Download Excel",
-        "user_account": "User account",
-        "first_name": "First name",
-        "last_name": "Last name",
-        "email": "Email",
-        "profile_saved": "Profile saved.",
-        "edit_profile": "Edit profile",
-        "avatar": "Profile picture",
-        "upload_photo": "Upload image (PNG/JPG)",
-        "remove_photo": "Remove image",
-        "photo_saved": "Photo saved.",
-        "photo_removed": "Photo removed.",
-        "invalid_image": "Invalid image file.",
-        "greet_morning": "Good morning",
-        "greet_afternoon": "Good afternoon",
-        "greet_evening": "Good evening",
-        "greet_night": "Good night",
-        "spring": "spring", "summer": "summer", "autumn": "autumn", "winter": "winter",
-        "season_greeting": "Have a great {season}!",
-        "year_built": "Year built",
-        "ownership_transfer_date": "Ownership transfer date",
-        "balcony": "Balcony",
-        "cellar": "Cellar",
-        "storage_room": "Storage room",
-        "garage": "Garage",
-        "parking_spot": "Parking spot",
-        "owned_by_me": "Owned by me",
-        "financings": "Financings",
-        "financing": "Financing",
-        "new_financing": "New financing",
-        "edit_delete_financing": "End / delete financing",
-        "lender_name": "Lender",
-        "loan_number": "Loan number",
-        "principal_amount": "Principal",
-        "interest_rate": "Interest rate (%)",
-        "repayment_rate": "Repayment (%)",
-        "monthly_payment": "Monthly payment",
-        "fixed_rate_until": "Fixed rate until",
-        "remaining_balance": "Remaining balance",
-        "purpose": "Purpose",
-        "collateral": "Collateral",
-        "select_financing": "Select financing",
-        "end_financing_today": "End financing (today)",
-        "delete_financing": "Delete financing",
-
-
-
-    },
-    "fr": {
-        "app_title": "Gestion Immobilière", "choose_section": "Choisir une section",
-        "local_data_hint": "Les données sont locales (data.db). Sauvegarde : copier le fichier ou utiliser Export.",
-        "save": "Enregistrer", "delete": "Supprimer", "select": "Choisir",
-        "created": "Créé.", "changes_saved": "Enregistré.", "deleted": "Supprimé.",
-        "not_available": "Aucune donnée pour l’instant.", "please_enter_name": "Veuillez saisir un nom.",
-        "german": "Allemand", "english": "Anglais", "french": "Français", "spanish": "Espagnol",
-        "dashboard": "Tableau de bord", "overview": "Aperçu", "properties_count": "Biens",
-        "units_count": "Logements", "active_leases": "Baux actifs", "rent_sum": "Loyer hors charges / mois (∑)",
-        "latest_payments": "Derniers paiements", "settings": "Paramètres", "language": "Langue", "language_changed": "Langue mise à jour.",
-        "properties": "Biens", "property_overview": "Aperçu des biens",
-        "create_property": "Créer un bien", "edit_delete_property": "Modifier / supprimer un bien",
-        "name": "Nom", "address": "Adresse", "postal_code": "Code postal", "city": "Ville",
-        "purchase_price": "Prix d’achat (€)", "size_sqm": "Surface (m²)", "notes": "Notes",
-        "select_property": "Choisir un bien", "no_properties": "Aucun bien pour le moment.",
-        "cannot_delete_units": "Suppression impossible : des logements sont liés.",
-        "actions_hint": "Actions : ➕ ajouter · 🛠️ modifier/supprimer (survol pour l’aide)",
-        "units": "Logements", "new_unit": "Créer un logement", "edit_delete_unit": "Modifier / supprimer un logement",
-        "property": "Bien", "unit_label": "Libellé du logement", "rooms": "Pièces",
-        "living_area_sqm": "Surface habitable (m²)", "rent_cold_current": "loyer hors charges actuel (€)", "is_rented": "loué",
-        "no_units": "Aucun logement pour l’instant.", "select_unit": "Choisir un logement",
-        "tenants": "Locataires", "new_tenant": "Créer un locataire", "edit_delete_tenant": "Modifier / supprimer un locataire",
-        "full_name": "Nom complet", "phone": "Téléphone", "email": "E-mail", "no_tenants": "Aucun locataire.", "select_tenant": "Choisir un locataire",
-        "leases": "Baux", "new_lease": "Créer un bail", "select_lease": "Choisir un bail",
-        "end_lease_today": "Clore le bail (aujourd’hui)", "delete_lease": "Supprimer le bail",
-        "unit": "Logement", "tenant": "Locataire", "start_date": "Début", "end_date_optional": "Fin (optionnel)",
-        "rent_cold": "Loyer HC (€)", "rent_warm": "Loyer CC (€)", "deposit": "Dépôt de garantie (€)",
-        "no_leases": "Aucun bail.", "need_units_tenants_first": "Créez d’abord des logements et des locataires.",
-        "payments": "Paiements", "record_payment": "Saisir un paiement", "date": "Date",
-        "amount": "Montant (€)", "category": "Catégorie", "note": "Note", "payment_recorded": "Paiement enregistré.",
-        "need_lease_first": "Créez d’abord un bail.",
-        "cat_rent": "Loyer", "cat_nk": "Charges", "cat_deposit": "Dépôt", "cat_other": "Autre",
-        "tasks": "Maintenance & Tâches", "new_task": "Nouvelle tâche", "edit_delete_task": "Mettre à jour / supprimer la tâche",
-        "status": "Statut", "due_date": "Échéance", "cost_estimate": "Coût estimé", "task_title": "Titre",
-        "select_task": "Choisir une tâche", "no_tasks": "Aucune tâche.",
-        "status_open": "ouvert", "status_in_progress": "en cours", "status_done": "terminé",
-        "export": "Export / Sauvegarde", "export_desc": "Exporte toutes les tables dans un fichier Excel multi-feuilles.",
-        "download_excel": "Télécharger l’Excel",
-        "user_account": "Compte utilisateur",
-        "first_name": "Prénom",
-        "last_name": "Nom",
-        "email": "E-mail",
-        "profile_saved": "Profil enregistré.",
-        "edit_profile": "Modifier le profil",
-        "avatar": "Photo de profil",
-        "upload_photo": "Téléverser une image (PNG/JPG)",
-        "remove_photo": "Supprimer l’image",
-        "photo_saved": "Image enregistrée.",
-        "photo_removed": "Image supprimée.",
-        "invalid_image": "Fichier image invalide.",
-        "greet_morning": "Bonjour",
-        "greet_afternoon": "Bon après-midi",
-        "greet_evening": "Bonsoir",
-        "greet_night": "Bonne nuit",
-        "spring": "printemps", "summer": "été", "autumn": "automne", "winter": "hiver",
-        "season_greeting": "Bon {season} !",
-        "year_built": "Année de construction",
-        "ownership_transfer_date": "Date de transfert de propriété",
-        "balcony": "Balcon",
-        "cellar": "Cave",
-        "storage_room": "Débarras",
-        "garage": "Garage",
-        "parking_spot": "Place de parking",
-        "owned_by_me": "En ma propriété",
-        "financings": "Financements",
-        "financing": "Financement",
-        "new_financing": "Nouveau financement",
-        "edit_delete_financing": "Terminer / supprimer le financement",
-        "lender_name": "Prêteur",
-        "loan_number": "Numéro de prêt",
-        "principal_amount": "Montant du prêt",
-        "interest_rate": "Taux d’intérêt (%)",
-        "repayment_rate": "Amortissement (%)",
-        "monthly_payment": "Paiement mensuel",
-        "fixed_rate_until": "Taux fixe jusqu’au",
-        "remaining_balance": "Solde restant",
-        "purpose": "Objet",
-        "collateral": "Garantie",
-        "select_financing": "Sélectionner un financement",
-        "end_financing_today": "Terminer le financement (aujourd’hui)",
-        "delete_financing": "Supprimer le financement",
-
-
-
-    },
-    "es": {
-        "app_title": "Gestor de Inmuebles", "choose_section": "Elegir sección",
-        "local_data_hint": "Los datos se guardan localmente en data.db. Copia: copiar archivo o usar Exportar.",
-        "save": "Guardar", "delete": "Eliminar", "select": "Seleccionar",
-        "created": "Creado.", "changes_saved": "Guardado.", "deleted": "Eliminado.",
-        "not_available": "No hay datos todavía.", "please_enter_name": "Introduce un nombre.",
-        "german": "Alemán", "english": "Inglés", "french": "Francés", "spanish": "Español",
-        "dashboard": "Panel", "overview": "Resumen", "properties_count": "Inmuebles",
-        "units_count": "Unidades", "active_leases": "Contratos activos", "rent_sum": "Renta fría / mes (∑)",
-        "latest_payments": "Últimos pagos", "settings": "Ajustes", "language": "Idioma", "language_changed": "Idioma actualizado.",
-        "properties": "Inmuebles", "property_overview": "Resumen de inmuebles",
-        "create_property": "Crear inmueble", "edit_delete_property": "Editar / eliminar inmueble",
-        "name": "Nombre", "address": "Dirección", "postal_code": "Código postal", "city": "Ciudad",
-        "purchase_price": "Precio de compra (€)", "size_sqm": "Superficie (m²)", "notes": "Notas",
-        "select_property": "Seleccionar inmueble", "no_properties": "Aún no hay inmuebles.",
-        "cannot_delete_units": "No se puede eliminar: hay unidades vinculadas.",
-        "actions_hint": "Acciones: ➕ añadir · 🛠️ editar/eliminar (ayuda al pasar el ratón)",
-        "units": "Unidades", "new_unit": "Crear unidad", "edit_delete_unit": "Editar / eliminar unidad",
-        "property": "Inmueble", "unit_label": "Etiqueta de unidad", "rooms": "Habitaciones",
-        "living_area_sqm": "Superficie habitable (m²)", "rent_cold_current": "renta fría actual (€)", "is_rented": "alquilado",
-        "no_units": "No hay unidades.", "select_unit": "Seleccionar unidad",
-        "tenants": "Inquilinos", "new_tenant": "Crear inquilino", "edit_delete_tenant": "Editar / eliminar inquilino",
-        "full_name": "Nombre completo", "phone": "Teléfono", "email": "Email", "no_tenants": "No hay inquilinos.", "select_tenant": "Seleccionar inquilino",
-        "leases": "Contratos", "new_lease": "Crear contrato", "select_lease": "Seleccionar contrato",
-        "end_lease_today": "Terminar contrato (hoy)", "delete_lease": "Eliminar contrato",
-        "unit": "Unidad", "tenant": "Inquilino", "start_date": "Inicio", "end_date_optional": "Fin (opcional)",
-        "rent_cold": "Renta fría (€)", "rent_warm": "Renta cálida (€)", "deposit": "Depósito (€)",
-        "no_leases": "No hay contratos.", "need_units_tenants_first": "Crea primero unidades e inquilinos.",
-        "payments": "Pagos", "record_payment": "Registrar pago", "date": "Fecha",
-        "amount": "Importe (€)", "category": "Categoría", "note": "Nota", "payment_recorded": "Pago registrado.",
-        "need_lease_first": "Crea primero un contrato.",
-        "cat_rent": "Renta", "cat_nk": "Gastos", "cat_deposit": "Depósito", "cat_other": "Otro",
-        "tasks": "Mantenimiento y Tareas", "new_task": "Nueva tarea", "edit_delete_task": "Actualizar / eliminar tarea",
-        "status": "Estado", "due_date": "Vence", "cost_estimate": "Costo estimado", "task_title": "Título",
-        "select_task": "Seleccionar tarea", "no_tasks": "No hay tareas.",
-        "status_open": "abierta", "status_in_progress": "en curso", "status_done": "hecha",
-        "export": "Exportar / Copia", "export_desc": "Exporta todas las tablas a un Excel con varias hojas.",
-        "download_excel": "Descargar Excel",
-        "user_account": "Cuenta de usuario",
-        "first_name": "Nombre",
-        "last_name": "Apellido",
-        "email": "Correo electrónico",
-        "profile_saved": "Perfil guardado.",
-        "edit_profile": "Editar perfil",
-        "avatar": "Foto de perfil",
-        "upload_photo": "Subir imagen (PNG/JPG)",
-        "remove_photo": "Eliminar imagen",
-        "photo_saved": "Imagen guardada.",
-        "photo_removed": "Imagen eliminada.",
-        "invalid_image": "Archivo de imagen no válido.",
-        "greet_morning": "Buenos días",
-        "greet_afternoon": "Buenas tardes",
-        "greet_evening": "Buenas noches",
-        "greet_night": "Buenas noches",
-        "spring": "primavera", "summer": "verano", "autumn": "otoño", "winter": "invierno",
-        "season_greeting": "¡Feliz {season}!",
-        "year_built": "Año de construcción",
-        "ownership_transfer_date": "Fecha de transmisión de la propiedad",
-        "balcony": "Balcón",
-        "cellar": "Sótano",
-        "storage_room": "Trastero",
-        "garage": "Garaje",
-        "parking_spot": "Aparcamiento",
-        "owned_by_me": "De mi propiedad",
-        "financings": "Financiaciones",
-        "financing": "Financiación",
-        "new_financing": "Nueva financiación",
-        "edit_delete_financing": "Finalizar / eliminar financiación",
-        "lender_name": "Prestamista",
-        "loan_number": "Número de préstamo",
-        "principal_amount": "Importe del préstamo",
-        "interest_rate": "Tipo de interés (%)",
-        "repayment_rate": "Amortización (%)",
-        "monthly_payment": "Pago mensual",
-        "fixed_rate_until": "Tipo fijo hasta",
-        "remaining_balance": "Saldo pendiente",
-        "purpose": "Finalidad",
-        "collateral": "Garantía",
-        "select_financing": "Seleccionar financiación",
-        "end_financing_today": "Finalizar financiación (hoy)",
-        "delete_financing": "Eliminar financiación",
-
-
-
-    },
-}
-
-def get_lang() -> str:
-    lang = st.session_state.get("lang", "de")
-    return lang if lang in LANGS else "de"
-
-def set_lang(lang: str):
-    if lang in LANGS:
-        st.session_state["lang"] = lang
-
-def t(key: str, default: str | None = None) -> str:
-    lang = get_lang()
-    return TRANSLATIONS.get(lang, {}).get(key, TRANSLATIONS["en"].get(key, default or key))
+# core/i18n.py — Übersetzungen
+#
+# Kataloge liegen je Sprache in core/locales/<lang>.json und werden erst bei Bedarf geladen.
+# Je Sprache wird einmal ein flacher Katalog kompiliert, in dem die Fallbacks (Sprache -> en)
+# schon aufgelöst sind: ein t()-Aufruf ist danach genau ein dict-Zugriff. Seiten holen sich
+# einmal je Lauf den an die Sprache der Sitzung gebundenen Übersetzer: `t = translator()`.
+from __future__ import annotations
+
+import functools
+import json
+from pathlib import Path
+from types import MappingProxyType
+
+from .cache import running_in_streamlit
+
+LANGS = ["de", "en", "fr", "es"]
+DEFAULT_LANG = "de"
+FALLBACK_LANG = "en"
+LOCALE_DIR = Path(__file__).with_name("locales")
+
+
+@functools.lru_cache(maxsize=None)
+def _load(lang: str) -> dict:
+    with open(LOCALE_DIR / f"{lang}.json", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+@functools.lru_cache(maxsize=None)
+def catalog(lang: str) -> MappingProxyType:
+    """Flacher Katalog einer Sprache inkl. Fallback-Einträgen (nur lesend)."""
+    merged = dict(_load(FALLBACK_LANG)) if lang != FALLBACK_LANG else {}
+    merged.update(_load(lang))
+    return MappingProxyType(merged)
+
+
+class Translator:
+    """An eine Sprache gebundenes t(key, default): Katalog, sonst `default`, sonst der Schlüssel."""
+    __slots__ = ("lang", "_get")
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self._get = catalog(lang).get
+
+    def __call__(self, key: str, default: str | None = None) -> str:
+        text = self._get(key)
+        return text if text is not None else (default or key)
+
+
+@functools.lru_cache(maxsize=None)
+def _translator(lang: str) -> Translator:
+    return Translator(lang)
+
+
+def get_lang() -> str:
+    """Sprache der Sitzung; außerhalb von Streamlit (CLI, Jobs) DEFAULT_LANG."""
+    if not running_in_streamlit():
+        return DEFAULT_LANG
+    import streamlit as st
+    lang = st.session_state.get("lang", DEFAULT_LANG)
+    return lang if lang in LANGS else DEFAULT_LANG
+
+def set_lang(lang: str):
+    if lang in LANGS:
+        import streamlit as st
+        st.session_state["lang"] = lang
+
+def translator(lang: str | None = None) -> Translator:
+    """Übersetzer für `lang` bzw. die Sprache der aktuellen Sitzung (einmal je Seitenlauf holen)."""
+    return _translator(lang if lang in LANGS else get_lang())
+
+def t(key: str, default: str | None = None) -> str:
+    return translator()(key, default)
+
+
+def all_translations(*keys: str) -> set[str]:
+    """Alle Übersetzungen der Schlüssel über alle Sprachen (z. B. gespeicherte Kategorien)."""
+    return {_load(lang)[key] for lang in LANGS for key in keys if key in _load(lang)}
@@ -0,0 +1,117 @@
+# core/journal.py — Änderungsjournal (Change Data Capture) über SQLite-Trigger
+#
+# Für jede Stammdatentabelle aus core/db.py schreiben AFTER INSERT/UPDATE/DELETE-Trigger
+# eine Zeile (tbl, row_id, op) nach change_log; row_id ist die Spalte id (BaseModel), nicht die rowid. Trigger erfassen auch rohe SQL-Schreibzugriffe
+# und andere Prozesse (CLI, Nachtlauf). change_log.id ist der Cursor: "alles seit Cursor N"
+# ist eine Bereichsabfrage über den Primärschlüssel. Abgeleitete Tabellen (Sollstellung,
+# offene Posten) werden nicht protokolliert — sie entstehen aus den protokollierten Quellen.
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy.engine import Connection
+
+from .db import Base, get_engine
+
+JOURNAL_TABLE = "change_log"
+DERIVED_TABLES = {"rent_due", "rent_roll_state", "open_items", "ledger_state"}
+VOLATILE_TABLES = {"sessions"}        # Anmeldesitzungen: kurzlebig, weder protokolliert noch exportiert
+_OPS = {"INSERT": ("I", "NEW"), "UPDATE": ("U", "NEW"), "DELETE": ("D", "OLD")}
+
+
+def journaled_tables() -> list[str]:
+    return [t.name for t in Base.metadata.sorted_tables
+            if t.name not in DERIVED_TABLES | VOLATILE_TABLES | {JOURNAL_TABLE}]
+
+
+def trigger_sql(table: str) -> list[str]:
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS "trg_{table}_journal_{event.lower()}" AFTER {event} ON "{table}" '
+        f"BEGIN INSERT INTO {JOURNAL_TABLE} (tbl, row_id, op) VALUES ('{table}', {ref}.id, '{op}'); END"
+        for event, (op, ref) in _OPS.items()
+    ]
+
+
+def drop_triggers(con: Connection) -> None:
+    for table in journaled_tables():
+        for event in _OPS:
+            con.exec_driver_sql(f'DROP TRIGGER IF EXISTS "trg_{table}_journal_{event.lower()}"')
+
+
+def install_triggers(con: Connection) -> None:
+    """Legt fehlende Journal-Trigger an (idempotent; nach neuen Tabellen erneut aufrufen)."""
+    for table in journaled_tables():
+        for sql in trigger_sql(table):
+            con.exec_driver_sql(sql)
+
+
+def current_cursor(con: Connection | None = None) -> int:
+    """Höchste je vergebene Journal-id (sqlite_sequence, bleibt auch nach prune() stehen)."""
+    if con is None:
+        with get_engine().connect() as con:
+            return current_cursor(con)
+    return int(con.exec_driver_sql(
+        f"SELECT IFNULL((SELECT seq FROM sqlite_sequence WHERE name = '{JOURNAL_TABLE}'), 0)").scalar())
+
+
+def covers(since: int, con: Connection) -> bool:
+    """True, wenn alle Einträge nach `since` noch im Journal stehen (nicht weggeräumt)."""
+    first = con.exec_driver_sql(f"SELECT MIN(id) FROM {JOURNAL_TABLE}").scalar()
+    return (current_cursor(con) if first is None else first - 1) <= int(since)
+
+
+def changes(since: int, until: int | None = None, tables=None) -> pd.DataFrame:
+    """Netto-Änderungen im Bereich (since, until]: eine Zeile je (tbl, row_id).
+
+    op ist D, wenn die Zeile am Ende gelöscht ist, I, wenn sie im Bereich neu angelegt wurde,
+    sonst U. `last_id` ist der letzte Journaleintrag der Zeile.
+    """
+    sql = f"""
+        SELECT tbl, row_id, MAX(id) AS last_id,
+               MIN(CASE WHEN op = 'I' THEN id END) AS first_insert,
+               MAX(CASE WHEN op = 'D' THEN id END) AS last_delete,
+               MAX(CASE WHEN op = 'I' THEN id END) AS last_insert
+        FROM {JOURNAL_TABLE} WHERE id > ?{" AND id <= ?" if until is not None else ""}
+        {"AND tbl IN (" + ",".join("?" * len(tables)) + ")" if tables else ""}
+        GROUP BY tbl, row_id ORDER BY tbl, row_id
+    """
+    params = (int(since), *(() if until is None else (int(until),)), *(tables or ()))
+    with get_engine().connect() as con:
+        res = con.exec_driver_sql(sql, params)
+        df = pd.DataFrame.from_records(res.fetchall(), columns=list(res.keys()))
+    if df.empty:
+        return pd.DataFrame({"tbl": pd.Series(dtype=object), "row_id": pd.Series(dtype="int64"),
+                             "op": pd.Series(dtype=object), "last_id": pd.Series(dtype="int64")})
+    marks = ["first_insert", "last_delete", "last_insert"]
+    df[marks] = df[marks].astype("float64")      # reine NULL-Spalten kommen sonst als object (None)
+    deleted = df["last_delete"].notna() & (df["last_insert"].isna() | (df["last_delete"] > df["last_insert"]))
+    df["op"] = "U"
+    df.loc[df["first_insert"].notna(), "op"] = "I"
+    df.loc[deleted, "op"] = "D"
+    # im Bereich angelegt und wieder gelöscht -> für Abnehmer nie sichtbar gewesen
+    df = df[~(deleted & df["first_insert"].notna() & (df["first_insert"] <= df["last_delete"]))]
+    return df[["tbl", "row_id", "op", "last_id"]].reset_index(drop=True)
+
+
+def changed_ids(table: str, since: int, con: Connection | None = None) -> tuple[set[int] | None, int]:
+    """ids einer Tabelle mit Änderungen nach `since` und der neue Cursor.
+
+    None statt der Menge, wenn das Journal nicht mehr bis `since` zurückreicht (-> alles neu).
+    """
+    if con is None:
+        with get_engine().connect() as con:
+            return changed_ids(table, since, con)
+    cursor = current_cursor(con)
+    if not covers(since, con):
+        return None, cursor
+    rows = con.exec_driver_sql(
+        f"SELECT DISTINCT row_id FROM {JOURNAL_TABLE} WHERE tbl = ? AND id > ? AND id <= ?", (table, int(since), cursor))
+    return {int(r[0]) for r in rows}, cursor
+
+
+def prune(before: int) -> int:
+    """Entfernt Einträge bis einschließlich `before` (nach erfolgreichem Sync); gibt die Anzahl zurück.
+
+    Leser mit älterem Cursor erkennen das über covers() und fallen auf einen Vollabgleich zurück.
+    """
+    with get_engine().begin() as con:
+        return con.exec_driver_sql(f"DELETE FROM {JOURNAL_TABLE} WHERE id <= ?", (int(before),)).rowcount
@@ -0,0 +1,218 @@
+# core/migrations.py — nummerierte Schema-Migrationen, Stand in PRAGMA user_version
+#
+# Jede Migration läuft genau einmal in eigener Transaktion und setzt danach
+# user_version auf ihre Nummer. Ist die Datenbank aktuell, kostet der Start nur das
+# Lesen von user_version — keine PRAGMA table_info-Abfragen, kein create_all.
+# Die Schritte sind idempotent, weil Alt-Datenbanken (user_version 0) den Großteil
+# des Schemas bereits besitzen.
+#
+# Neue Migration: Funktion mit @migration(<nächste Nummer>, "<Beschreibung>") unten anhängen,
+# Nummern nie umnummerieren oder wiederverwenden.
+from __future__ import annotations
+
+from typing import Callable
+
+from sqlalchemy.engine import Connection, Engine
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, title: str):
+    def deco(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} muss größer als {MIGRATIONS[-1][0]} sein")
+        MIGRATIONS.append((version, title, fn))
+        return fn
+    return deco
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(con: Connection) -> int:
+    return int(con.exec_driver_sql("PRAGMA user_version").scalar() or 0)
+
+
+def pending(engine: Engine) -> list[tuple[int, str]]:
+    with engine.connect() as con:
+        v = current_version(con)
+    return [(n, title) for n, title, _ in MIGRATIONS if n > v]
+
+
+def migrate(engine: Engine) -> int:
+    """Führt ausstehende Migrationen aus und gibt die erreichte Schema-Version zurück."""
+    with engine.connect() as con:
+        version = current_version(con)
+    if version >= latest_version():
+        return version
+    for number, _title, step in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as con:
+            # erneut prüfen: ein paralleler Prozess kann den Schritt schon ausgeführt haben
+            if current_version(con) >= number:
+                continue
+            step(con)
+            con.exec_driver_sql(f"PRAGMA user_version = {int(number)}")
+        version = number
+    return version
+
+
+def _columns(con: Connection, table: str) -> set[str]:
+    return {r[1] for r in con.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _add_columns(con: Connection, table: str, columns: dict[str, str]) -> None:
+    existing = _columns(con, table)
+    for name, ddl in columns.items():
+        if name not in existing:
+            con.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
+def _create_indexes(con: Connection) -> None:
+    """Legt fehlende Indizes an — nur solche, deren Spalten es schon gibt (spätere Migrationen holen den Rest nach)."""
+    from .db import Base
+    for table in Base.metadata.sorted_tables:
+        existing = _columns(con, table.name)
+        for idx in table.indexes:
+            if all(c.name in existing for c in idx.columns):
+                idx.create(bind=con, checkfirst=True)
+
+
+# --------------------
+# Migrationen
+# --------------------
+@migration(1, "Basisschema (create_all)")
+def _m001_base_schema(con: Connection) -> None:
+    from .db import Base
+    Base.metadata.create_all(con)
+
+
+@migration(2, "tenants: birth_date, photo, photo_filename")
+def _m002_tenant_columns(con: Connection) -> None:
+    _add_columns(con, "tenants", {"birth_date": "DATE", "photo": "BLOB", "photo_filename": "TEXT"})
+
+
+@migration(3, "unit_photos.position")
+def _m003_unit_photo_position(con: Connection) -> None:
+    _add_columns(con, "unit_photos", {"position": "INTEGER"})
+
+
+@migration(4, "units.notes")
+def _m004_unit_notes(con: Connection) -> None:
+    _add_columns(con, "units", {"notes": "TEXT"})
+
+
+@migration(5, "user_profile.avatar")
+def _m005_profile_avatar(con: Connection) -> None:
+    _add_columns(con, "user_profile", {"avatar": "BLOB"})
+
+
+DEFAULT_COST_CATEGORIES = [
+    ('GRUNDSTEUER', 'Grundsteuer', 'Property tax', 'AREA', 0),
+    ('GEB_VERS', 'Gebäudeversicherung', 'Building insurance', 'AREA', 0),
+    ('HAUSSTROM', 'Allgemeinstrom', 'Common electricity', 'UNITS', 0),
+    ('REINIGUNG', 'Hausreinigung', 'Cleaning', 'UNITS', 0),
+    ('GARTEN', 'Gartenpflege', 'Garden', 'UNITS', 0),
+    ('MUELL', 'Müll', 'Waste', 'PERSONS', 0),
+    ('WASSER', 'Wasser/Abwasser', 'Water/Sewage', 'WATER_M3', 0),
+    ('HEIZ_BRENN', 'Heizung Brennstoff', 'Heating fuel', 'HEAT_SPLIT_70_30', 1),
+    ('HEIZ_WART', 'Heizung Wartung', 'Heating service', 'HEAT_SPLIT_70_30', 1),
+    ('SCHORN', 'Schornsteinfeger', 'Chimney sweep', 'HEAT_SPLIT_70_30', 1),
+    ('HAUSMEISTER', 'Hausmeister', 'Janitor', 'UNITS', 0),
+    ('SONSTIGE_BK', 'Sonstige BK', 'Other costs', 'UNITS', 0),
+]
+
+
+@migration(6, "Kostenkategorien und Objekt-Einstellungen vorbelegen")
+def _m006_seed_categories(con: Connection) -> None:
+    if not con.exec_driver_sql("SELECT COUNT(*) FROM cost_categories").scalar():
+        # cost_categories hat (code, id) als Primärschlüssel -> id explizit vergeben
+        con.exec_driver_sql(
+            "INSERT INTO cost_categories (id, code, name, name_en, allocation_method, is_heating) VALUES (?,?,?,?,?,?)",
+            [(i, *row) for i, row in enumerate(DEFAULT_COST_CATEGORIES, start=1)],
+        )
+    con.exec_driver_sql(
+        "INSERT INTO property_settings (id, property_id, heat_ratio_consumption, persons_default, water_allocation_fallback) "
+        "SELECT p.id, p.id, 70, 2, 'PERSONS' FROM properties p "
+        "WHERE NOT EXISTS (SELECT 1 FROM property_settings s WHERE s.property_id = p.id)"
+    )
+
+
+@migration(7, "Sekundärindizes (Jahresabfragen, cost_categories.code eindeutig)")
+def _m007_indexes(con: Connection) -> None:
+    _create_indexes(con)
+
+
+# (Tabelle, BLOB-Spalte, NOT NULL?) -> Inhalte in den Blob-Store, Hash + Größe in <spalte>_sha256/_size
+BLOB_COLUMNS = [("unit_photos", "image", True), ("tenants", "photo", False), ("user_profile", "avatar", False)]
+
+
+@migration(8, "BLOBs in den Blob-Store auslagern (Hash-Referenzen)")
+def _m008_blobs_to_store(con: Connection) -> None:
+    from . import blobstore
+    for table, col, not_null in BLOB_COLUMNS:
+        _add_columns(con, table, {f"{col}_sha256": "TEXT", f"{col}_size": "INTEGER"})
+        # zeilenweise lesen, damit nie alle Bilder gleichzeitig im Speicher liegen
+        ids = [r[0] for r in con.exec_driver_sql(
+            f"SELECT id FROM {table} WHERE {col} IS NOT NULL AND length({col}) > 0").fetchall()]
+        updates = []
+        for row_id in ids:
+            data = con.exec_driver_sql(f"SELECT {col} FROM {table} WHERE id = ?", (row_id,)).scalar()
+            sha, size = blobstore.put_bytes(bytes(data))
+            updates.append((sha, size, row_id))
+        if updates:
+            empty = "X''" if not_null else "NULL"
+            con.exec_driver_sql(
+                f"UPDATE {table} SET {col}_sha256 = ?, {col}_size = ?, {col} = {empty} WHERE id = ?", updates)
+
+
+@migration(9, "Sollstellung: rent_due, rent_roll_state")
+def _m009_rent_roll(con: Connection) -> None:
+    from .db import RentDue, RentRollState
+    RentDue.__table__.create(bind=con, checkfirst=True)
+    RentRollState.__table__.create(bind=con, checkfirst=True)
+
+
+@migration(10, "Offene Posten: open_items, ledger_state")
+def _m010_ledger(con: Connection) -> None:
+    from .db import LedgerState, OpenItem
+    OpenItem.__table__.create(bind=con, checkfirst=True)
+    LedgerState.__table__.create(bind=con, checkfirst=True)
+
+
+@migration(11, "Bankimport: tenants.iban, payments.bank_ref (eindeutig)")
+def _m011_bank_import(con: Connection) -> None:
+    _add_columns(con, "tenants", {"iban": "TEXT"})
+    _add_columns(con, "payments", {"bank_ref": "TEXT"})
+    _create_indexes(con)
+
+
+@migration(12, "Änderungsjournal: change_log + Trigger je Tabelle")
+def _m012_change_log(con: Connection) -> None:
+    from .db import ChangeLog
+    from .journal import install_triggers
+    ChangeLog.__table__.create(bind=con, checkfirst=True)
+    install_triggers(con)
+
+
+@migration(13, "Anmeldesitzungen: sessions (Token-Hash eindeutig)")
+def _m013_sessions(con: Connection) -> None:
+    from .db import UserSession
+    UserSession.__table__.create(bind=con, checkfirst=True)
+
+
+@migration(14, "Änderungsjournal: id statt rowid protokollieren")
+def _m014_journal_ids(con: Connection) -> None:
+    from .journal import JOURNAL_TABLE, drop_triggers, install_triggers, journaled_tables
+    drop_triggers(con)
+    # Tabellen mit zusammengesetztem Schlüssel (rowid != id): vorhandene Einträge umschlüsseln;
+    # gelöschte Zeilen lassen sich nicht mehr zuordnen und behalten die alte Nummer
+    for table in journaled_tables():
+        pk = [r[1] for r in con.exec_driver_sql(f'PRAGMA table_info("{table}")').fetchall() if r[5]]
+        if pk != ["id"]:
+            con.exec_driver_sql(
+                f'UPDATE {JOURNAL_TABLE} SET row_id = (SELECT id FROM "{table}" WHERE rowid = {JOURNAL_TABLE}.row_id) '
+                f'WHERE tbl = ? AND EXISTS (SELECT 1 FROM "{table}" WHERE rowid = {JOURNAL_TABLE}.row_id)', (table,))
+    install_triggers(con)
@@ -0,0 +1,92 @@
+# core/occupancy.py — Belegungsindex: welche Mietverträge sind an Datum D aktiv?
+#
+# Aktiv heißt: start_date <= D und (end_date leer oder end_date >= D). Der Index hält die
+# Vertragsdaten als numpy-Arrays (Tage seit Epoche) und beantwortet die Frage für viele
+# Stichtage auf einmal; er wird einmal je Datenstand von `leases` aufgebaut.
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from .cache import cached_query
+from .db import Lease
+from .queries import df_leases, load_frame
+
+_OPEN_END = np.iinfo(np.int64).max   # kein Vertragsende
+_NO_START = np.iinfo(np.int64).max   # ohne Startdatum nie aktiv
+
+
+def _days(values) -> np.ndarray:
+    """Datumsangaben -> Tage seit 1970-01-01 (int64); NaT bleibt als Maske erkennbar."""
+    ts = pd.to_datetime(pd.Series(values), errors="coerce").dt.normalize()
+    return ts.values.astype("datetime64[D]").astype(np.int64), ts.isna().to_numpy()
+
+
+@dataclass(frozen=True)
+class LeaseIndex:
+    lease_id: np.ndarray
+    unit_id: np.ndarray
+    tenant_id: np.ndarray
+    start: np.ndarray   # Tage seit Epoche
+    end: np.ndarray     # Tage seit Epoche, _OPEN_END = unbefristet
+
+    @classmethod
+    def from_frame(cls, leases: pd.DataFrame) -> "LeaseIndex":
+        start, no_start = _days(leases["start_date"])
+        end, no_end = _days(leases["end_date"])
+        start = np.where(no_start, _NO_START, start)
+        end = np.where(no_end, _OPEN_END, end)
+        # Ende vor Beginn (oder ohne Beginn) -> nie aktiv; hält count_active() konsistent
+        end = np.maximum(end, start - 1)
+        return cls(
+            lease_id=leases["id"].to_numpy(dtype=np.int64),
+            unit_id=leases["unit_id"].fillna(-1).to_numpy(dtype=np.int64),
+            tenant_id=leases["tenant_id"].fillna(-1).to_numpy(dtype=np.int64),
+            start=start,
+            end=end,
+        )
+
+    def __len__(self) -> int:
+        return len(self.lease_id)
+
+    def mask(self, dates=None) -> np.ndarray:
+        """Bool-Matrix (Stichtage × Verträge); ein einzelnes Datum liefert einen Vektor."""
+        scalar = dates is None or np.ndim(dates) == 0
+        d, _ = _days([pd.Timestamp.today()] if dates is None else np.atleast_1d(dates))
+        m = (self.start[None, :] <= d[:, None]) & (d[:, None] <= self.end[None, :])
+        return m[0] if scalar else m
+
+    def active_ids(self, date=None) -> np.ndarray:
+        return self.lease_id[self.mask(date)]
+
+    def count_active(self, dates) -> np.ndarray:
+        """Anzahl aktiver Verträge je Stichtag per Sortieren statt Matrix (viele Stichtage)."""
+        d, _ = _days(np.atleast_1d(dates))
+        starts = np.sort(self.start)
+        ends = np.sort(self.end)
+        return np.searchsorted(starts, d, side="right") - np.searchsorted(ends, d, side="left")
+
+    def active_by(self, key: str = "unit", dates=None) -> pd.DataFrame:
+        """Lange Tabelle (date, unit_id|tenant_id, lease_id) aller aktiven Paare."""
+        col = {"unit": "unit_id", "tenant": "tenant_id"}[key]
+        dates = pd.to_datetime(pd.Series([pd.Timestamp.today()] if dates is None else np.atleast_1d(dates))).dt.normalize()
+        di, li = np.nonzero(self.mask(dates.to_numpy()))
+        return pd.DataFrame({"date": dates.to_numpy()[di], col: getattr(self, col)[li], "lease_id": self.lease_id[li]})
+
+
+@cached_query("leases")
+def lease_index() -> LeaseIndex:
+    """Gemeinsamer Index, neu aufgebaut nur wenn sich `leases` ändert."""
+    stmt = select(Lease.id, Lease.unit_id, Lease.tenant_id, Lease.start_date, Lease.end_date).order_by(Lease.id)
+    return LeaseIndex.from_frame(load_frame(stmt))
+
+
+def active_leases(date=None, leases: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Zeilen aus df_leases(), die am Stichtag (Standard: heute) aktiv sind."""
+    leases = df_leases() if leases is None else leases
+    if leases is None or leases.empty:
+        return leases
+    return leases[leases["id"].isin(lease_index().active_ids(date))]
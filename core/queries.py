@@ -1,148 +1,161 @@
 # core/queries.py  — FIXED imports
 
+import numpy as np
 import pandas as pd
-import streamlit as st
-from sqlalchemy import select
+from sqlalchemy import select, Boolean, Date, DateTime, Float, Integer, LargeBinary, Numeric
+
+from . import blobstore
+from .cache import cached_query, bump
 
 from .db import (
-    SessionCtx, get_engine,
+    get_engine,
     Property, Unit, Tenant, Lease, Payment, MaintenanceTask,
     Financing,            # falls du "Finanzierungen" nutzt
-    UnitPhoto, Radiator, Meter, MeterReading  # Detailseite Wohnung
+    UnitPhoto, Radiator, Meter, MeterReading,  # Detailseite Wohnung
+    UserProfile,
 )
 
-
-@st.cache_data(ttl=2)
+# Spalten mit wenigen Ausprägungen -> pandas Categorical
+CATEGORY_COLUMNS = {"category", "status", "type", "role", "allocation_method", "category_code"}
+
+
+def _column(values: tuple, sa_type, name: str, categories: set):
+    """Baut eine Spalte in einem Rutsch mit festem dtype aus den Roh-Werten des Treibers."""
+    if isinstance(sa_type, (Date, DateTime)):
+        return pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", errors="coerce").dt.normalize().array
+    if isinstance(sa_type, Boolean):
+        return pd.array([None if v is None else bool(v) for v in values], dtype="boolean")
+    if isinstance(sa_type, Integer):
+        return pd.array(values, dtype="Int64")
+    if isinstance(sa_type, (Float, Numeric)):
+        return np.array(values, dtype="float64")
+    if name in categories:
+        return pd.Categorical(values)
+    return np.array(values, dtype=object)
+
+
+def load_frame(stmt, categories: set | None = None) -> pd.DataFrame:
+    """Führt ein Core-select() aus und baut den DataFrame spaltenweise mit expliziten dtypes.
+
+    Ohne ORM-Instanzen und ohne as_dict(): Die Roh-Tupel des SQLite-Treibers werden
+    transponiert; Datumswerte werden je Spalte in einem Durchgang geparst, Integer (FKs)
+    als nullable Int64 und Strings mit wenigen Ausprägungen als Categorical geladen.
+    """
+    categories = CATEGORY_COLUMNS if categories is None else categories
+    engine = get_engine()
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})  # IN-Listen aufgelöst
+    params = tuple(compiled.params[k] for k in (compiled.positiontup or ()))
+    with engine.connect() as con:
+        rows = con.exec_driver_sql(str(compiled), params).fetchall()
+    cols = list(stmt.selected_columns)
+    values = list(zip(*rows)) if rows else [()] * len(cols)
+    return pd.DataFrame(
+        {c.key: _column(v, c.type, c.key, categories) for c, v in zip(cols, values)},
+        index=pd.RangeIndex(len(rows)),
+    )
+
+
+def listing_columns(model) -> list:
+    """Spalten eines Modells ohne (Alt-)BLOBs; Größe und Hash stehen in `<spalte>_size`/`_sha256`."""
+    return [c for c in model.__table__.columns if not isinstance(c.type, LargeBinary)]
+
+
+def _blob(sha_column, row_id: int) -> bytes | None:
+    with get_engine().connect() as con:
+        sha = con.execute(select(sha_column).where(sha_column.table.c.id == int(row_id))).scalar()
+    return blobstore.get_bytes(sha)
+
+
+@cached_query("properties")
 def df_properties() -> pd.DataFrame:
-    with SessionCtx() as s:
-        rows = s.execute(select(Property)).scalars().all()
-        return pd.DataFrame([r.as_dict() for r in rows])
+    return load_frame(select(Property.__table__).order_by(Property.id))
 
-@st.cache_data(ttl=2)
+@cached_query("units")
 def df_units() -> pd.DataFrame:
-    with SessionCtx() as s:
-        rows = s.execute(select(Unit)).scalars().all()
-        return pd.DataFrame([r.as_dict() for r in rows])
+    return load_frame(select(Unit.__table__).order_by(Unit.id))
 
-@st.cache_data(ttl=2)
+@cached_query("tenants")
 def df_tenants() -> pd.DataFrame:
-    with SessionCtx() as s:
-        rows = s.execute(select(Tenant)).scalars().all()
-        return pd.DataFrame([r.as_dict() for r in rows])
+    # ohne Foto-Bytes; Bild über tenant_photo(id)
+    return load_frame(select(*listing_columns(Tenant)).order_by(Tenant.id))
 
-@st.cache_data(ttl=2)
+@cached_query("leases", "units", "tenants", "properties")
 def df_leases() -> pd.DataFrame:
-    with SessionCtx() as s:
-        rows = s.execute(select(Lease)).scalars().all()
-        data = []
-        for r in rows:
-            row = r.as_dict()
-            row["unit_label"] = r.unit.unit_label if r.unit else None
-            row["tenant_name"] = r.tenant.full_name if r.tenant else None
-            row["property_id"] = (r.unit.property.id if (r.unit and r.unit.property) else None)
-            row["property_name"] = (r.unit.property.name if (r.unit and r.unit.property) else None)
-            data.append(row)
-        df = pd.DataFrame(data)
-        if not df.empty:
-            df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce").dt.normalize()
-            df["end_date"] = pd.to_datetime(df["end_date"], errors="coerce").dt.normalize()
-        return df
-
-@st.cache_data
+    # Ein JOIN statt Lazy-Loads je Zeile (unit, tenant, unit.property)
+    stmt = (
+        select(
+            *Lease.__table__.columns,
+            Unit.unit_label,
+            Tenant.full_name.label("tenant_name"),
+            Property.id.label("property_id"),
+            Property.name.label("property_name"),
+        )
+        .select_from(Lease)
+        .outerjoin(Unit, Unit.id == Lease.unit_id)
+        .outerjoin(Tenant, Tenant.id == Lease.tenant_id)
+        .outerjoin(Property, Property.id == Unit.property_id)
+        .order_by(Lease.id)
+    )
+    return load_frame(stmt)
+
+@cached_query("payments")
 def df_payments() -> pd.DataFrame:
-    df = pd.read_sql_table("payments", get_engine())
-    if "pay_date" in df.columns:
-        df["pay_date"] = pd.to_datetime(df["pay_date"]).dt.normalize()
-    elif "date" in df.columns:
-        df["pay_date"] = pd.to_datetime(df["date"]).dt.normalize(); df = df.drop(columns=["date"])
-    elif "payment_date" in df.columns:
-        df["pay_date"] = pd.to_datetime(df["payment_date"]).dt.normalize()
-    else:
-        df["pay_date"] = pd.NaT
-    return df
-
-@st.cache_data(ttl=2)
+    return load_frame(select(Payment.__table__).order_by(Payment.id))
+
+@cached_query("maintenance_tasks", "properties")
 def df_tasks() -> pd.DataFrame:
-    with SessionCtx() as s:
-        rows = s.execute(select(MaintenanceTask)).scalars().all()
-        data = []
-        for r in rows:
-            row = r.as_dict()
-            row["property_name"] = r.property.name if r.property else None
-            data.append(row)
-        return pd.DataFrame(data)
-    
-@st.cache_data(ttl=2)
+    stmt = (
+        select(*MaintenanceTask.__table__.columns, Property.name.label("property_name"))
+        .select_from(MaintenanceTask)
+        .outerjoin(Property, Property.id == MaintenanceTask.property_id)
+        .order_by(MaintenanceTask.id)
+    )
+    return load_frame(stmt)
+
+@cached_query("unit_photos")
 def df_unit_photos(unit_id: int):
-    with SessionCtx() as s:
-        rows = s.execute(select(UnitPhoto).where(UnitPhoto.unit_id == unit_id)).scalars().all()
-        return pd.DataFrame([r.as_dict() for r in rows])
+    # nur Metadaten (inkl. image_size); Bild über unit_photo_image(id)
+    return load_frame(select(*listing_columns(UnitPhoto)).where(UnitPhoto.unit_id == unit_id))
 
-@st.cache_data(ttl=2)
+@cached_query("radiators")
 def df_radiators(unit_id: int):
-    with SessionCtx() as s:
-        rows = s.execute(select(Radiator).where(Radiator.unit_id == unit_id)).scalars().all()
-        return pd.DataFrame([r.as_dict() for r in rows])
+    return load_frame(select(Radiator.__table__).where(Radiator.unit_id == unit_id))
 
-@st.cache_data(ttl=2)
+@cached_query("meters")
 def df_meters(unit_id: int):
-    with SessionCtx() as s:
-        rows = s.execute(select(Meter).where(Meter.unit_id == unit_id)).scalars().all()
-        return pd.DataFrame([r.as_dict() for r in rows])
+    return load_frame(select(Meter.__table__).where(Meter.unit_id == unit_id))
 
-@st.cache_data(ttl=2)
+@cached_query("meter_readings")
 def df_meter_readings(meter_id: int):
-    with SessionCtx() as s:
-        rows = s.execute(select(MeterReading).where(MeterReading.meter_id == meter_id)).scalars().all()
-        df = pd.DataFrame([r.as_dict() for r in rows])
-        if not df.empty:
-            df["read_date"] = pd.to_datetime(df["read_date"]).dt.normalize()
-        return df
-
-
-def reset_caches():
-    df_properties.clear()
-    df_units.clear()
-    df_tenants.clear()
-    df_leases.clear()
-    df_payments.clear()
-    df_tasks.clear()
-    df_financings.clear()  
-    df_unit_photos.clear()
-    df_radiators.clear()
-    df_meters.clear()
-    df_meter_readings.clear()
-
-
-@st.cache_data
-def export_excel() -> bytes:
-    dfs = {
-        "properties": df_properties(),
-        "units": df_units(),
-        "tenants": df_tenants(),
-        "leases": df_leases(),
-        "payments": df_payments(),
-        "maintenance_tasks": df_tasks(),
-    }
-    from io import BytesIO
-    out = BytesIO()
-    with pd.ExcelWriter(out, engine="openpyxl") as writer:
-        for name, df in dfs.items():
-            (df if not df.empty else pd.DataFrame()).to_excel(writer, sheet_name=name, index=False)
-    return out.getvalue()
-
-@st.cache_data(ttl=2)
+    return load_frame(select(MeterReading.__table__).where(MeterReading.meter_id == meter_id))
+
+
+# Bild-Bytes einzeln je ID, eigener kleiner LRU-Cache (max_entries)
+@cached_query("unit_photos", max_entries=64)
+def unit_photo_image(photo_id: int) -> bytes | None:
+    return _blob(UnitPhoto.image_sha256, photo_id)
+
+@cached_query("tenants", max_entries=64)
+def tenant_photo(tenant_id: int) -> bytes | None:
+    return _blob(Tenant.photo_sha256, tenant_id)
+
+@cached_query("user_profile", max_entries=8)
+def profile_avatar(profile_id: int) -> bytes | None:
+    return _blob(UserProfile.avatar_sha256, profile_id)
+
+
+def reset_caches(*tables: str):
+    """Kompatibilitäts-Hook: Schreibzugriffe über die Engine invalidieren die betroffenen
+    Caches automatisch (siehe core.cache). Nur für Änderungen an der Engine vorbei nötig;
+    dann die betroffenen Tabellen angeben."""
+    bump(*tables)
+
+@cached_query("financings", "units")
 def df_financings():
-    with SessionCtx() as s:
-        rows = s.execute(select(Financing)).scalars().all()
-        data = []
-        for r in rows:
-            row = r.as_dict()
-            row["unit_label"] = r.unit.unit_label if r.unit else None
-            data.append(row)
-        df = pd.DataFrame(data)
-        if not df.empty:
-            for col in ["start_date", "end_date", "fixed_rate_until"]:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors="coerce").dt.normalize()
-        return df
+    stmt = (
+        select(*Financing.__table__.columns, Unit.unit_label)
+        .select_from(Financing)
+        .outerjoin(Unit, Unit.id == Financing.unit_id)
+        .order_by(Financing.id)
+    )
+    return load_frame(stmt)
@@ -0,0 +1,248 @@
+# core/reconciliation.py — Zahlungsabgleich und Offene-Posten-Liste
+#
+# Sollposten (Kaltmiete + NK-Vorauszahlung je Monat aus rent_due) werden je Vertrag nach
+# FIFO mit den Mietzahlungen verrechnet: älteste Forderung zuerst (§ 366 Abs. 2 BGB).
+# Statt einer Schleife je Zahlung laufen kumulierte Summen je Vertrag; wann ein Posten
+# ausgeglichen wurde, liefert ein As-of-Join der Soll- gegen die Zahlungs-Kumulierten.
+# Gespeichert wird je Vertrag mit Fingerabdruck (ledger_state); neu gerechnet werden nur
+# Verträge, deren Zahlungen oder Sollposten sich geändert haben. Meldet das Änderungsjournal
+# seit dem letzten Abgleich gar nichts Neues, entfällt auch die Fingerabdruck-Abfrage.
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from . import journal
+from .cache import cached_query, table_versions
+from .db import get_engine
+from .queries import df_leases
+from .rentroll import RENT_CATEGORIES, ensure_current, expand
+
+DUE_DAY = 3                 # Miete fällig am 3. des Monats (vereinfachend Kalendertag)
+KIND_RENT = "RENT"
+KIND_ADVANCE = "ADVANCE"    # Nebenkosten-Vorauszahlung (warm − kalt)
+
+ITEM_COLUMNS = ["lease_id", "month", "kind", "due_date", "amount", "paid", "open", "settled_on"]
+POSTING_COLUMNS = ["post", "lease_id", "unit_label", "tenant_name", "due_cold", "due_warm", "paid", "amount"]
+
+
+def _query(con, sql: str, **params) -> pd.DataFrame:
+    stmt = text(sql)
+    for name in ("ids", "cats"):
+        if name in params:
+            stmt = stmt.bindparams(bindparam(name, expanding=True))
+    res = con.execute(stmt, params)
+    return pd.DataFrame.from_records(res.fetchall(), columns=list(res.keys()))
+
+
+def _lease_filter(lease_ids) -> tuple[str, dict]:
+    if lease_ids is None:
+        return "", {}
+    return " AND lease_id IN :ids", {"ids": [int(i) for i in lease_ids]}
+
+
+def load_inputs(con, lease_ids=None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Sollposten und Mietzahlungen (alle Verträge, wenn lease_ids None)."""
+    flt, params = _lease_filter(lease_ids)
+    due = _query(con, f"SELECT lease_id, month, due_cold, due_warm FROM rent_due WHERE 1=1{flt}", **params)
+    pay = _query(con, f"SELECT id, lease_id, pay_date, amount FROM payments WHERE category IN :cats{flt}",
+                 cats=list(RENT_CATEGORIES), **params)
+    return due, pay
+
+
+def items_from_due(due: pd.DataFrame) -> pd.DataFrame:
+    """rent_due -> Sollposten (je Monat Kaltmiete und, falls > 0, NK-Vorauszahlung)."""
+    month = pd.to_datetime(due["month"], format="ISO8601")
+    cold = due["due_cold"].astype(float)
+    advance = (due["due_warm"].astype(float) - cold).round(2)
+    base = {"lease_id": due["lease_id"].astype("int64").to_numpy(), "month": month.to_numpy(),
+            "due_date": (month + pd.Timedelta(days=DUE_DAY - 1)).to_numpy()}
+    items = pd.concat([
+        pd.DataFrame({**base, "kind": KIND_RENT, "order": 0, "amount": cold.to_numpy()}),
+        pd.DataFrame({**base, "kind": KIND_ADVANCE, "order": 1, "amount": advance.to_numpy()}),
+    ], ignore_index=True)
+    return items[items["amount"] > 0]
+
+
+def reconcile(items: pd.DataFrame, payments: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """FIFO-Verrechnung je Vertrag, vollständig vektorisiert.
+
+    Gibt die Posten mit paid/open/settled_on und die Überzahlung je Vertrag zurück.
+    Beträge laufen in Cent (int64), damit Vergleiche der Kumulierten exakt sind.
+    """
+    items = items.sort_values(["lease_id", "due_date", "order"], kind="stable").reset_index(drop=True)
+    amount_c = np.round(items["amount"].to_numpy(dtype=float) * 100).astype(np.int64)
+    cum_due = pd.Series(amount_c).groupby(items["lease_id"].to_numpy()).cumsum().to_numpy()
+    prev_due = cum_due - amount_c
+
+    pay = payments.assign(pay_date=pd.to_datetime(payments["pay_date"], format="ISO8601"))
+    pay = pay.sort_values(["lease_id", "pay_date", "id"], kind="stable").reset_index(drop=True)
+    pay_c = np.round(pay["amount"].to_numpy(dtype=float) * 100).astype(np.int64)
+    pay["cum_paid"] = pd.Series(pay_c).groupby(pay["lease_id"].to_numpy()).cumsum().to_numpy()
+    total_paid = pd.Series(pay_c).groupby(pay["lease_id"].to_numpy()).sum()
+
+    lease_total = total_paid.reindex(items["lease_id"].to_numpy(), fill_value=0).to_numpy()
+    paid_c = np.clip(lease_total - prev_due, 0, amount_c)
+    items["paid"] = paid_c / 100
+    items["open"] = (amount_c - paid_c) / 100
+
+    # Ausgleichsdatum: erste Zahlung, ab der die Zahlungs-Kumulierte die Soll-Kumulierte erreicht
+    left = pd.DataFrame({"row": np.arange(len(items)), "lease_id": items["lease_id"].to_numpy(), "cum": cum_due})
+    right = pay[["lease_id", "cum_paid", "pay_date"]].rename(columns={"cum_paid": "cum"})
+    if len(left) and len(right):
+        hit = pd.merge_asof(left.sort_values("cum"), right.sort_values("cum"), on="cum", by="lease_id", direction="forward")
+        settled = hit.set_index("row")["pay_date"].reindex(left["row"]).to_numpy()
+    else:
+        settled = np.full(len(items), np.datetime64("NaT"), dtype="datetime64[ns]")
+    items["settled_on"] = np.where(paid_c >= amount_c, settled, np.datetime64("NaT"))
+
+    due_total = pd.Series(amount_c).groupby(items["lease_id"].to_numpy()).sum()
+    credit = (total_paid.sub(due_total, fill_value=0).clip(lower=0) / 100).rename("credit")
+    return items[ITEM_COLUMNS], credit
+
+
+def _stamps(con) -> pd.DataFrame:
+    """Fingerabdruck je Vertrag über seine Mietzahlungen und Sollposten (eine Abfrage)."""
+    return _query(con, """
+        SELECT l.id AS lease_id,
+               (SELECT COUNT(*) || ':' || TOTAL(amount) || ':' || IFNULL(MAX(id), 0) || ':' || TOTAL(julianday(pay_date))
+                  FROM payments p WHERE p.lease_id = l.id AND p.category IN :cats)
+               || '|' ||
+               (SELECT COUNT(*) || ':' || TOTAL(due_cold) || ':' || TOTAL(due_warm)
+                  FROM rent_due d WHERE d.lease_id = l.id) AS stamp
+        FROM leases l
+    """, cats=list(RENT_CATEGORIES))
+
+
+_synced: dict = {}
+
+
+def sync_ledger(lease_ids=None) -> int:
+    """Aktualisiert open_items für geänderte Verträge (bzw. die angegebenen); gibt deren Anzahl zurück."""
+    ensure_current()
+    engine = get_engine()
+    with engine.connect() as con:
+        key = (journal.current_cursor(con), table_versions(("rent_due",)), pd.Period(pd.Timestamp.today(), "M"))
+        if lease_ids is None and _synced.get("key") == key:
+            return 0
+        _synced.pop("key", None)
+        stamps = _stamps(con)
+        stored = _query(con, "SELECT lease_id, stamp AS stored FROM ledger_state")
+        cmp = stamps.merge(stored, on="lease_id", how="left")
+        dirty = cmp.loc[cmp["stamp"] != cmp["stored"], "lease_id"]
+        if lease_ids is not None:
+            dirty = pd.Series(sorted(set(dirty) | {int(i) for i in lease_ids}), dtype="int64")
+        if dirty.empty:
+            _synced["key"] = key
+            return 0
+        # alle Verträge auf einmal laden, wenn ohnehin die meisten betroffen sind
+        scope = None if len(dirty) > len(stamps) // 2 else dirty.tolist()
+        due, pay = load_inputs(con, scope)
+
+    items, credit = reconcile(items_from_due(due), pay)
+    items = items[items["lease_id"].isin(dirty)]
+    rows = list(zip(
+        items["lease_id"].astype(int), items["month"].dt.strftime("%Y-%m-%d"), items["kind"],
+        items["due_date"].dt.strftime("%Y-%m-%d"), items["amount"].astype(float), items["paid"].astype(float),
+        items["open"].astype(float), [None if pd.isna(d) else d.strftime("%Y-%m-%d") for d in items["settled_on"]],
+    ))
+    stamp_of = dict(zip(stamps["lease_id"], stamps["stamp"]))
+    ids = [(int(i),) for i in dirty]
+    with engine.begin() as con:
+        con.exec_driver_sql("DELETE FROM open_items WHERE lease_id = ?", ids)
+        if rows:
+            con.exec_driver_sql(
+                "INSERT INTO open_items (lease_id, month, kind, due_date, amount, paid, open, settled_on) VALUES (?,?,?,?,?,?,?,?)",
+                rows,
+            )
+        con.exec_driver_sql(
+            "INSERT INTO ledger_state (lease_id, stamp, credit) VALUES (?,?,?) "
+            "ON CONFLICT(lease_id) DO UPDATE SET stamp = excluded.stamp, credit = excluded.credit",
+            [(int(i), stamp_of.get(int(i), ""), float(credit.get(int(i), 0.0))) for i in dirty if int(i) in stamp_of],
+        )
+    _synced["key"] = key
+    return len(dirty)
+
+
+@cached_query("open_items")
+def _open_items(lease_id: int | None, only_open: bool) -> pd.DataFrame:
+    sql = "SELECT * FROM open_items WHERE 1=1"
+    params = {}
+    if lease_id is not None:
+        sql += " AND lease_id = :lid"
+        params["lid"] = int(lease_id)
+    if only_open:
+        sql += " AND open > 0.005"
+    with get_engine().connect() as con:
+        df = _query(con, sql + " ORDER BY lease_id, due_date, kind DESC", **params)
+    for c in ("month", "due_date", "settled_on"):
+        df[c] = pd.to_datetime(df[c], format="ISO8601")
+    return df
+
+
+def open_items(lease_id: int | None = None, only_open: bool = True, as_of=None) -> pd.DataFrame:
+    """Posten inkl. days_overdue (bis Ausgleich bzw. bis Stichtag, Standard heute)."""
+    sync_ledger()
+    df = _open_items(None if lease_id is None else int(lease_id), bool(only_open)).copy()
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    until = df["settled_on"].fillna(as_of) if not df.empty else pd.Series(dtype="datetime64[ns]")
+    df["days_overdue"] = (until - df["due_date"]).dt.days.clip(lower=0) if not df.empty else pd.Series(dtype="int64")
+    return df
+
+
+def arrears(as_of=None) -> pd.DataFrame:
+    """Rückstände je Vertrag: offen gesamt, Anzahl Posten, ältester Posten, max. Verzugstage, Guthaben."""
+    items = open_items(as_of=as_of)
+    items = items[items["due_date"] <= (pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of))]
+    summary = items.groupby("lease_id").agg(
+        open_total=("open", "sum"), items=("open", "size"),
+        oldest_due=("due_date", "min"), max_days_overdue=("days_overdue", "max"),
+    )
+    with get_engine().connect() as con:
+        credit = _query(con, "SELECT lease_id, credit FROM ledger_state").set_index("lease_id")["credit"]
+    summary["credit"] = credit.reindex(summary.index).fillna(0.0)
+    return summary.reset_index().sort_values("open_total", ascending=False, ignore_index=True)
+
+
+def month_postings(month) -> pd.DataFrame:
+    """Buchungsvorschlag für einen Monat: je im Monat aktivem Vertrag die (anteilige) Warmmiete.
+
+    `paid` sind bereits gebuchte Mietzahlungen im Monat; `post` ist nur für Verträge vorbelegt,
+    die noch nicht vollständig bezahlt haben, `amount` ist dann der Restbetrag.
+    """
+    start = pd.Timestamp(month).to_period("M").start_time
+    leases = df_leases()
+    month_no = np.datetime64(start.date(), "M").astype(np.int64)
+    due = expand(leases, start, first_month=np.full(len(leases), month_no))
+    with get_engine().connect() as con:
+        paid = _query(con, "SELECT lease_id, TOTAL(amount) AS paid FROM payments "
+                           "WHERE category IN :cats AND pay_date >= :start AND pay_date < :end GROUP BY lease_id",
+                      cats=list(RENT_CATEGORIES), start=start.strftime("%Y-%m-%d"),
+                      end=(start + pd.offsets.MonthBegin(1)).strftime("%Y-%m-%d"))
+    info = leases[["id", "unit_label", "tenant_name"]].rename(columns={"id": "lease_id"})
+    out = due.merge(info, on="lease_id", how="left").merge(paid, on="lease_id", how="left")
+    out["paid"] = out["paid"].astype(float).fillna(0.0)
+    out["amount"] = (out["due_warm"] - out["paid"]).clip(lower=0).round(2)
+    out["post"] = out["amount"] > 0.005
+    return out[POSTING_COLUMNS].sort_values("lease_id", ignore_index=True)
+
+
+def post_payments(rows: pd.DataFrame) -> int:
+    """Bucht viele Zahlungen (lease_id, pay_date, amount, category, note) in einer Transaktion.
+
+    Ein executemany statt einzelner ORM-Objekte: ein COMMIT, eine Cache-Invalidierung für
+    `payments`, danach Neuverrechnung der offenen Posten nur für die betroffenen Verträge.
+    """
+    if rows.empty:
+        return 0
+    note = rows["note"] if "note" in rows.columns else pd.Series(None, index=rows.index, dtype=object)
+    params = list(zip(
+        rows["lease_id"].astype(int), pd.to_datetime(rows["pay_date"]).dt.strftime("%Y-%m-%d"),
+        rows["amount"].astype(float).round(2), rows["category"].astype(str),
+        [None if pd.isna(n) or n == "" else str(n) for n in note],
+    ))
+    with get_engine().begin() as con:
+        con.exec_driver_sql("INSERT INTO payments (lease_id, pay_date, amount, category, note) VALUES (?,?,?,?,?)", params)
+    sync_ledger(sorted(set(rows["lease_id"].astype(int))))
+    return len(params)
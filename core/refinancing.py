@@ -0,0 +1,172 @@
+# core/refinancing.py — Anschlussfinanzierung: Szenarien für Darlehen mit auslaufender Zinsbindung
+#
+# Für alle Darlehen, deren Zinsbindung im Betrachtungsfenster endet, wird die Restschuld zum
+# Zinsbindungsende aus dem Tilgungsplan (core.amortization) genommen und mit einem Anschlusszins
+# neu verrentet: Rate = Restschuld · (Zins% + Tilgung%) / 100 / 12. Den Marktzins liefert
+#   - Monte Carlo: mean-reverting Zinspfade (Vasicek, exakte Diskretisierung, monatlich), oder
+#   - Raster: feste Zinssätze (Parallelverschiebung für alle Darlehen).
+# Gerechnet wird als Matrix Pfade × Darlehen; je Objekt wird per Matrixprodukt summiert. Große
+# Läufe werden nach Pfaden aufgeteilt und mit eigenen Zufallsströmen auf Prozesse verteilt.
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from .amortization import loan_status
+from .cache import cached_query
+from .queries import df_financings, df_properties, df_units
+
+PERCENTILES = (5, 25, 50, 75, 95)
+PARALLEL_CELLS = 4_000_000     # ab Pfade × Darlehen dieser Größe lohnt der Prozessstart
+CHUNK_PATHS = 2_500
+
+
+@dataclass(frozen=True)
+class RateModel:
+    """Zinsannahmen in % p. a.; `spread` ist der Aufschlag der Bank auf den Marktzins."""
+    r0: float = 3.5          # heutiger Zins für neue Zinsbindungen
+    theta: float = 3.5       # langfristiges Mittel
+    kappa: float = 0.25      # Rückkehrgeschwindigkeit je Jahr
+    sigma: float = 0.8       # Volatilität (%-Punkte je √Jahr)
+    spread: float = 0.0
+    floor: float = 0.0       # Untergrenze des Anschlusszinses
+
+
+def affected_loans(within_years: float = 5, as_of=None) -> pd.DataFrame:
+    """Darlehen mit Zinsbindungsende im Fenster und Restschuld > 0, inkl. Objekt und Monatsabstand."""
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    fins = df_financings()
+    cols = ["financing_id", "property_id", "property_name", "unit_label", "lender_name", "fixed_rate_until",
+            "months", "balance", "payment", "repayment_rate"]
+    if fins is None or fins.empty:
+        return pd.DataFrame(columns=cols)
+    fixed = pd.to_datetime(fins["fixed_rate_until"], errors="coerce")
+    fins = fins[(fixed >= as_of) & (fixed <= as_of + pd.DateOffset(months=int(round(within_years * 12))))]
+    if fins.empty:
+        return pd.DataFrame(columns=cols)
+    status = loan_status(as_of, fins=fins)
+    units = df_units()[["id", "property_id"]].rename(columns={"id": "unit_id"})
+    props = df_properties()[["id", "name"]].rename(columns={"id": "property_id", "name": "property_name"})
+    out = (fins.merge(status, left_on="id", right_on="financing_id")
+               .merge(units, on="unit_id", how="left").merge(props, on="property_id", how="left"))
+    fixed = pd.to_datetime(out["fixed_rate_until"])
+    out["months"] = (fixed.dt.year - as_of.year) * 12 + (fixed.dt.month - as_of.month)
+    out["balance"] = out["balance_fixed_end"].fillna(0.0)
+    out["repayment_rate"] = out["repayment_rate"].astype(float)
+    return out.loc[out["balance"] > 0.005, cols].reset_index(drop=True)
+
+
+def rate_paths(model: RateModel, n_paths: int, n_months: int, rng: np.random.Generator) -> np.ndarray:
+    """Marktzins je Pfad und Monat 0..n_months (Pfade × Monate), Vasicek exakt diskretisiert."""
+    dt = 1.0 / 12.0
+    decay = np.exp(-model.kappa * dt)
+    step_sd = model.sigma * np.sqrt((1 - decay ** 2) / (2 * model.kappa)) if model.kappa > 0 else model.sigma * np.sqrt(dt)
+    shocks = rng.standard_normal((n_paths, n_months)) * step_sd
+    # r_t = θ + (r_{t−1} − θ)·e^{−κΔt} + ε_t; Schleife nur über die Monate, vektorisiert über Pfade
+    dev = np.empty((n_paths, n_months + 1))
+    dev[:, 0] = model.r0 - model.theta
+    for t in range(1, n_months + 1):
+        dev[:, t] = dev[:, t - 1] * decay + shocks[:, t - 1]
+    return model.theta + dev
+
+
+def _refinance(rates: np.ndarray, balance: np.ndarray, repayment: np.ndarray, after: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Neue Rate und Restschuld `after` Monate nach Umschuldung (alles Pfade × Darlehen)."""
+    i = rates / 100.0 / 12.0
+    payment = balance * (rates + repayment) / 100.0 / 12.0
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        q = (1.0 + i) ** after
+        debt = np.where(i > 0, balance * q - payment * (q - 1.0) / i, balance - payment * after)
+    return payment, np.clip(np.nan_to_num(debt), 0.0, None)
+
+
+def _simulate_chunk(args: tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Worker: ein Pfadblock -> (Rate je Darlehen, Rate je Objekt, Restschuld je Objekt)."""
+    model_kw, n_paths, seed, months, balance, repayment, after, owner = args
+    model = RateModel(**model_kw)
+    rng = np.random.default_rng(seed)
+    market = rate_paths(model, n_paths, int(months.max()), rng)[:, months]          # Pfade × Darlehen
+    rates = np.maximum(market + model.spread, model.floor)
+    payment, debt = _refinance(rates, balance[None, :], repayment[None, :], after[None, :])
+    return payment.astype(np.float32), payment @ owner, debt @ owner
+
+
+def _summary(values: np.ndarray, index, prefix: str) -> pd.DataFrame:
+    q = np.percentile(values, PERCENTILES, axis=0).T
+    out = pd.DataFrame(q, index=index, columns=[f"{prefix}_p{p}" for p in PERCENTILES])
+    out[f"{prefix}_mean"] = values.mean(axis=0)
+    return out
+
+
+def _inputs(loans: pd.DataFrame, repayment: float | None, horizon_years: float):
+    balance = loans["balance"].to_numpy(dtype=float)
+    rep = np.full(len(loans), float(repayment)) if repayment is not None else \
+        loans["repayment_rate"].fillna(2.0).clip(lower=0.0).to_numpy(dtype=float)
+    months = loans["months"].to_numpy(dtype=np.int64)
+    after = np.clip(int(round(horizon_years * 12)) - months, 0, None).astype(float)
+    props = pd.Index(loans["property_id"].fillna(-1).astype(int).unique(), name="property_id")
+    owner = np.zeros((len(loans), len(props)))
+    owner[np.arange(len(loans)), props.get_indexer(loans["property_id"].fillna(-1).astype(int))] = 1.0
+    return balance, rep, months, after, props, owner
+
+
+def _property_frame(loans: pd.DataFrame, props: pd.Index) -> pd.DataFrame:
+    info = loans.assign(property_id=loans["property_id"].fillna(-1).astype(int)).groupby("property_id").agg(
+        property_name=("property_name", "first"), loans=("financing_id", "size"),
+        balance=("balance", "sum"), current_payment=("payment", "sum"))
+    return info.reindex(props)
+
+
+@cached_query("financings", "units", "properties", max_entries=16)
+def simulate(model: RateModel, n_paths: int = 10_000, within_years: float = 5, horizon_years: float = 10,
+             repayment: float | None = None, seed: int = 42, max_workers: int | None = None) -> dict:
+    """Monte-Carlo-Lauf über alle betroffenen Darlehen.
+
+    Ergebnis: `loans` (je Darlehen Quantile der neuen Rate), `properties` (je Objekt Quantile
+    der Summenrate und der Restschuld nach `horizon_years`), `portfolio` (Summenrate je Pfad).
+    """
+    loans = affected_loans(within_years)
+    if loans.empty:
+        return {"loans": loans, "properties": pd.DataFrame(), "portfolio": np.array([])}
+    balance, rep, months, after, props, owner = _inputs(loans, repayment, horizon_years)
+
+    chunks = max(1, -(-n_paths // CHUNK_PATHS))
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    sizes = [CHUNK_PATHS] * (chunks - 1) + [n_paths - CHUNK_PATHS * (chunks - 1)]
+    jobs = [(asdict(model), size, s, months, balance, rep, after, owner) for size, s in zip(sizes, seeds)]
+    workers = max_workers or min(4, os.cpu_count() or 1)
+    if n_paths * len(loans) < PARALLEL_CELLS or workers <= 1 or chunks == 1:
+        results = [_simulate_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, chunks)) as pool:
+            results = list(pool.map(_simulate_chunk, jobs))
+    loan_pay = np.concatenate([r[0] for r in results])
+    prop_pay = np.concatenate([r[1] for r in results])
+    prop_debt = np.concatenate([r[2] for r in results])
+
+    per_loan = loans.join(_summary(loan_pay, loans.index, "payment"))
+    per_prop = _property_frame(loans, props).join(_summary(prop_pay, props, "payment")).join(_summary(prop_debt, props, "debt"))
+    return {"loans": per_loan, "properties": per_prop.reset_index(), "portfolio": prop_pay.sum(axis=1)}
+
+
+@cached_query("financings", "units", "properties", max_entries=16)
+def grid(rates: tuple, within_years: float = 5, horizon_years: float = 10, repayment: float | None = None) -> pd.DataFrame:
+    """Rasterrechnung: für jeden Anschlusszins (alle Darlehen gleich) Summenrate und Restschuld je Objekt."""
+    loans = affected_loans(within_years)
+    if loans.empty or not rates:
+        return pd.DataFrame(columns=["rate", "property_id", "property_name", "payment", "debt"])
+    balance, rep, months, after, props, owner = _inputs(loans, repayment, horizon_years)
+    r = np.asarray(rates, dtype=float)[:, None] * np.ones((1, len(loans)))
+    payment, debt = _refinance(r, balance[None, :], rep[None, :], after[None, :])
+    names = _property_frame(loans, props)["property_name"]
+    return pd.DataFrame({
+        "rate": np.repeat(np.asarray(rates, dtype=float), len(props)),
+        "property_id": np.tile(props.to_numpy(), len(rates)),
+        "property_name": np.tile(names.to_numpy(), len(rates)),
+        "payment": (payment @ owner).ravel(),
+        "debt": (debt @ owner).ravel(),
+    })
@@ -0,0 +1,190 @@
+# core/rentroll.py — Sollstellung: erwartete Monatsmiete je Mietvertrag
+#
+# Jeder Vertrag wird in Monatsposten (rent_due) aufgefächert, Beginn-/Endmonat tagesgenau
+# anteilig. Gespeichert wird inkrementell: Ein Fingerabdruck über Beginn/Ende/Mieten
+# (rent_roll_state) zeigt, welche Verträge sich geändert haben; nur diese werden neu
+# berechnet, unveränderte laufende Verträge nur um neue Monate verlängert. Welche Verträge
+# überhaupt anzusehen sind, sagt das Änderungsjournal (core.journal) — im selben Monat
+# werden nur die dort seit dem letzten Lauf gemeldeten Verträge gelesen.
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, select, text
+
+from . import journal
+from .cache import cached_query
+from .db import Lease, get_engine
+from .i18n import all_translations
+from .queries import load_frame
+
+# Zahlungskategorien, die auf die Sollmiete angerechnet werden. Die Kategorie wird in der
+# Sprache der Oberfläche gespeichert -> alle Übersetzungen von cat_rent/cat_nk.
+RENT_CATEGORIES = tuple(sorted({"Miete", "NK"} | all_translations("cat_rent", "cat_nk")))
+
+_FP_COLUMNS = ["start_date", "end_date", "rent_cold", "rent_warm"]
+
+
+def _month_index(days: np.ndarray) -> np.ndarray:
+    """Tage seit Epoche -> fortlaufende Monatsnummer (Monate seit 1970-01)."""
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _month_start(m: np.ndarray) -> np.ndarray:
+    return m.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+def fingerprints(leases: pd.DataFrame) -> np.ndarray:
+    """Stabiler 63-bit-Hash je Vertrag über die sollrelevanten Felder."""
+    h = pd.util.hash_pandas_object(leases[_FP_COLUMNS].astype(str), index=False).to_numpy()
+    return (h >> np.uint64(1)).astype(np.int64)   # passt in SQLite INTEGER
+
+
+def expand(leases: pd.DataFrame, horizon: pd.Timestamp, first_month: np.ndarray | None = None) -> pd.DataFrame:
+    """Fächert Verträge vektorisiert in Monatsposten bis einschließlich `horizon` auf.
+
+    `first_month` (Monatsnummern je Vertrag) begrenzt die Ausgabe auf spätere Monate
+    (Verlängerung bereits berechneter Verträge).
+    """
+    start = pd.to_datetime(leases["start_date"], errors="coerce").to_numpy().astype("datetime64[D]").astype(np.int64)
+    end_ts = pd.to_datetime(leases["end_date"], errors="coerce")
+    h_days = np.datetime64(pd.Timestamp(horizon).to_period("M").end_time.date(), "D").astype(np.int64)
+    end = np.where(end_ts.isna(), h_days, end_ts.to_numpy().astype("datetime64[D]").astype(np.int64))
+    valid = ~pd.isna(leases["start_date"]).to_numpy() & (end >= start)
+
+    m0 = _month_index(start)
+    m1 = np.minimum(_month_index(end), _month_index(np.array([h_days]))[0])
+    if first_month is not None:
+        m0 = np.maximum(m0, first_month)
+    counts = np.where(valid, np.clip(m1 - m0 + 1, 0, None), 0)
+    total = int(counts.sum())
+    if total == 0:
+        return pd.DataFrame({"lease_id": pd.Series(dtype="int64"), "month": pd.Series(dtype="datetime64[s]"),
+                             "due_cold": pd.Series(dtype=float), "due_warm": pd.Series(dtype=float)})
+
+    pos = np.repeat(np.arange(len(leases)), counts)
+    offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    month = m0[pos] + offset
+    ms = _month_start(month)
+    me = _month_start(month + 1) - 1
+    active = np.minimum(me, end[pos]) - np.maximum(ms, start[pos]) + 1
+    factor = active / (me - ms + 1)
+
+    cold = leases["rent_cold"].astype(float).fillna(0.0).to_numpy()
+    warm = leases["rent_warm"].astype(float).to_numpy()
+    warm = np.where(np.isnan(warm), cold, warm)
+    return pd.DataFrame({
+        "lease_id": leases["id"].to_numpy(dtype=np.int64)[pos],
+        "month": ms.astype("datetime64[D]"),
+        "due_cold": np.round(cold[pos] * factor, 2),
+        "due_warm": np.round(warm[pos] * factor, 2),
+    })
+
+
+def refresh(horizon=None, lease_ids=None) -> dict:
+    """Bringt rent_due auf den Stand von `leases` bis zum Horizont (Standard: laufender Monat).
+
+    Mit `lease_ids` werden nur diese Verträge abgeglichen (auch gelöschte).
+    """
+    horizon = pd.Timestamp.today() if horizon is None else pd.Timestamp(horizon)
+    h_month = pd.Period(horizon, "M")
+    query = select(Lease.id, *(Lease.__table__.c[c] for c in _FP_COLUMNS)).order_by(Lease.id)
+    state_sql = text("SELECT lease_id, fingerprint, through FROM rent_roll_state")
+    if lease_ids is not None:
+        ids = sorted({int(i) for i in lease_ids})
+        if not ids:
+            return {"changed": 0, "extended": 0, "items": 0}
+        query = query.where(Lease.id.in_(ids))
+        state_sql = text("SELECT lease_id, fingerprint, through FROM rent_roll_state WHERE lease_id IN :ids") \
+            .bindparams(bindparam("ids", value=ids, expanding=True))
+    leases = load_frame(query)
+    leases["fingerprint"] = fingerprints(leases) if not leases.empty else pd.Series(dtype="int64")
+    engine = get_engine()
+    with engine.connect() as con:
+        state = pd.read_sql(state_sql, con)
+    state["through"] = pd.to_datetime(state["through"], errors="coerce")
+
+    merged = leases.merge(state, left_on="id", right_on="lease_id", how="left", suffixes=("", "_old"))
+    changed = merged[merged["fingerprint_old"].isna() | (merged["fingerprint"] != merged["fingerprint_old"])]
+    extend = merged.drop(changed.index)
+    extend = extend[extend["through"].isna() | (extend["through"].dt.to_period("M") < h_month)]
+    removed = set(state["lease_id"]) - set(leases["id"])   # Fallback, falls ohne FK-Kaskade gelöscht
+
+    parts = [expand(changed, horizon)]
+    if not extend.empty:
+        after = _month_index(extend["through"].fillna(pd.Timestamp("1970-01-01")).to_numpy().astype("datetime64[D]").astype(np.int64)) + 1
+        parts.append(expand(extend, horizon, first_month=after))
+    items = pd.concat(parts, ignore_index=True)
+
+    touched = pd.concat([changed, extend])
+    if touched.empty and not removed:
+        return {"changed": 0, "extended": 0, "items": 0}
+
+    rows = list(zip(items["lease_id"].astype(int), items["month"].dt.strftime("%Y-%m-%d"),
+                    items["due_cold"].astype(float), items["due_warm"].astype(float)))
+    through = h_month.start_time.strftime("%Y-%m-%d")
+    stale = [(int(i),) for i in [*changed["id"], *removed]]
+    with engine.begin() as con:
+        if stale:
+            con.exec_driver_sql("DELETE FROM rent_due WHERE lease_id = ?", stale)
+            con.exec_driver_sql("DELETE FROM rent_roll_state WHERE lease_id = ?", stale)
+        if rows:
+            con.exec_driver_sql("INSERT INTO rent_due (lease_id, month, due_cold, due_warm) VALUES (?,?,?,?)", rows)
+        if not touched.empty:
+            con.exec_driver_sql(
+                "INSERT INTO rent_roll_state (lease_id, fingerprint, through) VALUES (?,?,?) "
+                "ON CONFLICT(lease_id) DO UPDATE SET fingerprint = excluded.fingerprint, through = excluded.through",
+                [(int(i), int(fp), through) for i, fp in zip(touched["id"], touched["fingerprint"])],
+            )
+    return {"changed": len(changed), "extended": len(extend), "items": len(rows)}
+
+
+_refreshed: dict = {}
+
+
+def ensure_current(horizon=None) -> None:
+    """Gleicht rent_due ab: bei neuem Horizontmonat komplett, sonst nur laut Journal geänderte Verträge."""
+    month = pd.Period(pd.Timestamp.today() if horizon is None else horizon, "M")
+    if _refreshed.get("month") != month:
+        cursor = journal.current_cursor()
+        refresh(horizon)
+    else:
+        ids, cursor = journal.changed_ids("leases", _refreshed["cursor"])
+        if cursor == _refreshed["cursor"]:
+            return
+        refresh(horizon, lease_ids=ids)          # ids None: Journal weggeräumt -> komplett
+    _refreshed.update(month=month, cursor=cursor)
+
+
+@cached_query("rent_due", "payments")
+def _due_vs_paid(year: int | None) -> pd.DataFrame:
+    where, pay_where, params = "", "", {"cats": list(RENT_CATEGORIES)}
+    if year:
+        # Jahresgrenze auch für die Zahlungen, sonst gruppiert die CTE die ganze Tabelle
+        where = "WHERE d.month >= :start AND d.month < :end"
+        pay_where = "AND pay_date >= :start AND pay_date < :end"
+        params.update({"start": f"{int(year)}-01-01", "end": f"{int(year) + 1}-01-01"})
+    sql = text(f"""
+        WITH paid AS (
+            SELECT lease_id, strftime('%Y-%m-01', pay_date) AS month, SUM(amount) AS paid
+            FROM payments WHERE category IN :cats {pay_where}
+            GROUP BY lease_id, strftime('%Y-%m-01', pay_date)
+        )
+        SELECT d.lease_id, d.month, d.due_cold, d.due_warm AS due, COALESCE(p.paid, 0) AS paid
+        FROM rent_due d LEFT JOIN paid p ON p.lease_id = d.lease_id AND p.month = d.month
+        {where}
+        ORDER BY d.lease_id, d.month
+    """).bindparams(bindparam("cats", expanding=True))
+    with get_engine().connect() as con:
+        res = con.execute(sql, params)
+        df = pd.DataFrame.from_records(res.fetchall(), columns=list(res.keys()))
+    df["month"] = pd.to_datetime(df["month"], format="ISO8601")
+    df[["due_cold", "due", "paid"]] = df[["due_cold", "due", "paid"]].astype(float)
+    df["balance"] = (df["paid"] - df["due"]).round(2)
+    return df
+
+
+def due_vs_paid(year: int | None = None) -> pd.DataFrame:
+    """Soll/Ist je Vertrag und Monat: lease_id, month, due_cold, due, paid, balance (Ist − Soll)."""
+    ensure_current()
+    return _due_vs_paid(int(year) if year else None)
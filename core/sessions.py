@@ -0,0 +1,127 @@
+# core/sessions.py — Anmeldesitzungen über signierte Tokens (Cookie) statt erneuter Passwortprüfung
+#
+# Nach der Anmeldung erhält der Browser ein Cookie "<token>.<signatur>": Token zufällig (256 bit),
+# Signatur HMAC-SHA256 mit dem Server-Schlüssel. Gespeichert wird nur der SHA-256 des Tokens
+# (eindeutiger Index). Prüfen heißt: Signatur vergleichen (verwirft Fälschungen ohne DB-Zugriff),
+# dann genau eine indizierte Abfrage sessions ⨝ users — kein bcrypt. Sitzungen laufen nach
+# SESSION_DAYS ab, können einzeln oder je Benutzer widerrufen werden; sweep() räumt auf.
+from __future__ import annotations
+
+import base64
+import datetime as dt
+import hashlib
+import hmac
+import os
+import secrets
+
+from . import blobstore
+from .db import get_engine
+
+SESSION_COOKIE = "immo_session"
+SESSION_DAYS = 14
+SECRET_FILE = blobstore.DATA_DIR / "secret.key"     # per IMMO_SECRET_KEY überschreibbar
+
+_secret: bytes | None = None
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _iso(ts: dt.datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def secret_key() -> bytes:
+    """Server-Schlüssel für die Signatur: IMMO_SECRET_KEY oder einmalig erzeugte Datei (0600)."""
+    global _secret
+    if _secret is None:
+        env = os.environ.get("IMMO_SECRET_KEY")
+        if env:
+            _secret = env.encode()
+        elif SECRET_FILE.exists():
+            _secret = SECRET_FILE.read_bytes()
+        else:
+            SECRET_FILE.parent.mkdir(parents=True, exist_ok=True)
+            key = secrets.token_bytes(32)
+            fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(key)
+            _secret = key
+    return _secret
+
+
+def _sign(token: str) -> str:
+    mac = hmac.new(secret_key(), token.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _unpack(cookie: str | None) -> str | None:
+    """Token aus dem Cookie, wenn die Signatur stimmt."""
+    token, _, sig = (cookie or "").partition(".")
+    if not token or not sig or not hmac.compare_digest(sig, _sign(token)):
+        return None
+    return token
+
+
+def issue(username: str, ip: str | None = None, user_agent: str | None = None,
+          days: float = SESSION_DAYS) -> tuple[str, dt.datetime] | None:
+    """Legt eine Sitzung an; gibt (Cookie-Wert, Ablaufzeitpunkt) zurück, None bei unbekanntem Benutzer."""
+    token = secrets.token_urlsafe(32)
+    now = _now()
+    expires = now + dt.timedelta(days=days)
+    with get_engine().begin() as con:
+        res = con.exec_driver_sql(
+            "INSERT INTO sessions (user_id, token_hash, created_at, expires_at, ip, user_agent) "
+            "SELECT id, ?, ?, ?, ?, ? FROM users WHERE username = ? AND is_active = 1",
+            (_token_hash(token), _iso(now), _iso(expires), ip, (user_agent or "")[:200] or None, username),
+        )
+    if not res.rowcount:
+        return None
+    return f"{token}.{_sign(token)}", expires
+
+
+def validate(cookie: str | None) -> dict | None:
+    """auth-Eintrag für session_state, wenn das Cookie zu einer gültigen Sitzung gehört."""
+    token = _unpack(cookie)
+    if token is None:
+        return None
+    with get_engine().connect() as con:
+        row = con.exec_driver_sql(
+            "SELECT u.username, u.full_name, u.role FROM sessions s JOIN users u ON u.id = s.user_id "
+            "WHERE s.token_hash = ? AND s.revoked_at IS NULL AND s.expires_at > ? AND u.is_active = 1",
+            (_token_hash(token), _iso(_now())),
+        ).one_or_none()
+    if row is None:
+        return None
+    return {"username": row.username, "name": row.full_name or row.username, "role": row.role}
+
+
+def revoke(cookie: str | None) -> bool:
+    """Widerruft die Sitzung dieses Cookies (Abmelden)."""
+    token = _unpack(cookie)
+    if token is None:
+        return False
+    with get_engine().begin() as con:
+        return bool(con.exec_driver_sql(
+            "UPDATE sessions SET revoked_at = ? WHERE token_hash = ? AND revoked_at IS NULL",
+            (_iso(_now()), _token_hash(token))).rowcount)
+
+
+def revoke_user(username: str) -> int:
+    """Widerruft alle Sitzungen eines Benutzers (Passwortwechsel, Sperre); gibt die Anzahl zurück."""
+    with get_engine().begin() as con:
+        return con.exec_driver_sql(
+            "UPDATE sessions SET revoked_at = ? WHERE revoked_at IS NULL "
+            "AND user_id IN (SELECT id FROM users WHERE username = ?)", (_iso(_now()), username)).rowcount
+
+
+def sweep() -> int:
+    """Löscht abgelaufene und widerrufene Sitzungen; gibt die Anzahl zurück."""
+    with get_engine().begin() as con:
+        return con.exec_driver_sql(
+            "DELETE FROM sessions WHERE expires_at <= ? OR revoked_at IS NOT NULL", (_iso(_now()),)).rowcount
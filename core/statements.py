@@ -0,0 +1,485 @@
+# core/statements.py — Betriebskostenabrechnungen (Einzeln & Stapel als ZIP)
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+import pandas as pd
+from sqlalchemy import text
+
+from .allocation import Allocation, BLOCK_HEATING, BLOCK_OPERATING, allocate
+from .consumption import consumption_by_unit
+from .db import get_engine
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Deutsche Standardtexte; die Seite reicht übersetzte Labels über statement_labels(t) herein,
+# damit die Render-Funktionen ohne Streamlit-Session (z. B. im Prozesspool) laufen.
+DEFAULT_LABELS = {
+    "operating_costs_statement": "Betriebskostenabrechnung",
+    "property": "Objekt",
+    "unit_label": "Wohnung",
+    "tenant": "Mieter",
+    "year": "Jahr",
+    "total_costs": "Umlagefähige Kosten (€)",
+    "advances": "Vorauszahlungen (€)",
+    "balance": "Saldo (€)",
+    "footer_company": "Erstellt mit Immobilien-Manager",
+    "period": "Abrechnungszeitraum",
+    "days": "Tage",
+    "category": "Kategorie",
+    "net": "Netto (€)",
+    "vat": "USt (€)",
+    "gross": "Brutto (€)",
+}
+
+
+def statement_labels(tr: Callable[[str, str], str] | None = None) -> dict:
+    if tr is None:
+        return dict(DEFAULT_LABELS)
+    return {k: tr(k, v) for k, v in DEFAULT_LABELS.items()}
+
+
+def find_logo_path():
+    for p in ["assets/logo.png", "logo.png", "assets/logo.jpg", "logo.jpg"]:
+        if Path(p).is_file():
+            return p
+    return None
+
+
+# -----------------------------
+# Daten
+# -----------------------------
+def year_range(year: int) -> dict:
+    """Halboffenes Intervall [01.01., 01.01. Folgejahr) als ISO-Strings.
+
+    Datumsspalten liegen in SQLite als 'YYYY-MM-DD' vor; Bereichsvergleiche statt
+    strftime('%Y', ...) erlauben die Nutzung der (property_id, date)-Indizes.
+    """
+    return {"start": f"{int(year):04d}-01-01", "end": f"{int(year) + 1:04d}-01-01"}
+
+
+@dataclass
+class StatementInputs:
+    property_id: int
+    property_name: str
+    year: int
+    units: pd.DataFrame
+    allocation: Allocation
+    leases: pd.DataFrame      # lease_id, unit_id, unit_label, tenant, advances, period_from, period_to, days, share
+
+
+def occupancy_shares(leases: pd.DataFrame, year: int) -> pd.DataFrame:
+    """Ergänzt Nutzungszeitraum im Jahr (period_from/period_to inkl.), Tage und Anteil am Jahr.
+
+    end_date ist der letzte Miettag (inklusive). Tage ohne Mietvertrag trägt der Vermieter.
+    """
+    rng = year_range(year)
+    y_start, y_end = pd.Timestamp(rng["start"]), pd.Timestamp(rng["end"])
+    start = pd.to_datetime(leases["start_date"]).clip(lower=y_start)
+    end = (pd.to_datetime(leases["end_date"]) + pd.Timedelta(days=1)).fillna(y_end).clip(upper=y_end)
+    days = (end - start).dt.days.clip(lower=0)
+    return leases.drop(columns=["start_date", "end_date"]).assign(
+        period_from=start.dt.date, period_to=(end - pd.Timedelta(days=1)).dt.date,
+        days=days.astype(int), share=days / (y_end - y_start).days,
+    )
+
+
+def vacancy_shares(inputs: StatementInputs) -> pd.Series:
+    """Leerstandsanteil je Wohnung (Index unit_id) — diesen Teil der Kosten trägt der Vermieter."""
+    occupied = inputs.leases.groupby("unit_id")["share"].sum()
+    return (1.0 - occupied.reindex(inputs.allocation.unit_ids, fill_value=0.0)).rename("vacancy")
+
+
+def check_shares(inputs: StatementInputs, statements: list[dict]) -> list[int]:
+    """Mieteranteile + Leerstand müssen je Wohnung genau die Wohnungssumme ergeben.
+
+    Gibt die Wohnungen (unit_id) zurück, bei denen das nicht aufgeht — sich überschneidende
+    Verträge, die Wohnung würde mehrfach abgerechnet.
+    """
+    totals = inputs.allocation.totals()
+    billed = pd.Series([s["total"] for s in statements], index=[s["unit_id"] for s in statements], dtype=float)
+    billed = billed.groupby(level=0).sum().reindex(totals.index, fill_value=0.0)
+    vacancy = vacancy_shares(inputs)
+    bad = (vacancy.to_numpy() < -1e-9) | ((billed + vacancy.to_numpy() * totals - totals).abs() > 0.005).to_numpy()
+    return [int(u) for u in totals.index[bad]]
+
+
+def load_statement_inputs(prop_id: int, year: int) -> StatementInputs:
+    """Lädt alles für die Abrechnung eines Objekts/Jahres und verteilt die Kosten einmalig."""
+    engine = get_engine()
+    params = {"pid": int(prop_id), **year_range(year)}
+    prop_name = pd.read_sql(text("SELECT name FROM properties WHERE id = :pid"), engine, params=params)
+    units = pd.read_sql(text("SELECT id, unit_label, living_area_sqm FROM units WHERE property_id = :pid ORDER BY id"), engine, params=params)
+    cats = pd.read_sql("SELECT code, name, name_en, allocation_method, is_heating FROM cost_categories ORDER BY code", engine)
+    settings = pd.read_sql(text("SELECT * FROM property_settings WHERE property_id = :pid"), engine, params=params)
+    persons = pd.read_sql(text("SELECT unit_id, persons FROM unit_persons WHERE property_id = :pid AND year = :yr"), engine,
+                          params={"pid": int(prop_id), "yr": int(year)})
+    costs = pd.read_sql(text("""
+        SELECT id, category_code, unit_id, amount_gross, COALESCE(vat_rate,0) AS vat_rate
+        FROM operating_costs
+        WHERE property_id = :pid AND date >= :start AND date < :end
+        """), engine, params=params)
+    leases = pd.read_sql(text("""
+        SELECT l.id AS lease_id, u.id AS unit_id, u.unit_label, COALESCE(t.full_name,'') AS tenant,
+               l.start_date, l.end_date
+        FROM leases l
+        JOIN units u ON u.id = l.unit_id
+        LEFT JOIN tenants t ON t.id = l.tenant_id
+        WHERE u.property_id = :pid
+          AND l.start_date < :end
+          AND (l.end_date IS NULL OR l.end_date >= :start)
+        ORDER BY u.id
+        """), engine, params=params)
+    # Vorauszahlungen (Payments NK/Heizung) für alle Mietparteien in einer Abfrage
+    adv = pd.read_sql(text("""
+        SELECT p.lease_id, SUM(p.amount) AS advances
+        FROM payments p
+        JOIN leases l ON l.id = p.lease_id
+        JOIN units u ON u.id = l.unit_id
+        WHERE u.property_id = :pid AND p.pay_date >= :start AND p.pay_date < :end AND p.category IN ('NK','Heizung')
+        GROUP BY p.lease_id
+        """), engine, params=params)
+    leases = leases.merge(adv, on="lease_id", how="left")
+    leases["advances"] = leases["advances"].fillna(0.0).astype(float)
+    leases = occupancy_shares(leases, int(year))
+
+    settings_d = settings.iloc[0].to_dict() if not settings.empty else {}
+    persons_map = persons.set_index("unit_id")["persons"].to_dict() if not persons.empty else {}
+    allocation = allocate(units, costs, cats, settings_d, persons_map,
+                          consumption=lambda kind: consumption_by_unit(prop_id, int(year), kind))
+    return StatementInputs(
+        property_id=int(prop_id),
+        property_name=str(prop_name["name"].iloc[0]) if not prop_name.empty else f"#{prop_id}",
+        year=int(year), units=units, allocation=allocation, leases=leases,
+    )
+
+
+def build_statement(inputs: StatementInputs, lease: dict) -> dict:
+    """Abrechnungsdaten einer Mietpartei (reine Daten, picklebar für den Prozesspool).
+
+    Die Wohnungskosten werden nach Miettagen im Jahr anteilig umgelegt (lease["share"]).
+    """
+    share = float(lease.get("share", 1.0))
+    details = inputs.allocation.detail(int(lease["unit_id"]))
+    details[["gross", "net", "vat_amount"]] *= share
+    by_block = details.groupby("block")[["net", "vat_amount", "gross"]].sum().round(2)
+    blocks = {b: {c: float(by_block.loc[b, c]) if b in by_block.index else 0.0 for c in ("net", "vat_amount", "gross")}
+              for b in (BLOCK_OPERATING, BLOCK_HEATING)}
+    total = float(details["gross"].sum())
+    adv = float(lease.get("advances") or 0.0)
+    return {
+        "lease_id": int(lease["lease_id"]),
+        "unit_id": int(lease["unit_id"]),
+        "property": inputs.property_name,
+        "unit_label": str(lease["unit_label"]),
+        "tenant": str(lease.get("tenant") or ""),
+        "year": inputs.year,
+        "period": (lease.get("period_from"), lease.get("period_to"), int(lease.get("days") or 0)),
+        "blocks": blocks,
+        "categories": details.groupby("category")[["net", "vat_amount", "gross"]].sum().reset_index().round(2),
+        "total": total,
+        "advances": adv,
+        "balance": total - adv,
+    }
+
+
+def build_statements(inputs: StatementInputs, skipped: list[str] | None = None) -> list[dict]:
+    """Abrechnungen aller Verträge des Objekts.
+
+    Wohnungen mit sich überschneidenden Verträgen werden ausgelassen und als
+    "Objekt: Wohnung" an ``skipped`` angehängt; ohne ``skipped`` gibt es einen ValueError.
+    """
+    statements = [build_statement(inputs, lease) for lease in inputs.leases.to_dict("records")]
+    bad = check_shares(inputs, statements)
+    if not bad:
+        return statements
+    labels = inputs.units.set_index("id").loc[bad, "unit_label"].astype(str)
+    if skipped is None:
+        raise ValueError("Mietverträge überschneiden sich, Wohnung würde mehrfach abgerechnet: " + ", ".join(labels))
+    skipped.extend(f"{inputs.property_name}: {label}" for label in labels)
+    return [s for s in statements if s["unit_id"] not in set(bad)]
+
+
+def _period_text(stmt: dict, labels: dict) -> str:
+    start, end, days = stmt.get("period") or (None, None, 0)
+    if start is None:
+        return ""
+    return f"{start:%d.%m.%Y} – {end:%d.%m.%Y} ({days} {labels['days']})"
+
+
+# -----------------------------
+# Layout: Excel & PDF
+# -----------------------------
+def statement_filename(stmt: dict, ext: str) -> str:
+    return f"BKA_{stmt['year']}_{stmt['unit_label']}.{ext}".replace(" ", "_")
+
+
+def render_xlsx(stmt: dict, labels: dict) -> tuple[bytes, str, str]:
+    """Excel-Abrechnung mit Layout (xlsxwriter); Fallback CSV. Liefert (daten, dateiname, mime)."""
+    L = labels
+    cat_df = stmt["categories"].rename(columns={"category": L["category"], "net": L["net"], "vat_amount": L["vat"], "gross": L["gross"]})
+    try:
+        import xlsxwriter  # noqa: F401
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+            # Sheet Abrechnung
+            wb = writer.book
+            ws = wb.add_worksheet("Abrechnung")
+            writer.sheets["Abrechnung"] = ws
+
+            # Formats
+            fmt_title = wb.add_format({"bold": True, "font_size": 14})
+            fmt_bold = wb.add_format({"bold": True})
+            fmt_cur = wb.add_format({"num_format": '#,##0.00" €"'})
+
+            # Logo
+            logo = find_logo_path()
+            if logo:
+                try:
+                    ws.insert_image(0, 0, logo, {"x_scale": 0.5, "y_scale": 0.5})
+                except Exception:
+                    pass
+
+            ws.write(0, 3, L["operating_costs_statement"], fmt_title)
+            ws.write(2, 0, L["property"], fmt_bold); ws.write(2, 1, str(stmt["property"]))
+            ws.write(3, 0, L["unit_label"], fmt_bold); ws.write(3, 1, str(stmt["unit_label"]))
+            ws.write(4, 0, L["tenant"], fmt_bold); ws.write(4, 1, str(stmt["tenant"]))
+            ws.write(5, 0, L["year"], fmt_bold); ws.write(5, 1, int(stmt["year"]))
+            ws.write(6, 0, L["period"], fmt_bold); ws.write(6, 1, _period_text(stmt, L))
+
+            for row, block in ((7, BLOCK_OPERATING), (8, BLOCK_HEATING)):
+                vals = stmt["blocks"][block]
+                ws.write(row, 0, block, fmt_bold)
+                ws.write(row, 1, vals["net"], fmt_cur)
+                ws.write(row, 2, vals["vat_amount"], fmt_cur)
+                ws.write(row, 3, vals["gross"], fmt_cur)
+
+            ws.write(10, 0, L["total_costs"], fmt_bold); ws.write(10, 1, float(stmt["total"]), fmt_cur)
+            ws.write(11, 0, L["advances"], fmt_bold); ws.write(11, 1, float(stmt["advances"]), fmt_cur)
+            ws.write(12, 0, L["balance"], fmt_bold); ws.write(12, 1, float(stmt["balance"]), fmt_cur)
+
+            ws.set_column(0, 0, 28); ws.set_column(1, 3, 20)
+            ws.set_footer("&R" + L["footer_company"])
+
+            # Sheet Details
+            cat_df.to_excel(writer, sheet_name="Details", index=False)
+            ws2 = writer.sheets["Details"]; ws2.set_column(0, 0, 28); ws2.set_column(1, 3, 18)
+        return buf.getvalue(), statement_filename(stmt, "xlsx"), XLSX_MIME
+    except Exception:
+        # Fallback CSV
+        info = pd.DataFrame([{
+            L["property"]: stmt["property"], L["unit_label"]: stmt["unit_label"], L["tenant"]: stmt["tenant"],
+            L["year"]: int(stmt["year"]), L["period"]: _period_text(stmt, L), L["total_costs"]: round(stmt["total"], 2),
+            L["advances"]: round(stmt["advances"], 2), L["balance"]: round(stmt["balance"], 2),
+        }])
+        buf = io.StringIO()
+        info.to_csv(buf, index=False); buf.write("\n")
+        cat_df.to_csv(buf, index=False)
+        return buf.getvalue().encode("utf-8"), statement_filename(stmt, "csv"), "text/csv"
+
+
+def _fmt_eur(val: float) -> str:
+    return f"{val:,.2f} €".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def render_pdf(stmt: dict, labels: dict) -> bytes | None:
+    """PDF-Abrechnung (ReportLab -> Fallback WeasyPrint -> sonst None)."""
+    L = labels
+    bk, hz = stmt["blocks"][BLOCK_OPERATING], stmt["blocks"][BLOCK_HEATING]
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.units import mm
+        from reportlab.lib.utils import ImageReader
+
+        bufp = io.BytesIO()
+        c = canvas.Canvas(bufp, pagesize=A4)
+        w, h = A4
+
+        # Logo
+        logo = find_logo_path()
+        if logo:
+            try:
+                c.drawImage(ImageReader(logo), 15*mm, h-30*mm, width=30*mm, preserveAspectRatio=True, mask='auto')
+            except Exception:
+                pass
+
+        # Header
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(60*mm, h-20*mm, L["operating_costs_statement"])
+        c.setFont("Helvetica", 10)
+        c.drawString(15*mm, h-40*mm, f"{L['property']}: {stmt['property']}")
+        c.drawString(15*mm, h-46*mm, f"{L['unit_label']}: {stmt['unit_label']}")
+        c.drawString(15*mm, h-52*mm, f"{L['tenant']}: {stmt['tenant']}")
+        c.drawString(15*mm, h-58*mm, f"{L['year']}: {int(stmt['year'])}")
+        c.drawString(15*mm, h-64*mm, f"{L['period']}: {_period_text(stmt, L)}")
+
+        lines = [
+            ("Betriebskosten (Netto)", bk["net"]),
+            ("Betriebskosten (USt)", bk["vat_amount"]),
+            ("Betriebskosten (Brutto)", bk["gross"]),
+            ("Heizung (Netto)", hz["net"]),
+            ("Heizung (USt)", hz["vat_amount"]),
+            ("Heizung (Brutto)", hz["gross"]),
+            (L["advances"], stmt["advances"]),
+            (L["balance"], stmt["balance"]),
+        ]
+        ycur = h-76*mm
+        for lbl, val in lines:
+            c.setFont("Helvetica-Bold", 10); c.drawString(15*mm, ycur, lbl)
+            c.setFont("Helvetica", 10); c.drawRightString(180*mm, ycur, _fmt_eur(float(val)))
+            ycur -= 6*mm
+
+        c.setFont("Helvetica-Oblique", 8)
+        c.drawRightString(200*mm, 10*mm, L["footer_company"])
+        c.showPage(); c.save()
+        return bufp.getvalue()
+    except Exception:
+        try:
+            from weasyprint import HTML
+            html = f"""
+            <h2>{L['operating_costs_statement']}</h2>
+            <p><b>{L['property']}:</b> {stmt['property']}<br/>
+            <b>{L['unit_label']}:</b> {stmt['unit_label']}<br/>
+            <b>{L['tenant']}:</b> {stmt['tenant']}<br/>
+            <b>{L['year']}:</b> {int(stmt['year'])}<br/>
+            <b>{L['period']}:</b> {_period_text(stmt, L)}</p>
+            <table border='1' cellspacing='0' cellpadding='4'>
+            <tr><th>Block</th><th>Netto (€)</th><th>USt (€)</th><th>Brutto (€)</th></tr>
+            <tr><td>Betriebskosten</td><td>{bk['net']:.2f}</td><td>{bk['vat_amount']:.2f}</td><td>{bk['gross']:.2f}</td></tr>
+            <tr><td>Heizung</td><td>{hz['net']:.2f}</td><td>{hz['vat_amount']:.2f}</td><td>{hz['gross']:.2f}</td></tr>
+            </table>
+            <p><b>{L['advances']}:</b> {stmt['advances']:.2f}<br/>
+            <b>{L['balance']}:</b> {stmt['balance']:.2f}</p>
+            """
+            return HTML(string=html).write_pdf()
+        except Exception:
+            return None
+
+
+# -----------------------------
+# Stapel: alle Mietparteien -> ZIP
+# -----------------------------
+def _render_files(stmt: dict, labels: dict) -> list[tuple[str, bytes]]:
+    """Worker: rendert XLSX + PDF einer Mietpartei. Läuft im Prozesspool (kein Streamlit!)."""
+    folder = str(stmt["property"]).replace("/", "_")
+    data, fname, _ = render_xlsx(stmt, labels)
+    stem, ext = fname.rsplit(".", 1)
+    stem = f"{folder}/{stem}_L{stmt['lease_id']}"
+    files = [(f"{stem}.{ext}", data)]
+    pdf = render_pdf(stmt, labels)
+    if pdf:
+        files.append((f"{stem}.pdf", pdf))
+    return files
+
+
+def _take(it, n: int) -> list:
+    return [x for _, x in zip(range(n), it)]
+
+
+def write_statements_zip(
+    fileobj,
+    statements: Iterable[dict],
+    labels: dict | None = None,
+    max_workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> int:
+    """Rendert alle Abrechnungen (parallel) und schreibt sie fortlaufend in ein ZIP.
+
+    Es sind höchstens 2 × max_workers Abrechnungen gleichzeitig in Arbeit; fertige Dateien
+    werden sofort geschrieben und freigegeben. Gibt die Anzahl der Abrechnungen zurück.
+    """
+    labels = labels or statement_labels()
+    statements = list(statements)
+    total = len(statements)
+    workers = max_workers or min(4, os.cpu_count() or 1)
+    done = 0
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if total < 2 * workers or workers <= 1:
+            # Kleine Stapel: Prozessstart lohnt nicht
+            results = (_render_files(s, labels) for s in statements)
+            for files in results:
+                for name, data in files:
+                    zf.writestr(name, data)
+                done += 1
+                if progress:
+                    progress(done, total)
+        else:
+            pending = iter(statements)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                running = {pool.submit(_render_files, s, labels) for s in _take(pending, 2 * workers)}
+                while running:
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        for name, data in fut.result():
+                            zf.writestr(name, data)
+                        done += 1
+                        if progress:
+                            progress(done, total)
+                    running |= {pool.submit(_render_files, s, labels) for s in _take(pending, len(finished))}
+    return total
+
+
+def batch_statements_zip(
+    fileobj,
+    year: int,
+    property_ids: Iterable[int] | None = None,
+    labels: dict | None = None,
+    max_workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    skipped: list[str] | None = None,
+) -> int:
+    """Alle Abrechnungen aller (bzw. der gewählten) Objekte eines Jahres als ZIP.
+
+    Fehlerhafte Wohnungen (siehe build_statements) landen in ``skipped``, statt den ganzen
+    Lauf abzubrechen.
+    """
+    skipped = [] if skipped is None else skipped
+    if property_ids is None:
+        with get_engine().connect() as con:
+            property_ids = [r[0] for r in con.exec_driver_sql("SELECT id FROM properties ORDER BY id").fetchall()]
+    statements: list[dict] = []
+    for pid in property_ids:
+        inputs = load_statement_inputs(int(pid), int(year))
+        if inputs.units.empty:
+            continue
+        statements.extend(build_statements(inputs, skipped))
+    return write_statements_zip(fileobj, statements, labels, max_workers=max_workers, progress=progress)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Headless: python -m core.statements --year 2024 [--property 1 --property 2] --out bka.zip"""
+    ap = argparse.ArgumentParser(description="Betriebskostenabrechnungen als ZIP erzeugen")
+    ap.add_argument("--year", type=int, required=True)
+    ap.add_argument("--property", type=int, action="append", dest="properties", help="Objekt-ID (mehrfach möglich; Standard: alle)")
+    ap.add_argument("--out", default=None, help="Zieldatei (Standard: BKA_<Jahr>.zip)")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    out = args.out or f"BKA_{args.year}.zip"
+
+    def _progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    skipped: list[str] = []
+    with open(out, "wb") as fh:
+        n = batch_statements_zip(fh, args.year, args.properties, max_workers=args.workers,
+                                 progress=_progress, skipped=skipped)
+    # Fortschritt/Hinweise auf stderr, auf stdout nur der Pfad (wie python -m core export)
+    print(f"\n{n} Abrechnungen", file=sys.stderr)
+    if skipped:
+        print("Übersprungen (Mietverträge überschneiden sich): " + ", ".join(skipped), file=sys.stderr)
+    print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
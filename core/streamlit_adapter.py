@@ -0,0 +1,17 @@
+# core/streamlit_adapter.py — Cache-Backend für den Streamlit-Server
+#
+# Einzige Stelle in core mit streamlit-Import auf Modulebene; core.cache lädt das Modul nur, wenn eine
+# Streamlit-Laufzeit existiert. So greifen "Clear cache" im Menü und die Caches je Server.
+from __future__ import annotations
+
+import streamlit as st
+
+
+class StreamlitBackend:
+    name = "streamlit"
+
+    def memoize(self, fn, ttl: float | None = None, max_entries: int | None = None):
+        return st.cache_data(ttl=ttl, max_entries=max_entries, show_spinner=False)(fn)
+
+    def resource(self, fn):
+        return st.cache_resource(show_spinner=False)(fn)
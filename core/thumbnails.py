@@ -0,0 +1,109 @@
+# core/thumbnails.py — WebP-Vorschaubilder für Fotoraster und Avatare
+#
+# Vorschauen hängen nur am Inhalt (SHA-256 des Originals) und der Kantenlänge, liegen als
+# <DATA_DIR>/thumbs/<aa>/<sha>_<px>.webp neben dem Blob-Store und werden beim Upload oder
+# beim ersten Aufruf erzeugt. EXIF-Drehung wird angewendet, Metadaten (EXIF/ICC) entfallen.
+from __future__ import annotations
+
+import functools
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import blobstore
+
+GRID_PX = 480      # Fotoraster (5 Spalten)
+AVATAR_PX = 256    # Mieterfoto / Nutzer-Avatar
+QUALITY = 80
+
+THUMB_DIR = blobstore.DATA_DIR / "thumbs"
+
+
+def thumb_path(sha: str, px: int) -> Path:
+    return THUMB_DIR / sha[:2] / f"{sha}_{int(px)}.webp"
+
+
+def render_thumbnail(src, px: int) -> bytes:
+    """Original (Pfad oder Datei) -> WebP mit max. `px` Kantenlänge, ohne Metadaten."""
+    with Image.open(src) as img:
+        # JPEG: direkt in reduzierter Auflösung dekodieren (spart bei 4–8 MB Fotos das Meiste)
+        img.draft("RGB", (px, px))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((px, px), Image.Resampling.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if img.mode in ("LA", "P", "PA") else "RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=QUALITY, method=4)   # ohne exif=/icc_profile= -> entfernt
+    return buf.getvalue()
+
+
+def ensure_thumbnail(sha: str | None, px: int) -> Path | None:
+    """Legt die Vorschau an, falls sie fehlt; None, wenn das Original fehlt oder kein Bild ist."""
+    if not sha:
+        return None
+    target = thumb_path(sha, px)
+    if target.exists():
+        return target
+    src = blobstore.path_for(sha)
+    if not src.is_file():
+        return None
+    try:
+        data = render_thumbnail(src, px)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".thumb-")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+    os.replace(tmp, target)
+    return target
+
+
+def ensure_thumbnails(shas, px: int, max_workers: int | None = None) -> list[Path | None]:
+    """Mehrere Vorschauen parallel (Pillow gibt beim Dekodieren/Skalieren den GIL frei)."""
+    shas = list(shas)
+    if len(shas) <= 1:
+        return [ensure_thumbnail(s, px) for s in shas]
+    workers = max_workers or min(len(shas), os.cpu_count() or 2, 8)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda s: ensure_thumbnail(s, px), shas))
+
+
+class _NoThumbnail(Exception):
+    pass
+
+
+@functools.lru_cache(maxsize=512)
+def _thumbnail(sha: str, px: int) -> bytes:
+    path = ensure_thumbnail(sha, px)
+    if path is None:
+        raise _NoThumbnail(sha)       # Fehlschläge nicht cachen: Original kann noch kommen
+    return path.read_bytes()
+
+
+def thumbnail(sha: str | None, px: int) -> bytes | None:
+    """Vorschau-Bytes (lazy erzeugt); Inhalt ist über den Hash unveränderlich -> LRU ohne Invalidierung.
+
+    None, solange das Original fehlt oder nicht lesbar ist — der nächste Aufruf versucht es erneut.
+    """
+    if not sha:
+        return None
+    try:
+        return _thumbnail(sha, int(px))
+    except _NoThumbnail:
+        return None
+
+
+def sweep(dry_run: bool = False) -> int:
+    """Löscht Vorschauen, deren Original nicht mehr im Blob-Store liegt; gibt die Anzahl zurück."""
+    count = 0
+    for path in THUMB_DIR.glob("*/*.webp") if THUMB_DIR.exists() else ():
+        if not blobstore.exists(path.name.rsplit("_", 1)[0]):
+            if not dry_run:
+                path.unlink(missing_ok=True)
+            count += 1
+    return count
@@ -2,7 +2,10 @@ from core.auth import require_login; _authctx = require_login()
 import streamlit as st
 import pandas as pd
 from core.queries import df_properties, df_units, df_leases, df_payments
-from core.i18n import t
+from core.occupancy import active_leases
+from core.rentroll import due_vs_paid
+from core.amortization import monthly_totals
+from core.i18n import translator; t = translator()
 
 st.title(t("overview"))
 
@@ -17,29 +20,13 @@ with c2:
     st.metric(t("units_count"), 0 if units.empty else len(units))
 
 with c3:
-    today = pd.Timestamp.today().normalize()
-    if leases.empty:
-        active = 0
-    else:
-        le = leases.copy()
-        le["start_date"] = pd.to_datetime(le.get("start_date"), errors="coerce")
-        le["end_date"] = pd.to_datetime(le.get("end_date"), errors="coerce")
-        start_ok = le["start_date"] <= today
-        no_end = le["end_date"].isna()
-        end_ok = (~no_end) & (le["end_date"] >= today)
-        active = int((start_ok & (no_end | end_ok)).sum())
-    st.metric(t("active_leases"), active)
+    active_df = active_leases(leases=leases)
+    st.metric(t("active_leases"), 0 if active_df is None or active_df.empty else len(active_df))
 
 with c4:
     monthly_cold_rent = 0.0
-    if not leases.empty and "rent_cold" in leases.columns:
-        le = leases.copy()
-        le["start_date"] = pd.to_datetime(le.get("start_date"), errors="coerce")
-        le["end_date"] = pd.to_datetime(le.get("end_date"), errors="coerce")
-        start_ok = le["start_date"] <= today
-        no_end = le["end_date"].isna()
-        end_ok = (~no_end) & (le["end_date"] >= today)
-        monthly_cold_rent = float(le.loc[start_ok & (no_end | end_ok), "rent_cold"].fillna(0).sum())
+    if active_df is not None and not active_df.empty and "rent_cold" in active_df.columns:
+        monthly_cold_rent = float(active_df["rent_cold"].fillna(0).sum())
     st.metric(t("rent_cold_per_month", "Kaltmiete/Monat (€)"), f"{monthly_cold_rent:,.0f}".replace(",", "."))
 
 # Monthly development (Miete / Zinsen / Tilgung / Cashflow v1)
@@ -49,11 +36,10 @@ if pay is not None and not pay.empty:
     df["pay_date"] = pd.to_datetime(df.get("pay_date"), errors="coerce")
     df["month"] = df["pay_date"].dt.to_period("M").astype(str)
 
-    cat = df.get("category").fillna("Sonstiges").astype(str)
+    cat = df.get("category").astype(object).fillna("Sonstiges").astype(str)
     rent_label = t("cat_rent", "Miete")
     miete = df[cat.eq(rent_label)]
-    zinsen = df[cat.eq("Zinsen")]
-    tilgung = df[cat.eq("Tilgung")]
+    # Zinsen/Tilgung kommen aus den Tilgungsplänen; alte Handbuchungen dieser Kategorien zählen nicht mehr
     sonstige = df[~(cat.eq(rent_label) | cat.eq("Zinsen") | cat.eq("Tilgung"))]
 
     def by_month(d):
@@ -62,9 +48,12 @@ if pay is not None and not pay.empty:
         return d.groupby("month")["amount"].sum()
 
     miete_m = by_month(miete)
-    zinsen_m = by_month(zinsen)
-    tilgung_m = by_month(tilgung)
     sonstige_m = by_month(sonstige)
+    # nur das Zeitfenster der Zahlungen (ein Darlehen von 2005 brächte sonst ~250 Monate ohne Miete)
+    first_pay = df["pay_date"].min()
+    loans = monthly_totals(since=None if pd.isna(first_pay) else first_pay, until=pd.Timestamp.today())
+    loans.index = loans.index.to_period("M").astype(str)
+    zinsen_m, tilgung_m = loans["interest"], loans["principal"]
 
     all_months = sorted(set(miete_m.index) | set(zinsen_m.index) | set(tilgung_m.index) | set(sonstige_m.index))
     monat_df = pd.DataFrame(index=all_months)
@@ -74,6 +63,12 @@ if pay is not None and not pay.empty:
     monat_df["Sonstige"] = sonstige_m.reindex(all_months, fill_value=0)
     monat_df["Cashflow v1"] = monat_df["Miete"] - monat_df["Zinsen"] - monat_df["Sonstige"]
 
+    # Sollmiete (warm) aus der Sollstellung, für den Soll/Ist-Vergleich
+    due = due_vs_paid()
+    if not due.empty:
+        soll_m = due.groupby(due["month"].dt.to_period("M").astype(str))["due"].sum()
+        monat_df["Soll (Miete)"] = soll_m.reindex(all_months, fill_value=0).round(2)
+
     if not monat_df.empty:
         st.markdown("### Monatliche Entwicklung (Miete / Zinsen / Tilgung / Cashflow v1)")
         st.dataframe(monat_df.sort_index(ascending=False), use_container_width=True)
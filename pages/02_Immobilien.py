@@ -2,8 +2,10 @@ from core.auth import require_login; _authctx = require_login()
 import streamlit as st
 import pandas as pd
 import datetime as dt
+from core import blobstore, thumbnails
 from core.db import SessionCtx, Property, Unit, Lease, UnitPhoto, Radiator, Meter, MeterReading, get_engine
-from core.queries import df_properties, df_units, df_leases, df_unit_photos, df_radiators, df_meters, df_meter_readings, reset_caches
+from core.occupancy import active_leases
+from core.queries import df_properties, df_units, df_leases, df_unit_photos, unit_photo_image, df_radiators, df_meters, df_meter_readings, reset_caches
 
 st.header("Immobilien")
 
@@ -26,18 +28,15 @@ props_df = df_properties()
 units_df = df_units()
 leases_df = df_leases()
 
-# Aktive MV je Wohnung vorbereiten
+# Aktive MV je Wohnung vorbereiten (einmal gruppiert statt Filter je Wohnung)
+_active_df = active_leases(leases=leases_df)
+_active_by_unit = {} if _active_df is None or _active_df.empty else {
+    int(uid): grp.sort_values("start_date", ascending=False).to_dict("records")
+    for uid, grp in _active_df.groupby("unit_id")
+}
+
 def _active_leases_for_unit(uid:int):
-    if leases_df is None or leases_df.empty:
-        return []
-    today = pd.Timestamp.today().normalize()
-    sub = leases_df[leases_df['unit_id']==uid].copy()
-    if sub.empty:
-        return []
-    sub['start_date'] = pd.to_datetime(sub['start_date'], errors='coerce').dt.normalize()
-    sub['end_date'] = pd.to_datetime(sub['end_date'], errors='coerce').dt.normalize()
-    active = sub[(sub['start_date']<=today) & (sub['end_date'].isna() | (sub['end_date']>=today))]
-    return active.to_dict('records')
+    return _active_by_unit.get(int(uid), [])
 
 
 # ============ Objekt-Auswahl (oben) ============
@@ -103,7 +102,6 @@ else:
         recs = _active_leases_for_unit(int(uid))
         if not recs:
             return "—"
-        recs = sorted(recs, key=lambda r: pd.to_datetime(r.get('start_date')), reverse=True)
         rc = recs[0].get('rent_cold')
         try:
             return f"{float(rc):.2f}"
@@ -183,10 +181,12 @@ if selected_unit_id:
                                 max_pos = int(qmax or 0)
                             except Exception:
                                 max_pos = 0
-                            for idx, file in enumerate(to_add, start=1):
-                                img_bytes = file.read()
-                                s2.add(UnitPhoto(unit_id=selected_unit_id, filename=file.name, image=img_bytes, uploaded_at=dt.date.today(), position=max_pos+idx))
+                            stored = [blobstore.put_stream(file) for file in to_add]   # Dateien landen im Blob-Store, nicht in data.db
+                            for idx, (file, (sha, size)) in enumerate(zip(to_add, stored), start=1):
+                                s2.add(UnitPhoto(unit_id=selected_unit_id, filename=file.name, image=b"", image_sha256=sha, image_size=size, uploaded_at=dt.date.today(), position=max_pos+idx))
                             s2.commit()
+                        # Vorschauen gleich mit erzeugen (Thread-Pool)
+                        thumbnails.ensure_thumbnails([sha for sha, _ in stored], thumbnails.GRID_PX)
                         reset_caches(); st.success("Fotos gespeichert."); st.rerun()
             with c_info:
                 st.caption(f"Aktuell gespeichert: **{count_existing}/10**")
@@ -200,7 +200,13 @@ if selected_unit_id:
                 grid_cols = st.columns(5)
                 for i, (_, row) in enumerate(photos_df.iterrows()):
                     with grid_cols[i % 5]:
-                        st.image(row["image"], caption=row.get("filename") or f"Foto #{row['id']}", use_column_width=True)
+                        caption = row.get("filename") or f"Foto #{row['id']}"
+                        # Vorschau im Raster, Original nur auf Wunsch
+                        if st.checkbox("Original", key=f"ph_orig_{row['id']}"):
+                            st.image(unit_photo_image(int(row["id"])), caption=caption, use_column_width=True)
+                        else:
+                            thumb = thumbnails.thumbnail(row.get("image_sha256"), thumbnails.GRID_PX)
+                            st.image(thumb or unit_photo_image(int(row["id"])), caption=caption, use_column_width=True)
                         if st.checkbox("Löschen", key=f"ph_del_{row['id']}"):
                             del_ids.append(int(row['id']))
                         current_pos = int(row.get('position') or (i+1))
@@ -2,8 +2,11 @@ from core.auth import require_login; _authctx = require_login()
 import streamlit as st
 from sqlalchemy import select, func
 from core.db import SessionCtx, Tenant, Lease
-from core.queries import df_tenants, df_leases, df_units, reset_caches
-from core.i18n import t
+from core import blobstore, thumbnails
+from core.bankimport import normalize_iban
+from core.occupancy import active_leases
+from core.queries import df_tenants, tenant_photo, df_leases, df_units, reset_caches
+from core.i18n import translator; t = translator()
 import pandas as pd
 
 st.header(t("tenants"))
@@ -40,6 +43,7 @@ def _add_form(container):
         with c1:
             full_name = st.text_input(t("full_name") + "*")
             phone = st.text_input(t("phone"))
+            iban = st.text_input("IBAN", help=t("iban_help", "Für die automatische Zuordnung beim Bankimport"))
         with c2:
             email = st.text_input(t("email"))
             notes = st.text_area(t("notes"))
@@ -48,7 +52,8 @@ def _add_form(container):
         if not full_name.strip(): st.error(t("please_enter_name"))
         else:
             with SessionCtx() as s:
-                s.add(Tenant(full_name=full_name.strip(), phone=phone, email=email, notes=notes)); s.commit()
+                s.add(Tenant(full_name=full_name.strip(), phone=phone, email=email, notes=notes,
+                             iban=normalize_iban(iban) or None)); s.commit()
             reset_caches(); st.success(t("created"))
 
 def _edit_form(container):
@@ -65,6 +70,7 @@ def _edit_form(container):
             with c1:
                 tnt.full_name = st.text_input(t("full_name") + "*", value=tnt.full_name)
                 tnt.phone = st.text_input(t("phone"), value=tnt.phone or "")
+                tnt.iban = normalize_iban(st.text_input("IBAN", value=tnt.iban or "")) or None
             with c2:
                 tnt.email = st.text_input(t("email"), value=tnt.email or "")
                 tnt.notes = st.text_area(t("notes"), value=tnt.notes or "")
@@ -93,10 +99,7 @@ with h_icon2:
 _df = df_tenants().copy()
 leases = df_leases(); units = df_units()
 if leases is not None and not leases.empty:
-    today = pd.Timestamp.today().normalize()
-    leases['start_date'] = pd.to_datetime(leases['start_date'], errors='coerce').dt.normalize()
-    leases['end_date'] = pd.to_datetime(leases['end_date'], errors='coerce').dt.normalize()
-    active = leases[(leases['start_date']<=today) & (leases['end_date'].isna() | (leases['end_date']>=today))]
+    active = active_leases(leases=leases)
     unit_map = {int(r['id']): r.get('unit_label') for _, r in units.iterrows()} if (units is not None and not units.empty) else {}
     act_map = active.groupby('tenant_id').agg({'unit_id': list}).to_dict()['unit_id'] if not active.empty else {}
     def _active_units_for_tenant(tid:int):
@@ -175,21 +178,22 @@ if tid:
                 bd_val = pd.to_datetime(tnt.birth_date).date() if getattr(tnt,'birth_date', None) else None
                 bd = st.date_input('Geburtsdatum', value=bd_val, key=f'bd_{tid}')
             with c2:
-                if getattr(tnt,'photo', None):
-                    st.image(tnt.photo, caption=getattr(tnt,'photo_filename', None) or 'Foto', use_container_width=True)
+                if tnt.photo_sha256:
+                    # Vorschau, Original nur auf Wunsch
+                    if st.toggle('Original', key=f'tphoto_orig_{tid}'):
+                        img = tenant_photo(int(tid))
+                    else:
+                        img = thumbnails.thumbnail(tnt.photo_sha256, thumbnails.AVATAR_PX) or tenant_photo(int(tid))
+                    st.image(img, caption=getattr(tnt,'photo_filename', None) or 'Foto', use_container_width=True)
                 up = st.file_uploader('Neues Foto hochladen', type=['png','jpg','jpeg','webp'], key=f'tphoto_{tid}')
             # aktiver Mietvertrag
             leases = df_leases()
             active = None
             if leases is not None and not leases.empty and 'tenant_id' in leases.columns:
-                dfL = leases[leases['tenant_id']==int(tid)].copy()
-                if not dfL.empty:
-                    dfL['start_date'] = pd.to_datetime(dfL['start_date'], errors='coerce').dt.normalize()
-                    dfL['end_date'] = pd.to_datetime(dfL['end_date'], errors='coerce').dt.normalize()
-                    today = pd.Timestamp.today().normalize()
-                    act = dfL[(dfL['start_date']<=today) & ((dfL['end_date'].isna()) | (dfL['end_date']>=today))]
-                    if not act.empty:
-                        active = act.iloc[0].to_dict()
+                act = active_leases(leases=leases)
+                act = act[act['tenant_id']==int(tid)]
+                if not act.empty:
+                    active = act.iloc[0].to_dict()
             if active:
                 st.success(f"Aktiver Mietvertrag: #{active['id']} – Wohnung {active.get('unit_label') or active.get('unit_id')} (Start {active['start_date'].date()})")
                 try:
@@ -206,10 +210,11 @@ if tid:
                     s2.commit()
                 reset_caches(); st.success('Gespeichert.')
             if colB.button('Foto speichern', key=f'save_photo_{tid}') and up is not None:
-                content = up.read()
+                sha, size = blobstore.put_stream(up)
+                thumbnails.ensure_thumbnail(sha, thumbnails.AVATAR_PX)
                 with SessionCtx() as s3:
                     obj = s3.get(Tenant, int(tid))
-                    obj.photo = content
+                    obj.photo_sha256, obj.photo_size = sha, size
                     obj.photo_filename = up.name
                     s3.commit()
                 reset_caches(); st.success('Foto gespeichert.'); st.rerun()
@@ -3,7 +3,7 @@ import streamlit as st
 import datetime as dt
 from core.db import SessionCtx, Lease, Unit
 from core.queries import df_units, df_tenants, df_leases, reset_caches
-from core.i18n import t
+from core.i18n import translator; t = translator()
 
 st.header(t("leases"))
 
@@ -3,7 +3,8 @@ import streamlit as st
 import datetime as dt
 from core.db import SessionCtx, Payment
 from core.queries import df_leases, df_payments, reset_caches
-from core.i18n import t
+from core.reconciliation import DUE_DAY, month_postings, open_items, post_payments, sync_ledger
+from core.i18n import translator; t = translator()
 
 st.header(t("payments"))
 
@@ -42,6 +43,7 @@ def _add_form(container):
     if submitted:
         with SessionCtx() as s:
             s.add(Payment(lease_id=l_map[lease_key], pay_date=pay_date, amount=amount, category=category, note=note)); s.commit()
+        sync_ledger([l_map[lease_key]])   # offene Posten nur für diesen Vertrag neu verrechnen
         reset_caches(); st.success(t("payment_recorded"))
 
 # Kopfzeile (bei Zahlungen reicht 1 Icon: Zahlung erfassen)
@@ -50,6 +52,56 @@ with h_left: st.markdown(f"<h3 class='page-head'>{t('payments')}</h3>", unsafe_a
 with h_icon:
     with _popover_or_expander(st, "➕", t("record_payment")): _add_form(st)
 
+# Monatsbuchung: alle im Monat aktiven Verträge auf einmal, Ausnahmen abwählen
+def _batch_form():
+    today = dt.date.today()
+    months = [dt.date((k := today.year * 12 + today.month - 1 - i) // 12, k % 12 + 1, 1) for i in range(13)]
+    c1, c2, c3 = st.columns(3)
+    month = c1.selectbox(t("month", "Monat"), months, format_func=lambda d: d.strftime("%m/%Y"), key="batch_month")
+    pay_date = c2.date_input(t("date") + "*", value=month.replace(day=DUE_DAY), key=f"batch_date_{month}")
+    cats = [t("cat_rent"), t("cat_nk"), t("cat_deposit"), t("cat_other")]
+    category = c3.selectbox(t("category"), cats, key="batch_category")
+    plan = month_postings(month)
+    if plan.empty:
+        st.info(t("no_active_leases", "Keine aktiven Mietverträge in diesem Monat.")); return
+    plan = plan.assign(category=category)
+    edited = st.data_editor(
+        plan, use_container_width=True, hide_index=True, key=f"batch_editor_{month}",
+        disabled=["lease_id", "unit_label", "tenant_name", "due_cold", "due_warm", "paid"],
+        column_config={
+            "post": st.column_config.CheckboxColumn(label=t("post", "Buchen")),
+            "lease_id": st.column_config.NumberColumn(label="MV", format="%d"),
+            "unit_label": st.column_config.Column(label=t("unit_label", "Wohnung")),
+            "tenant_name": st.column_config.Column(label=t("tenant", "Mieter")),
+            "due_cold": st.column_config.NumberColumn(label=t("rent_cold", "Kaltmiete"), format="€ %.2f"),
+            "due_warm": st.column_config.NumberColumn(label=t("rent_warm", "Warmmiete"), format="€ %.2f"),
+            "paid": st.column_config.NumberColumn(label=t("paid", "Bezahlt"), format="€ %.2f"),
+            "amount": st.column_config.NumberColumn(label=t("amount"), format="€ %.2f", min_value=0.0),
+            "category": st.column_config.SelectboxColumn(label=t("category"), options=cats),
+        },
+    )
+    rows = edited[edited["post"].astype(bool) & (edited["amount"] > 0)]
+    # bereits voll bezahlte Verträge nur nach ausdrücklicher Bestätigung erneut buchen
+    covered = rows["paid"] >= rows["due_warm"] - 0.005
+    if covered.any():
+        allow_paid = st.checkbox(t("batch_allow_paid", "Auch bereits bezahlte Verträge buchen ({n})").format(n=int(covered.sum())),
+                                 value=False, key=f"batch_allow_paid_{month}")
+        if not allow_paid:
+            rows = rows[~covered]
+    st.write(f"{len(rows)} / {len(edited)} · € {rows['amount'].sum():,.2f}")
+    if st.button(t("post_month", "Monat buchen"), type="primary", disabled=rows.empty, key="batch_post"):
+        n = post_payments(rows.assign(pay_date=pay_date, note=t("batch_note", "Monatsbuchung") + f" {month:%m/%Y}"))
+        # Editor-Änderungen verwerfen, sonst würden sie im nächsten Lauf erneut angewandt (und gebucht)
+        st.session_state.pop(f"batch_editor_{month}", None)
+        st.session_state.pop(f"batch_allow_paid_{month}", None)
+        st.session_state["batch_posted"] = n
+        st.rerun()
+    if "batch_posted" in st.session_state:
+        st.success(t("payments_posted", "{n} Zahlungen gebucht.").format(n=st.session_state.pop("batch_posted")))
+
+with st.expander(t("batch_posting", "Monatsbuchung (alle aktiven Verträge)")):
+    _batch_form()
+
 # Tabelle
 _df = df_payments().copy()
 if not _df.empty:
@@ -64,3 +116,29 @@ if "amount" in _df.columns: cfg["amount"] = st.column_config.NumberColumn(label=
 if "category" in _df.columns: cfg["category"] = st.column_config.Column(label=t("category"))
 if "note" in _df.columns: cfg["note"] = st.column_config.Column(label=t("note"))
 st.dataframe(_df, use_container_width=True, hide_index=True, column_config=cfg)
+
+# Offene Posten je Mietvertrag (FIFO-Verrechnung, siehe core.reconciliation)
+st.markdown("#### " + t("open_items", "Offene Posten"))
+_leases = df_leases()
+if not _leases.empty:
+    _l_map = {f"#{row['id']} – Whg {row['unit_label']} / {row['tenant_name']}": int(row['id']) for _, row in _leases.iterrows()}
+    _sel = st.selectbox(t("leases"), list(_l_map.keys()), key="open_items_lease")
+    _items = open_items(_l_map[_sel])
+    if _items.empty:
+        st.success(t("no_open_items", "Keine offenen Posten."))
+    else:
+        _items = _items.assign(kind=_items["kind"].map({"RENT": t("cat_rent", "Miete"), "ADVANCE": t("cat_nk", "NK")}))
+        st.metric(t("open_total", "Offen gesamt (€)"), f"{_items['open'].sum():,.2f}")
+        st.dataframe(
+            _items[["month", "kind", "due_date", "amount", "paid", "open", "days_overdue"]],
+            use_container_width=True, hide_index=True,
+            column_config={
+                "month": st.column_config.DateColumn(label=t("month", "Monat"), format="MM/YYYY"),
+                "kind": st.column_config.Column(label=t("category")),
+                "due_date": st.column_config.DateColumn(label=t("due_date", "Fällig")),
+                "amount": st.column_config.NumberColumn(label=t("amount"), format="€ %.2f"),
+                "paid": st.column_config.NumberColumn(label=t("paid", "Bezahlt"), format="€ %.2f"),
+                "open": st.column_config.NumberColumn(label=t("open", "Offen"), format="€ %.2f"),
+                "days_overdue": st.column_config.NumberColumn(label=t("days_overdue", "Tage überfällig"), format="%d"),
+            },
+        )
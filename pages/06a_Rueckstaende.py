@@ -0,0 +1,55 @@
+from core.auth import require_login; _authctx = require_login()
+import streamlit as st
+import pandas as pd
+from core.queries import df_leases
+from core.reconciliation import arrears, open_items
+from core.i18n import translator; t = translator()
+
+st.header(t("arrears", "Rückstände"))
+
+summary = arrears()
+leases = df_leases()
+if summary.empty:
+    st.success(t("no_arrears", "Keine Mietrückstände."))
+    st.stop()
+
+info = leases[["id", "unit_label", "tenant_name", "property_name"]].rename(columns={"id": "lease_id"})
+summary = summary.merge(info, on="lease_id", how="left")
+
+c1, c2 = st.columns([1, 2])
+min_days = c1.number_input(t("min_days_overdue", "ab Tagen überfällig"), min_value=0, value=0, step=5)
+props = sorted(p for p in summary["property_name"].dropna().unique())
+prop_sel = c2.multiselect(t("properties", "Objekte"), props)
+view = summary[summary["max_days_overdue"] >= min_days]
+if prop_sel:
+    view = view[view["property_name"].isin(prop_sel)]
+
+k1, k2, k3 = st.columns(3)
+k1.metric(t("open_total", "Offen gesamt (€)"), f"{view['open_total'].sum():,.2f}")
+k2.metric(t("leases_in_arrears", "Verträge mit Rückstand"), len(view))
+k3.metric(t("max_days_overdue", "max. Tage überfällig"), int(view["max_days_overdue"].max()) if not view.empty else 0)
+
+st.dataframe(
+    view[["lease_id", "property_name", "unit_label", "tenant_name", "open_total", "items", "oldest_due", "max_days_overdue", "credit"]],
+    use_container_width=True, hide_index=True,
+    column_config={
+        "lease_id": st.column_config.NumberColumn(label="MV", format="%d"),
+        "property_name": st.column_config.Column(label=t("property", "Objekt")),
+        "unit_label": st.column_config.Column(label=t("unit_label", "Wohnung")),
+        "tenant_name": st.column_config.Column(label=t("tenant", "Mieter")),
+        "open_total": st.column_config.NumberColumn(label=t("open", "Offen"), format="€ %.2f"),
+        "items": st.column_config.NumberColumn(label=t("open_items", "Offene Posten"), format="%d"),
+        "oldest_due": st.column_config.DateColumn(label=t("oldest_due", "Ältester Posten")),
+        "max_days_overdue": st.column_config.NumberColumn(label=t("days_overdue", "Tage überfällig"), format="%d"),
+        "credit": st.column_config.NumberColumn(label=t("credit", "Guthaben"), format="€ %.2f"),
+    },
+)
+
+# Posten eines Vertrags
+if not view.empty:
+    labels = {f"#{int(r.lease_id)} – {r.unit_label} / {r.tenant_name}": int(r.lease_id) for r in view.itertuples(index=False)}
+    sel = st.selectbox(t("leases"), list(labels), key="arrears_lease")
+    items = open_items(labels[sel])
+    items = items[items["due_date"] <= pd.Timestamp.today().normalize()]
+    items = items.assign(kind=items["kind"].map({"RENT": t("cat_rent", "Miete"), "ADVANCE": t("cat_nk", "NK")}))
+    st.dataframe(items[["month", "kind", "due_date", "amount", "paid", "open", "days_overdue"]], use_container_width=True, hide_index=True)
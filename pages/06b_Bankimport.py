@@ -0,0 +1,83 @@
+from core.auth import require_login; _authctx = require_login()
+import hashlib
+import streamlit as st
+import pandas as pd
+from core.bankimport import RULE_AMOUNT_NAME, RULE_IBAN, RULE_REF, STATUS_DEBIT, STATUS_DUPLICATE, STATUS_NEW, \
+    STATUS_POSSIBLE_DUPLICATE, import_payments, review
+from core.queries import df_leases
+from core.i18n import translator; t = translator()
+
+st.header(t("bank_import", "Bankimport"))
+st.caption(t("bank_import_hint", "Kontoauszug als CSV, CAMT.053 (XML) oder MT940 hochladen, Zuordnung prüfen, dann übernehmen."))
+
+up = st.file_uploader(t("bank_statement", "Kontoauszug"), type=["csv", "txt", "xml", "sta", "mt940"])
+if up is None:
+    st.stop()
+
+# Prüftabelle nur einmal je Datei berechnen; Änderungen im Editor bleiben über Reruns erhalten
+_digest = hashlib.blake2b(up.getvalue(), digest_size=8).hexdigest()
+_key = (up.name, _digest)
+if st.session_state.get("bank_import_key") != _key:
+    with st.spinner(t("reading", "Lese Kontoauszug …")):
+        st.session_state["bank_import_frame"] = review(up, up.name)
+    st.session_state["bank_import_key"] = _key
+frame = st.session_state["bank_import_frame"]
+if frame.empty:
+    st.warning(t("no_transactions", "Keine Buchungen erkannt.")); st.stop()
+
+leases = df_leases()
+lease_labels = {int(r.id): f"#{int(r.id)} – {r.unit_label} / {r.tenant_name}" for r in leases.itertuples(index=False)}
+rule_labels = {RULE_IBAN: "IBAN", RULE_REF: t("reference", "Verwendungszweck"), RULE_AMOUNT_NAME: t("amount_name", "Betrag + Name"), "": "–"}
+status_labels = {STATUS_NEW: t("status_new", "neu"), STATUS_DUPLICATE: t("status_duplicate", "bereits importiert"),
+                 STATUS_POSSIBLE_DUPLICATE: t("status_possible_duplicate", "evtl. doppelt"), STATUS_DEBIT: t("status_debit", "Belastung")}
+
+k1, k2, k3, k4 = st.columns(4)
+k1.metric(t("transactions", "Buchungen"), len(frame))
+k2.metric(t("credits", "Gutschriften"), int((frame["amount"] > 0).sum()))
+k3.metric(t("matched", "zugeordnet"), int(frame["lease_id"].notna().sum()))
+k4.metric(t("duplicates", "Dubletten"), int((frame["status"] == STATUS_DUPLICATE).sum()))
+
+c1, c2, c3 = st.columns([1, 1, 1])
+only_credits = c1.toggle(t("only_credits", "nur Gutschriften"), value=True)
+category = c2.selectbox(t("category"), [t("cat_rent"), t("cat_nk"), t("cat_deposit"), t("cat_other")])
+learn_iban = c3.checkbox(t("learn_iban", "IBAN bei Mietern ohne IBAN speichern"), value=True)
+
+view = frame[frame["amount"] > 0] if only_credits else frame
+view = view.assign(
+    lease=view["lease_id"].map(lambda i: lease_labels.get(int(i)) if pd.notna(i) else None),
+    rule=view["rule"].map(rule_labels),
+    status=view["status"].map(status_labels),
+)
+edited = st.data_editor(
+    view[["import", "booking_date", "amount", "counterparty", "iban", "purpose", "lease", "rule", "status"]],
+    # Editor-Änderungen gelten zeilenweise nach Position: Schlüssel je Datei und Ansicht, sonst
+    # würden Häkchen/Zuordnungen des vorigen Auszugs auf fremde Buchungen übertragen
+    use_container_width=True, hide_index=True, key=f"bank_import_editor_{_digest}_{int(only_credits)}",
+    disabled=["booking_date", "amount", "counterparty", "iban", "purpose", "rule", "status"],
+    column_config={
+        "import": st.column_config.CheckboxColumn(label=t("import", "Import")),
+        "booking_date": st.column_config.DateColumn(label=t("date")),
+        "amount": st.column_config.NumberColumn(label=t("amount"), format="€ %.2f"),
+        "counterparty": st.column_config.Column(label=t("counterparty", "Zahler/Empfänger")),
+        "purpose": st.column_config.Column(label=t("reference", "Verwendungszweck")),
+        "lease": st.column_config.SelectboxColumn(label=t("leases"), options=list(lease_labels.values())),
+        "rule": st.column_config.Column(label=t("rule", "Regel")),
+        "status": st.column_config.Column(label=t("status", "Status")),
+    },
+)
+
+selected = edited["import"].astype(bool) & edited["lease"].notna()
+st.write(t("selected_for_import", "Zur Übernahme markiert") + f": **{int(selected.sum())}** "
+         f"(€ {frame.loc[edited.index[selected.to_numpy()], 'amount'].sum():,.2f})")
+
+if st.button(t("import_payments", "Zahlungen übernehmen"), type="primary", disabled=not selected.any()):
+    by_label = {v: k for k, v in lease_labels.items()}
+    rows = frame.loc[edited.index].assign(
+        lease_id=edited["lease"].map(by_label).astype("Int64"),
+        **{"import": edited["import"].astype(bool)},
+    )
+    result = import_payments(rows, category, learn_iban=learn_iban)
+    st.session_state.pop("bank_import_key", None)   # Status (Dubletten) beim nächsten Lauf neu bestimmen
+    for _k in [k for k in st.session_state if str(k).startswith(f"bank_import_editor_{_digest}_")]:
+        st.session_state.pop(_k, None)
+    st.success(t("bank_import_done", "{inserted} Zahlungen übernommen, {skipped} übersprungen ({leases} Verträge).").format(**result))
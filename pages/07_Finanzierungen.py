@@ -3,7 +3,8 @@ import streamlit as st
 import datetime as dt
 from core.db import SessionCtx, Financing, Unit
 from core.queries import df_units, df_financings, reset_caches
-from core.i18n import t
+from core.amortization import loan_status, schedules
+from core.i18n import translator; t = translator()
 
 st.header(t("financings"))
 
@@ -127,10 +128,14 @@ with h_icon2:
 # ---------- Tabelle ----------
 _df = df_financings().copy()
 if not _df.empty:
+    # Rate, Restschuld, Zinsen/Tilgung aus dem Tilgungsplan statt Handeingabe
+    _status = loan_status(fins=_df).rename(columns={"financing_id": "id", "payment": "monthly_payment"})
+    _df = _df.drop(columns=["monthly_payment", "remaining_balance"], errors="ignore").merge(_status, on="id", how="left")
     preferred = [
         "id","unit_id","unit_label","lender_name","loan_number",
         "start_date","end_date","principal_amount","interest_rate","repayment_rate",
-        "monthly_payment","fixed_rate_until","remaining_balance","purpose","collateral","notes",
+        "monthly_payment","fixed_rate_until","remaining_balance","interest_ytd","principal_ytd",
+        "balance_fixed_end","payoff_month","purpose","collateral","notes",
     ]
     ordered = [c for c in preferred if c in _df.columns] + [c for c in _df.columns if c not in preferred]
     _df = _df[ordered]
@@ -149,6 +154,10 @@ cfg = {
     "monthly_payment": st.column_config.NumberColumn(label=t("monthly_payment"), format="€ %.2f"),
     "fixed_rate_until": st.column_config.DateColumn(label=t("fixed_rate_until")),
     "remaining_balance": st.column_config.NumberColumn(label=t("remaining_balance"), format="€ %.2f") if "remaining_balance" in _df.columns else None,
+    "interest_ytd": st.column_config.NumberColumn(label=t("interest_ytd", "Zinsen lfd. Jahr"), format="€ %.2f"),
+    "principal_ytd": st.column_config.NumberColumn(label=t("principal_ytd", "Tilgung lfd. Jahr"), format="€ %.2f"),
+    "balance_fixed_end": st.column_config.NumberColumn(label=t("balance_fixed_end", "Restschuld Zinsbindungsende"), format="€ %.2f"),
+    "payoff_month": st.column_config.DateColumn(label=t("payoff_month", "getilgt"), format="MM/YYYY"),
     "purpose": st.column_config.Column(label=t("purpose")),
     "collateral": st.column_config.Column(label=t("collateral")),
     "notes": st.column_config.Column(label=t("notes")),
@@ -157,3 +166,26 @@ cfg = {
 cfg = {k:v for k,v in cfg.items() if v is not None}
 
 st.dataframe(_df, use_container_width=True, hide_index=True, column_config=cfg)
+
+# ---------- Tilgungsplan ----------
+if not _df.empty:
+    st.markdown("#### " + t("amortization_schedule", "Tilgungsplan"))
+    _opts = {f"#{int(r.id)} – {r.unit_label} / {r.lender_name}": int(r.id) for r in _df.itertuples(index=False)}
+    _fid = _opts[st.selectbox(t("select_financing"), list(_opts), key="schedule_financing")]
+    _plan = schedules(_df[_df["id"] == _fid])
+    if _plan.empty:
+        st.info(t("no_data"))
+    else:
+        _yearly = _plan.groupby(_plan["month"].dt.year).agg(
+            payment=("payment", "sum"), interest=("interest", "sum"), principal=("principal", "sum"), balance=("balance", "last"),
+        ).round(2)
+        st.bar_chart(_yearly[["interest", "principal"]], use_container_width=True)
+        st.dataframe(
+            _yearly, use_container_width=True,
+            column_config={
+                "payment": st.column_config.NumberColumn(label=t("installments", "Raten"), format="€ %.2f"),
+                "interest": st.column_config.NumberColumn(label=t("interest", "Zinsen"), format="€ %.2f"),
+                "principal": st.column_config.NumberColumn(label=t("principal", "Tilgung"), format="€ %.2f"),
+                "balance": st.column_config.NumberColumn(label=t("remaining_balance"), format="€ %.2f"),
+            },
+        )
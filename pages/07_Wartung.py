@@ -2,7 +2,7 @@ from core.auth import require_login; _authctx = require_login()
 import streamlit as st
 from core.db import SessionCtx, MaintenanceTask
 from core.queries import df_properties, df_tasks, reset_caches
-from core.i18n import t
+from core.i18n import translator; t = translator()
 
 st.header(t("tasks"))
 
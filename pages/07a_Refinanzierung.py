@@ -0,0 +1,87 @@
+from core.auth import require_login; _authctx = require_login()
+import streamlit as st
+import numpy as np
+import pandas as pd
+from core.refinancing import RateModel, affected_loans, grid, simulate
+from core.i18n import translator; t = translator()
+
+st.header(t("refinancing", "Anschlussfinanzierung"))
+st.caption(t("refinancing_hint", "Darlehen mit auslaufender Zinsbindung: Restschuld zum Zinsbindungsende wird mit simulierten Anschlusszinsen neu verrentet."))
+
+c1, c2, c3 = st.columns(3)
+within = c1.slider(t("window_years", "Zinsbindung endet in (Jahren)"), 1, 10, 5)
+horizon = c2.slider(t("horizon_years", "Restschuld nach (Jahren ab heute)"), within, 30, max(10, within))
+own_rep = c3.checkbox(t("keep_repayment", "bisherige Tilgung beibehalten"), value=True)
+repayment = None if own_rep else c3.number_input(t("repayment_rate"), min_value=0.0, value=2.0, step=0.25)
+
+loans = affected_loans(within)
+if loans.empty:
+    st.info(t("no_refinancing", "Keine Darlehen mit Zinsbindungsende im gewählten Zeitraum.")); st.stop()
+
+mode = st.radio(t("scenario_mode", "Szenarien"), ["Monte Carlo", t("grid", "Raster")], horizontal=True)
+
+if mode == "Monte Carlo":
+    m1, m2, m3, m4, m5 = st.columns(5)
+    model = RateModel(
+        r0=m1.number_input(t("rate_today", "Zins heute %"), value=3.5, step=0.1),
+        theta=m2.number_input(t("rate_mean", "Langfristiges Mittel %"), value=3.5, step=0.1),
+        kappa=m3.number_input(t("mean_reversion", "Rückkehr κ"), min_value=0.0, value=0.25, step=0.05),
+        sigma=m4.number_input(t("volatility", "Volatilität σ"), min_value=0.0, value=0.8, step=0.1),
+        spread=m5.number_input(t("spread", "Bankaufschlag %"), value=0.0, step=0.1),
+    )
+    n_paths = st.select_slider(t("paths", "Pfade"), [1_000, 2_500, 5_000, 10_000, 25_000, 50_000], value=10_000)
+    with st.spinner(t("simulating", "Simuliere …")):
+        res = simulate(model, n_paths=n_paths, within_years=within, horizon_years=horizon, repayment=repayment)
+
+    props = res["properties"]
+    k1, k2, k3 = st.columns(3)
+    k1.metric(t("affected_loans", "betroffene Darlehen"), len(res["loans"]))
+    k2.metric(t("current_rate_total", "Raten heute (€/Monat)"), f"{props['current_payment'].sum():,.0f}")
+    k3.metric(t("new_rate_median", "Raten danach, Median (€/Monat)"), f"{np.median(res['portfolio']):,.0f}",
+              delta=f"{np.median(res['portfolio']) - props['current_payment'].sum():,.0f}", delta_color="inverse")
+
+    st.markdown("#### " + t("per_property", "Je Objekt"))
+    money = lambda label: st.column_config.NumberColumn(label=label, format="€ %.0f")
+    st.dataframe(
+        props[["property_name", "loans", "balance", "current_payment", "payment_p5", "payment_p50", "payment_p95",
+               "debt_p5", "debt_p50", "debt_p95"]],
+        use_container_width=True, hide_index=True,
+        column_config={
+            "property_name": st.column_config.Column(label=t("property", "Objekt")),
+            "loans": st.column_config.NumberColumn(label=t("financings"), format="%d"),
+            "balance": money(t("balance_fixed_end", "Restschuld Zinsbindungsende")),
+            "current_payment": money(t("current_payment", "Rate heute")),
+            "payment_p5": money("Rate P5"), "payment_p50": money("Rate P50"), "payment_p95": money("Rate P95"),
+            "debt_p5": money(t("debt", "Restschuld") + " P5"), "debt_p50": money(t("debt", "Restschuld") + " P50"),
+            "debt_p95": money(t("debt", "Restschuld") + " P95"),
+        },
+    )
+
+    st.markdown("#### " + t("portfolio_distribution", "Verteilung Summenrate (Portfolio)"))
+    counts, edges = np.histogram(res["portfolio"], bins=40)
+    st.bar_chart(pd.DataFrame({t("paths", "Pfade"): counts}, index=np.round((edges[:-1] + edges[1:]) / 2, 0)))
+
+    with st.expander(t("per_loan", "Je Darlehen")):
+        st.dataframe(
+            res["loans"][["financing_id", "property_name", "unit_label", "lender_name", "fixed_rate_until", "balance",
+                          "payment", "payment_p5", "payment_p50", "payment_p95"]],
+            use_container_width=True, hide_index=True,
+            column_config={
+                "fixed_rate_until": st.column_config.DateColumn(label=t("fixed_rate_until")),
+                "balance": money(t("balance_fixed_end", "Restschuld Zinsbindungsende")),
+                "payment": money(t("current_payment", "Rate heute")),
+                "payment_p5": money("Rate P5"), "payment_p50": money("Rate P50"), "payment_p95": money("Rate P95"),
+            },
+        )
+else:
+    g1, g2, g3 = st.columns(3)
+    lo = g1.number_input(t("rate_from", "Zins von %"), value=1.0, step=0.5)
+    hi = g2.number_input(t("rate_to", "bis %"), value=7.0, step=0.5)
+    step = g3.number_input(t("rate_step", "Schritt"), min_value=0.05, value=0.5, step=0.05)
+    rates = tuple(np.round(np.arange(lo, hi + step / 2, step), 4))
+    res = grid(rates, within_years=within, horizon_years=horizon, repayment=repayment)
+    total = res.groupby("rate")[["payment", "debt"]].sum()
+    st.line_chart(res.pivot_table(index="rate", columns="property_name", values="payment"), use_container_width=True)
+    st.dataframe(total.round(0), use_container_width=True,
+                 column_config={"payment": st.column_config.NumberColumn(label=t("monthly_payment"), format="€ %.0f"),
+                                "debt": st.column_config.NumberColumn(label=t("debt", "Restschuld"), format="€ %.0f")})
@@ -2,10 +2,16 @@ from core.auth import require_login; _authctx = require_login()
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-import io
-from core.i18n import t
+import os
+import tempfile
+from core.i18n import translator; t = translator()
+from core import blobstore
+from core.export import EXPORT_DIR
 from core.db import get_engine
+from core.statements import (
+    load_statement_inputs, build_statement, build_statements, statement_labels, statement_filename,
+    render_xlsx, render_pdf, write_statements_zip, batch_statements_zip,
+)
 from sqlalchemy import text
 
 st.set_page_config(layout="wide")
@@ -16,15 +22,6 @@ engine = get_engine()
 # -----------------------------
 # Helpers
 # -----------------------------
-def find_logo_path():
-    for p in ["assets/logo.png", "logo.png", "assets/logo.jpg", "logo.jpg"]:
-        try:
-            Path(p).stat()
-            return p
-        except Exception:
-            pass
-    return None
-
 def df_properties():
     return pd.read_sql("SELECT id, name FROM properties ORDER BY id", engine)
 
@@ -50,51 +47,6 @@ def df_unit_persons(prop_id: int, year: int):
     sql = text("SELECT unit_id, persons FROM unit_persons WHERE property_id = :pid AND year = :yr")
     return pd.read_sql(sql, engine, params={"pid": prop_id, "yr": year}).set_index("unit_id") if year else pd.DataFrame()
 
-def consumption_by_unit(prop_id: int, year: int, kind: str):
-    """Compute consumption per unit for given property/year.
-    kind: 'water' or 'heat' (match meters.type case-insensitively).
-    Uses difference of readings around period.
-    """
-    meters = pd.read_sql(
-        text("""
-        SELECT m.id AS meter_id, m.unit_id, LOWER(m.type) AS mtype
-        FROM meters m
-        JOIN units u ON u.id = m.unit_id
-        WHERE u.property_id = :pid
-        """),
-        engine, params={"pid": prop_id}
-    )
-    if meters.empty:
-        return {}
-    def is_kind(s: str) -> bool:
-        s = s or ""
-        if kind == 'water':
-            return any(k in s for k in ['water','wasser','h2o'])
-        return any(k in s for k in ['heat','heiz','wärme','warm','therm'])
-    meters = meters[meters['mtype'].apply(is_kind)]
-    if meters.empty:
-        return {}
-
-    start = pd.Timestamp(year=year, month=1, day=1)
-    end = pd.Timestamp(year=year, month=12, day=31, hour=23, minute=59, second=59)
-
-    out: dict[int, float] = {}
-    for r in meters.itertuples(index=False):
-        mid = int(r.meter_id); uid = int(r.unit_id)
-        rd = pd.read_sql(text("SELECT read_date, value FROM meter_readings WHERE meter_id = :mid ORDER BY read_date"), engine, params={"mid": mid})
-        if rd.empty:
-            continue
-        rd['read_date'] = pd.to_datetime(rd['read_date'], errors='coerce')
-        # Value at (or before) start
-        before_start = rd[rd['read_date'] <= start]
-        v0 = float(before_start.iloc[-1]['value']) if not before_start.empty else float(rd.iloc[0]['value'])
-        # Value at (or before) end
-        before_end = rd[rd['read_date'] <= end]
-        v1 = float(before_end.iloc[-1]['value']) if not before_end.empty else float(rd.iloc[-1]['value'])
-        cons = max(0.0, v1 - v0)
-        out[uid] = out.get(uid, 0.0) + cons
-    return out
-
 # -----------------------------
 # Page scaffold
 # -----------------------------
@@ -132,14 +84,16 @@ with tab1:
     supplier = colh[0].text_input(t("supplier","Lieferant"))
     invoice = colh[1].text_input(t("invoice_no","Rechnungsnr."))
     description = colh[2].text_input(t("description","Beschreibung"))
+    document = st.file_uploader(t("oc_document","Beleg (optional)"), type=["pdf","png","jpg","jpeg"], key="oc_document")
 
     if st.button(t("save","Speichern"), type="primary"):
         code = cat_label.split(" — ")[0]
         unit_id = unit_map.get(unit_choice) if unit_choice in unit_map else None
+        document_path = blobstore.ref_for(blobstore.put_stream(document)[0]) if document is not None else None
         with engine.begin() as con:
             con.exec_driver_sql(
-                "INSERT INTO operating_costs (property_id, unit_id, date, period_start, period_end, category_code, amount_gross, vat_rate, supplier, invoice_no, description) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
-                (prop_id, unit_id, pd.to_datetime(date).date(), pd.to_datetime(period_start).date(), pd.to_datetime(period_end).date(), code, float(amount), float(vat_rate or 0.0), supplier or None, invoice or None, description or None)
+                "INSERT INTO operating_costs (property_id, unit_id, date, period_start, period_end, category_code, amount_gross, vat_rate, supplier, invoice_no, description, document_path) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                (prop_id, unit_id, pd.to_datetime(date).date(), pd.to_datetime(period_start).date(), pd.to_datetime(period_end).date(), code, float(amount), float(vat_rate or 0.0), supplier or None, invoice or None, description or None, document_path)
             )
         st.success(t("saved","Gespeichert."))
         st.rerun()
@@ -148,6 +102,14 @@ with tab1:
     costs = df_costs(prop_id)
     if not costs.empty:
         st.dataframe(costs, use_container_width=True, hide_index=True)
+        with_doc = costs[costs["document_path"].notna()]
+        if not with_doc.empty:
+            doc_labels = {f"#{int(r.id)} — {r.date} {r.supplier or ''} {r.invoice_no or ''}".strip(): r.document_path for r in with_doc.itertuples(index=False)}
+            doc_choice = st.selectbox(t("oc_document_open","Beleg öffnen"), list(doc_labels))
+            doc = blobstore.get_bytes(blobstore.sha_from_ref(doc_labels[doc_choice]))
+            if doc:
+                ext = "pdf" if doc[:4] == b"%PDF" else ("png" if doc[:4] == b"\x89PNG" else "jpg")
+                st.download_button(t("download","Herunterladen"), data=doc, file_name=f"beleg_{doc_choice.split(' ')[0].lstrip('#')}.{ext}", key="oc_document_dl")
     else:
         st.caption(t("not_available","Noch keine Daten vorhanden."))
 
@@ -189,79 +151,15 @@ with tab3:
     st.subheader(t("oc_statement","Abrechnungsvorschau"))
     y = st.selectbox(t("year","Jahr"), list(range(pd.Timestamp.today().year-2, pd.Timestamp.today().year+1)), index=2, key="year_stmt")
 
-    units_df = df_units(prop_id)
+    # Kosten einmal verteilen: Vorschau, Einzel- und Stapelabrechnung nutzen dieselbe Anteilsmatrix
+    inputs = load_statement_inputs(prop_id, int(y))
+    units_df = inputs.units
     if units_df.empty:
         st.info(t("no_units","Noch keine Wohnungen vorhanden."))
         st.stop()
+    labels = statement_labels(t)
 
-    total_area = units_df["living_area_sqm"].fillna(0).sum()
-    up = df_unit_persons(prop_id, int(y))
-    persons_map = up["persons"].to_dict() if not up.empty else {}
-    settings = df_settings(prop_id)
-    persons_sum = sum(persons_map.values()) or len(units_df) * settings.get("persons_default",2)
-
-    # Kosten im Jahr
-    q = text("""
-        SELECT id, category_code, unit_id, amount_gross, COALESCE(vat_rate,0) AS vat_rate
-        FROM operating_costs
-        WHERE property_id = :pid AND strftime('%Y', date) = :yr
-        """ )
-    costs = pd.read_sql(q, engine, params={"pid": prop_id, "yr": str(y)})
-
-    cats = df_categories().set_index("code")
-    result = pd.DataFrame(index=units_df["id"], columns=["sum"], data=0.0)
-
-    def add_amount_for_units(df, amount_map):
-        for uid, val in amount_map.items():
-            df.loc[uid, "sum"] = df.loc[uid, "sum"] + float(val)
-
-    # Aggregierte Verteilung für Vorschau
-    for rowc in costs.itertuples(index=False):
-        code = rowc.category_code
-        alloc = cats.loc[code, "allocation_method"] if code in cats.index else "UNITS"
-        amt = float(rowc.amount_gross)
-        if rowc.unit_id:
-            add_amount_for_units(result, {int(rowc.unit_id): amt})
-            continue
-        shares = {}
-        if alloc == "AREA" and total_area > 0:
-            for r in units_df.itertuples(index=False):
-                shares[int(r.id)] = (float(r.living_area_sqm or 0)/total_area) * amt
-        elif alloc == "UNITS":
-            per = amt / len(units_df); shares = {int(r.id): per for r in units_df.itertuples(index=False)}
-        elif alloc == "PERSONS":
-            total_persons = persons_sum or len(units_df)
-            for r in units_df.itertuples(index=False):
-                p = persons_map.get(int(r.id), settings.get("persons_default",2))
-                shares[int(r.id)] = (p/total_persons) * amt
-        elif alloc == "WATER_M3":
-            water_cons = consumption_by_unit(prop_id, int(y), 'water')
-            totalw = sum(water_cons.values())
-            if totalw > 0:
-                for r in units_df.itertuples(index=False):
-                    shares[int(r.id)] = (float(water_cons.get(int(r.id),0.0))/totalw) * amt
-            else:
-                fb = settings.get("water_allocation_fallback","PERSONS")
-                if fb == "UNITS":
-                    per = amt / len(units_df); shares = {int(r.id): per for r in units_df.itertuples(index=False)}
-                else:
-                    total_persons = persons_sum or len(units_df)
-                    for r in units_df.itertuples(index=False):
-                        p = persons_map.get(int(r.id), settings.get("persons_default",2))
-                        shares[int(r.id)] = (p/total_persons) * amt
-        elif alloc == "HEAT_SPLIT_70_30":
-            ratio = int(settings.get("heat_ratio_consumption",70))
-            cons_ratio = ratio/100.0; base_ratio = 1.0 - cons_ratio
-            heat_cons = consumption_by_unit(prop_id, int(y), 'heat')
-            totalh = sum(heat_cons.values())
-            for r in units_df.itertuples(index=False):
-                area_share = (float(r.living_area_sqm or 0)/total_area) if total_area>0 else 1.0/len(units_df)
-                cons_share = (float(heat_cons.get(int(r.id),0.0))/totalh) if totalh>0 else area_share
-                shares[int(r.id)] = amt * (cons_ratio*cons_share + base_ratio*area_share)
-        else:
-            per = amt / len(units_df); shares = {int(r.id): per for r in units_df.itertuples(index=False)}
-        add_amount_for_units(result, shares)
-
+    result = inputs.allocation.totals().to_frame()
     out = units_df[["id","unit_label","living_area_sqm"]].copy()
     out = out.merge(result, left_on="id", right_index=True, how="left")
     out = out.rename(columns={"unit_label": t("unit_label","Wohnung"), "living_area_sqm": t("living_area_sqm","Wohnfläche (m²)"), "sum": t("total","Summe (€)")})
@@ -273,252 +171,55 @@ with tab3:
     # -----------------------------
     st.markdown("#### " + t("oc_statement_single", "Abrechnung für eine Mietpartei"))
 
-    q_lease = text("""
-        SELECT l.id AS lease_id, u.id AS unit_id, u.unit_label, COALESCE(t.full_name,'') AS tenant
-        FROM leases l
-        JOIN units u ON u.id = l.unit_id
-        LEFT JOIN tenants t ON t.id = l.tenant_id
-        WHERE u.property_id = :pid
-          AND (strftime('%Y', l.start_date) <= :yr)
-          AND (l.end_date IS NULL OR strftime('%Y', l.end_date) >= :yr)
-        ORDER BY u.id
-        """ )
-    leases_df = pd.read_sql(q_lease, engine, params={"pid": prop_id, "yr": str(y)})
+    leases_df = inputs.leases
     if leases_df.empty:
         st.info(t("no_leases","Keine Mietverhältnisse im gewählten Jahr."))
     else:
-        leases_df["label"] = leases_df.apply(lambda r: f"{r['unit_label']} — {r['tenant'] or 'o.V.'} (Lease #{int(r['lease_id'])})", axis=1)
+        leases_df = leases_df.assign(label=[f"{u} — {tn or 'o.V.'} (Lease #{int(l)})" for u, tn, l in zip(leases_df["unit_label"], leases_df["tenant"], leases_df["lease_id"])])
         choice = st.selectbox(t("choose_party","Mietpartei wählen"), leases_df["label"].tolist())
         sel = leases_df[leases_df["label"]==choice].iloc[0]
-        my_unit = int(sel["unit_id"])
-
-        # Detailierte Verteilung je Originalrechnung inkl. USt
-        base_costs = costs  # already filtered property/year
-        detail_rows = []
-        for rpos in base_costs.itertuples(index=False):
-            code = rpos.category_code
-            alloc = cats.loc[code, "allocation_method"] if code in cats.index else "UNITS"
-            amt = float(rpos.amount_gross)
-            vat_rate = float(getattr(rpos, 'vat_rate', 0.0) or 0.0)
-            if rpos.unit_id:
-                detail_rows.append((int(rpos.unit_id), code, amt, vat_rate))
-                continue
-            shares = {}
-            if alloc == "AREA" and total_area > 0:
-                for u in units_df.itertuples(index=False):
-                    shares[int(u.id)] = (float(u.living_area_sqm or 0)/total_area) * amt
-            elif alloc == "UNITS":
-                per = amt / len(units_df); shares = {int(u.id): per for u in units_df.itertuples(index=False)}
-            elif alloc == "PERSONS":
-                total_persons = persons_sum or len(units_df)
-                for u in units_df.itertuples(index=False):
-                    p = persons_map.get(int(u.id), settings.get("persons_default",2))
-                    shares[int(u.id)] = (p/total_persons) * amt
-            elif alloc == "WATER_M3":
-                water_cons = consumption_by_unit(prop_id, int(y), 'water')
-                totalw = sum(water_cons.values())
-                if totalw > 0:
-                    for u in units_df.itertuples(index=False):
-                        shares[int(u.id)] = (float(water_cons.get(int(u.id),0.0))/totalw) * amt
-                else:
-                    fb = settings.get("water_allocation_fallback","PERSONS")
-                    if fb == "UNITS":
-                        per = amt / len(units_df); shares = {int(u.id): per for u in units_df.itertuples(index=False)}
-                    else:
-                        total_persons = persons_sum or len(units_df)
-                        for u in units_df.itertuples(index=False):
-                            p = persons_map.get(int(u.id), settings.get("persons_default",2))
-                            shares[int(u.id)] = (p/total_persons) * amt
-            elif alloc == "HEAT_SPLIT_70_30":
-                ratio = int(settings.get("heat_ratio_consumption",70))
-                cons_ratio = ratio/100.0; base_ratio = 1.0 - cons_ratio
-                heat_cons = consumption_by_unit(prop_id, int(y), 'heat')
-                totalh = sum(heat_cons.values())
-                for u in units_df.itertuples(index=False):
-                    area_share = (float(u.living_area_sqm or 0)/total_area) if total_area>0 else 1.0/len(units_df)
-                    cons_share = (float(heat_cons.get(int(u.id),0.0))/totalh) if totalh>0 else area_share
-                    shares[int(u.id)] = amt * (cons_ratio*cons_share + base_ratio*area_share)
-            else:
-                per = amt / len(units_df); shares = {int(u.id): per for u in units_df.itertuples(index=False)}
-            for uid, val in shares.items():
-                detail_rows.append((uid, code, float(val), vat_rate))
-
-        detail_full = pd.DataFrame(detail_rows, columns=["unit_id","category","gross","vat_rate"])
-        my_details = detail_full[detail_full["unit_id"]==my_unit].copy()
-        my_details["net"] = my_details.apply(lambda r: (r["gross"]/(1+r["vat_rate"]/100.0) if r["vat_rate"] else r["gross"]), axis=1)
-        my_details["vat_amount"] = my_details["gross"] - my_details["net"]
-
-        # Heizung vs NK (nutze is_heating-Flag)
-        cat_meta = cats[["is_heating"]].copy()
-        def block_for(cat):
-            try:
-                return "Heizung" if bool(cat_meta.loc[cat, "is_heating"]) else "Betriebskosten"
-            except Exception:
-                return "Betriebskosten"
-        my_details["block"] = my_details["category"].apply(block_for)
-        sum_by_block = my_details.groupby("block")[ ["net","vat_amount","gross"] ].sum().round(2)
-
-        # Vorauszahlungen (Payments NK/Heizung)
-        q_adv = text("SELECT COALESCE(SUM(amount),0) AS s FROM payments WHERE lease_id = :lid AND strftime('%Y', pay_date) = :yr AND category IN ('NK','Heizung')")
-        adv = float(pd.read_sql(q_adv, engine, params={"lid": int(sel["lease_id"]), "yr": str(y)})["s"].iloc[0] or 0.0)
-        total_bk = float(my_details["gross"].sum())
-        saldo = total_bk - adv
-
-        # Info-DF
-        info = pd.DataFrame([{
-            t("property","Objekt"): prop_choice,
-            t("unit_label","Wohnung"): sel["unit_label"],
-            t("tenant","Mieter"): sel["tenant"] or "",
-            t("year","Jahr"): int(y),
-            t("total_costs","Umlagefähige Kosten (€)"): round(total_bk,2),
-            t("advances","Vorauszahlungen (€)"): round(adv,2),
-            t("balance","Saldo (€)"): round(saldo,2)
-        }])
-
-        # Excel-Export mit Layout
-        fname = f"BKA_{y}_{sel['unit_label']}.xlsx".replace(" ", "_")
-        data = None; mime = None
-        try:
-            import xlsxwriter
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-                # Sheet Abrechnung
-                wb = writer.book
-                ws = wb.add_worksheet("Abrechnung")
-                writer.sheets["Abrechnung"] = ws
-
-                # Formats
-                fmt_title = wb.add_format({"bold": True, "font_size": 14})
-                fmt_bold = wb.add_format({"bold": True})
-                fmt_cur = wb.add_format({"num_format": '#,##0.00" €"'})
-                fmt_small = wb.add_format({"font_size": 9, "italic": True, "align": "right"})
-
-                # Logo
-                logo = find_logo_path()
-                if logo:
-                    try:
-                        ws.insert_image(0, 0, logo, {"x_scale": 0.5, "y_scale": 0.5})
-                    except Exception:
-                        pass
-
-                ws.write(0, 3, t("operating_costs_statement","Betriebskostenabrechnung"), fmt_title)
-                ws.write(2, 0, t("property","Objekt"), fmt_bold); ws.write(2, 1, str(prop_choice))
-                ws.write(3, 0, t("unit_label","Wohnung"), fmt_bold); ws.write(3, 1, str(sel["unit_label"]))
-                ws.write(4, 0, t("tenant","Mieter"), fmt_bold); ws.write(4, 1, str(sel["tenant"] or ""))
-                ws.write(5, 0, t("year","Jahr"), fmt_bold); ws.write(5, 1, int(y))
-
-                ws.write(7, 0, "Betriebskosten", fmt_bold)
-                ws.write(7, 1, float(sum_by_block.loc["Betriebskosten","net"]) if "Betriebskosten" in sum_by_block.index else 0.0, fmt_cur)
-                ws.write(7, 2, float(sum_by_block.loc["Betriebskosten","vat_amount"]) if "Betriebskosten" in sum_by_block.index else 0.0, fmt_cur)
-                ws.write(7, 3, float(sum_by_block.loc["Betriebskosten","gross"]) if "Betriebskosten" in sum_by_block.index else 0.0, fmt_cur)
-
-                ws.write(8, 0, "Heizung", fmt_bold)
-                ws.write(8, 1, float(sum_by_block.loc["Heizung","net"]) if "Heizung" in sum_by_block.index else 0.0, fmt_cur)
-                ws.write(8, 2, float(sum_by_block.loc["Heizung","vat_amount"]) if "Heizung" in sum_by_block.index else 0.0, fmt_cur)
-                ws.write(8, 3, float(sum_by_block.loc["Heizung","gross"]) if "Heizung" in sum_by_block.index else 0.0, fmt_cur)
-
-                ws.write(10, 0, t("total_costs","Umlagefähige Kosten (€)"), fmt_bold); ws.write(10, 1, float(total_bk), fmt_cur)
-                ws.write(11, 0, t("advances","Vorauszahlungen (€)"), fmt_bold); ws.write(11, 1, float(adv), fmt_cur)
-                ws.write(12, 0, t("balance","Saldo (€)"), fmt_bold); ws.write(12, 1, float(saldo), fmt_cur)
-
-                ws.set_column(0, 0, 28); ws.set_column(1, 3, 20)
-                ws.set_footer("&R" + t("footer_company","Erstellt mit Immobilien-Manager"))
-
-                # Sheet Details
-                det = my_details.groupby("category")[ ["net","vat_amount","gross"] ].sum().reset_index().round(2)
-                det = det.rename(columns={"category": t("category","Kategorie"), "net": t("net","Netto (€)"), "vat_amount": t("vat","USt (€)"), "gross": t("gross","Brutto (€)")})
-                det.to_excel(writer, sheet_name="Details", index=False)
-                ws2 = writer.sheets["Details"]; ws2.set_column(0, 0, 28); ws2.set_column(1, 3, 18)
-
-            data = buf.getvalue(); mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        except Exception:
-            # Fallback CSV
-            buf = io.StringIO()
-            info.to_csv(buf, index=False); buf.write("\n"); 
-            my_details.groupby("category")[ ["net","vat_amount","gross"] ].sum().reset_index().to_csv(buf, index=False)
-            data = buf.getvalue().encode("utf-8"); mime = "text/csv"; fname = f"BKA_{y}_{sel['unit_label']}.csv".replace(" ", "_")
+        stmt = build_statement(inputs, sel.to_dict())
 
+        data, fname, mime = render_xlsx(stmt, labels)
         st.download_button(t("download_statement","Abrechnung herunterladen"), data=data, file_name=fname, mime=mime)
 
-        # PDF Export (ReportLab -> fallback WeasyPrint -> else Hinweis)
-        pdf_bytes = None
-        try:
-            from reportlab.lib.pagesizes import A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.units import mm
-            from reportlab.lib.utils import ImageReader
-
-            bufp = io.BytesIO()
-            c = canvas.Canvas(bufp, pagesize=A4)
-            w, h = A4
-
-            # Logo
-            logo = find_logo_path()
-            if logo:
-                try:
-                    c.drawImage(ImageReader(logo), 15*mm, h-30*mm, width=30*mm, preserveAspectRatio=True, mask='auto')
-                except Exception:
-                    pass
-
-            # Header
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(60*mm, h-20*mm, t("operating_costs_statement","Betriebskostenabrechnung"))
-            c.setFont("Helvetica", 10)
-            c.drawString(15*mm, h-40*mm, f"{t('property','Objekt')}: {prop_choice}")
-            c.drawString(15*mm, h-46*mm, f"{t('unit_label','Wohnung')}: {sel['unit_label']}")
-            c.drawString(15*mm, h-52*mm, f"{t('tenant','Mieter')}: {sel['tenant'] or ''}")
-            c.drawString(15*mm, h-58*mm, f"{t('year','Jahr')}: {int(y)}")
-
-            ycur = h-70*mm
-            def line(lbl, val):
-                nonlocal ycur
-                c.setFont("Helvetica-Bold", 10); c.drawString(15*mm, ycur, lbl)
-                c.setFont("Helvetica", 10); c.drawRightString(180*mm, ycur, f"{val:,.2f} €".replace(',', 'X').replace('.', ',').replace('X','.'))
-                ycur -= 6*mm
-
-            bk_net = float(sum_by_block.loc["Betriebskosten","net"]) if "Betriebskosten" in sum_by_block.index else 0.0
-            bk_vat = float(sum_by_block.loc["Betriebskosten","vat_amount"]) if "Betriebskosten" in sum_by_block.index else 0.0
-            bk_gro = float(sum_by_block.loc["Betriebskosten","gross"]) if "Betriebskosten" in sum_by_block.index else 0.0
-            hz_net = float(sum_by_block.loc["Heizung","net"]) if "Heizung" in sum_by_block.index else 0.0
-            hz_vat = float(sum_by_block.loc["Heizung","vat_amount"]) if "Heizung" in sum_by_block.index else 0.0
-            hz_gro = float(sum_by_block.loc["Heizung","gross"]) if "Heizung" in sum_by_block.index else 0.0
-
-            line("Betriebskosten (Netto)", bk_net)
-            line("Betriebskosten (USt)", bk_vat)
-            line("Betriebskosten (Brutto)", bk_gro)
-            line("Heizung (Netto)", hz_net)
-            line("Heizung (USt)", hz_vat)
-            line("Heizung (Brutto)", hz_gro)
-            line(t("advances","Vorauszahlungen (€)"), adv)
-            line(t("balance","Saldo (€)"), saldo)
-
-            c.setFont("Helvetica-Oblique", 8)
-            c.drawRightString(200*mm, 10*mm, t("footer_company","Erstellt mit Immobilien-Manager"))
-            c.showPage(); c.save()
-            pdf_bytes = bufp.getvalue()
-        except Exception:
-            try:
-                from weasyprint import HTML
-                html = f"""
-                <h2>{t('operating_costs_statement','Betriebskostenabrechnung')}</h2>
-                <p><b>{t('property','Objekt')}:</b> {prop_choice}<br/>
-                <b>{t('unit_label','Wohnung')}:</b> {sel['unit_label']}<br/>
-                <b>{t('tenant','Mieter')}:</b> {sel['tenant'] or ''}<br/>
-                <b>{t('year','Jahr')}:</b> {int(y)}</p>
-                <table border='1' cellspacing='0' cellpadding='4'>
-                <tr><th>Block</th><th>Netto (€)</th><th>USt (€)</th><th>Brutto (€)</th></tr>
-                <tr><td>Betriebskosten</td><td>{sum_by_block.get('net',{}).get('Betriebskosten',0):.2f}</td><td>{sum_by_block.get('vat_amount',{}).get('Betriebskosten',0):.2f}</td><td>{sum_by_block.get('gross',{}).get('Betriebskosten',0):.2f}</td></tr>
-                <tr><td>Heizung</td><td>{sum_by_block.get('net',{}).get('Heizung',0):.2f}</td><td>{sum_by_block.get('vat_amount',{}).get('Heizung',0):.2f}</td><td>{sum_by_block.get('gross',{}).get('Heizung',0):.2f}</td></tr>
-                </table>
-                <p><b>{t('advances','Vorauszahlungen (€)')}:</b> {adv:.2f}<br/>
-                <b>{t('balance','Saldo (€)')}:</b> {saldo:.2f}</p>
-                """
-                pdf_bytes = HTML(string=html).write_pdf()
-            except Exception:
-                pdf_bytes = None
-
+        pdf_bytes = render_pdf(stmt, labels)
         if pdf_bytes:
-            st.download_button(t("download_pdf","PDF herunterladen"), data=pdf_bytes, file_name=f"BKA_{y}_{sel['unit_label']}.pdf".replace(" ", "_"), mime="application/pdf")
+            st.download_button(t("download_pdf","PDF herunterladen"), data=pdf_bytes, file_name=statement_filename(stmt, "pdf"), mime="application/pdf")
         else:
             st.caption(t("pdf_unavailable","PDF-Erzeugung nicht verfügbar. Bitte 'reportlab' oder 'weasyprint' installieren."))
 
+    # -----------------------------
+    # Stapelabrechnung (alle Mietparteien) als ZIP
+    # -----------------------------
+    st.markdown("#### " + t("oc_statement_batch", "Alle Abrechnungen als ZIP"))
+    scope = st.radio(t("oc_batch_scope", "Umfang"), [t("oc_batch_this_property", "Gewähltes Objekt"), t("oc_batch_all_properties", "Alle Objekte")], horizontal=True, key="batch_scope")
+    single = scope == t("oc_batch_this_property", "Gewähltes Objekt")
+    zip_key = (int(y), "objekt", int(prop_id)) if single else (int(y), "alle", None)
+    if st.button(t("oc_batch_create", "ZIP erstellen"), key="batch_zip"):
+        bar = st.progress(0.0, text=t("oc_batch_progress", "Abrechnungen werden erstellt …"))
+        def _progress(done, total):
+            bar.progress(done / total if total else 1.0, text=f"{done}/{total}")
+        skipped = []    # Wohnungen mit sich überschneidenden Verträgen: nicht doppelt abrechnen
+        # ZIP auf Platte statt im Speicher/Session-State; wie core.export erst fertig umbenennen
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        target = EXPORT_DIR / (f"BKA_{int(y)}_objekt-{int(prop_id)}.zip" if single else f"BKA_{int(y)}_alle-objekte.zip")
+        fd, tmp = tempfile.mkstemp(dir=EXPORT_DIR, prefix=".bka-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                if single:
+                    n = write_statements_zip(fh, build_statements(inputs, skipped), labels, progress=_progress)
+                else:
+                    n = batch_statements_zip(fh, int(y), labels=labels, progress=_progress, skipped=skipped)
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        bar.progress(1.0, text=f"{n}/{n}")
+        st.session_state["batch_zip_path"] = (zip_key, target, skipped)
+    zip_entry = st.session_state.get("batch_zip_path")
+    if zip_entry and zip_entry[0] == zip_key and zip_entry[1].exists():
+        if zip_entry[2]:
+            st.warning(t("oc_batch_skipped", "Übersprungen (Mietverträge überschneiden sich):") + " " + ", ".join(zip_entry[2]))
+        st.download_button(t("download_zip", "ZIP herunterladen"), data=lambda p=zip_entry[1]: p.open("rb"),
+                           file_name=zip_entry[1].name, mime="application/zip", key="batch_zip_dl")
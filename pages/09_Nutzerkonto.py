@@ -2,22 +2,14 @@ from core.auth import require_login; _authctx = require_login()
 import re
 import streamlit as st
 from sqlalchemy import select
-from core.db import SessionCtx, UserProfile, get_engine
-from core.i18n import t
+from core import blobstore, thumbnails
+from core.db import SessionCtx, UserProfile
+from core.queries import profile_avatar
+from core.i18n import translator; t = translator()
 
 st.header(t("user_account"))
 st.subheader(t("edit_profile"))
 
-# --- Tabelle/Spalte sicherstellen (idempotent) ---
-eng = get_engine()
-# Tabelle anlegen, falls sie fehlt
-UserProfile.__table__.create(bind=eng, checkfirst=True)
-# Spalte 'avatar' nachziehen, falls alte DB
-with eng.connect() as conn:
-    cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info(user_profile)").fetchall()]
-    if "avatar" not in cols:
-        conn.exec_driver_sql("ALTER TABLE user_profile ADD COLUMN avatar BLOB")
-
 # 1) Profil laden oder anlegen
 with SessionCtx() as s:
     profile = s.execute(select(UserProfile).limit(1)).scalars().first()
@@ -29,10 +21,11 @@ with SessionCtx() as s:
 # --- Avatar-Anzeige / Upload ---
 st.markdown("### " + t("avatar"))
 
+avatar = profile.avatar_sha256
 col_preview, col_actions = st.columns([1, 2])
 with col_preview:
-    if profile.avatar:
-        st.image(profile.avatar, caption="", use_container_width=False)
+    if avatar:
+        st.image(thumbnails.thumbnail(avatar, thumbnails.AVATAR_PX) or profile_avatar(profile.id), caption="", use_container_width=False)
     else:
         st.caption("—")
 
@@ -43,14 +36,15 @@ with col_actions:
         save_avatar = st.form_submit_button(t("save"))
     if save_avatar:
         if uploaded:
-            data = uploaded.read()
             # Minimaler Check auf Bild-Signatur (optional)
-            if len(data) < 10:
+            if uploaded.size < 10:
                 st.error(t("invalid_image"))
             else:
+                sha, size = blobstore.put_stream(uploaded)
+                thumbnails.ensure_thumbnail(sha, thumbnails.AVATAR_PX)
                 with SessionCtx() as s:
                     p = s.get(UserProfile, profile.id)
-                    p.avatar = data
+                    p.avatar_sha256, p.avatar_size = sha, size
                     s.add(p); s.commit()
                 st.success(t("photo_saved"))
                 st.rerun()
@@ -58,10 +52,10 @@ with col_actions:
             st.info(t("invalid_image"))
 
     # Entfernen
-    if profile.avatar and st.button(t("remove_photo"), type="secondary"):
+    if avatar and st.button(t("remove_photo"), type="secondary"):
         with SessionCtx() as s:
             p = s.get(UserProfile, profile.id)
-            p.avatar = None
+            p.avatar_sha256, p.avatar_size = None, None
             s.add(p); s.commit()
         st.success(t("photo_removed"))
         st.rerun()
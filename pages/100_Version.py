@@ -1,12 +1,15 @@
 from core.auth import require_login; _authctx = require_login()
 import streamlit as st
 import pandas as pd
-from core.i18n import t
+from core.i18n import translator; t = translator()
+from core.db import effective_settings
 
 st.header("Versionen")
 
 # Schlanker, sauberer Changelog (ältere Einträge wurden konsolidiert)
-HISTORY = [\n    {"version": "5.1.7", "timestamp": "2025-10-03 21:38:21", "changes": "Fix: doppelter Logout-Button; README Auto-Update im Build."},\n    
+HISTORY = [
+    {"version": "5.1.7", "timestamp": "2025-10-03 21:38:21", "changes": "Fix: doppelter Logout-Button; README Auto-Update im Build."},
+
     {"version": "5.1.6", "timestamp": "2025-10-03 21:20:38", "changes": "CSS-Toggle: Sidebar-Navigation ausgeblendet bis Login."},
     
     {"version": "5.1.4", "timestamp": "2025-10-03 20:58:45", "changes": "Eigener Login (ohne streamlit-authenticator); Fehler behoben; Version sichtbar."},
@@ -49,3 +52,11 @@ df = df.sort_values(["timestamp","version"], ascending=[False, False]).reset_ind
 df = df.rename(columns={"version": t("version", "Version"), "timestamp": t("date", "Datum"), "changes": t("changes", "Änderungen")})
 
 st.dataframe(df, use_container_width=True, hide_index=True)
+
+# Wirksames SQLite-Verbindungsprofil (Pragmas je Verbindung + Pool)
+st.subheader(t("db_settings", "Datenbank-Verbindung"))
+settings = effective_settings()
+st.dataframe(
+    pd.DataFrame({t("setting", "Einstellung"): list(settings), t("value", "Wert"): [str(v) for v in settings.values()]}),
+    use_container_width=True, hide_index=True,
+)
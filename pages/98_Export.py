@@ -1,8 +1,9 @@
 from core.auth import require_login; _authctx = require_login()
 import streamlit as st
-from core.queries import export_excel
 import datetime as dt
-from core.i18n import t
+from core.export import FORMATS, current_job, start_export
+from core.journal import current_cursor
+from core.i18n import translator; t = translator()
 
 st.header(t("export"))
 
@@ -15,10 +16,42 @@ h3.page-head { margin-top:.2rem; margin-bottom:.4rem; }
 st.markdown(f"<h3 class='page-head'>{t('export')}</h3>", unsafe_allow_html=True)
 st.write(t("export_desc"))
 
-data = export_excel()
-st.download_button(
-    label=t("download_excel"),
-    data=data,
-    file_name=f"immobilien_export_{dt.date.today().isoformat()}.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-)
+labels = {"xlsx": "Excel (.xlsx)", "csv": "CSV (ZIP)", "parquet": "Parquet (ZIP)"}
+fmt = st.radio(t("format", "Format"), list(labels), format_func=labels.get, horizontal=True)
+
+cursor = current_cursor()
+since = None
+if st.checkbox(t("export_changes_only", "Nur Änderungen seit Cursor")):
+    since = int(st.number_input(t("since_cursor", "Cursor (aus dem letzten Export)"), min_value=0, value=0, step=1))
+st.caption(f"{t('journal_cursor', 'Aktueller Journal-Cursor')}: {cursor}")
+
+if st.button(t("start_export", "Export erstellen"), type="primary"):
+    start_export(fmt, since)
+
+
+job = current_job(fmt, since)
+if job is None:
+    st.caption(t("export_not_started", "Für den aktuellen Datenstand liegt noch kein Export vor."))
+elif job.running:
+    @st.fragment(run_every=1.0)
+    def _progress():
+        # nur dieser Abschnitt wird neu gezeichnet, bis der Auftrag fertig ist
+        if not job.running:
+            st.rerun()
+        st.progress(job.done / max(job.total, 1), text=f"{job.done}/{job.total} · {job.current}")
+    _progress()
+elif job.error:
+    st.error(job.error)
+else:
+    ext, mime = FORMATS[fmt]
+    st.download_button(
+        label=t("download_excel") if fmt == "xlsx" else t("download", "Herunterladen"),
+        data=lambda p=job.path: p.open("rb"),   # Datei wird erst beim Klick gelesen
+        file_name=(f"immobilien_export_{dt.date.today().isoformat()}.{ext}" if since is None
+                   else f"immobilien_aenderungen_{job.since}-{job.until}.{ext}"),
+        mime=mime,
+        key=f"dl_{fmt}",
+    )
+    st.caption(f"{job.path.stat().st_size / 1e6:,.1f} MB · {t('data_version', 'Datenstand')} {job.version}")
+    if job.until is not None:
+        st.info(f"{t('next_cursor', 'Cursor für den nächsten Änderungsexport')}: {job.until}")
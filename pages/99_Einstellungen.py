@@ -2,9 +2,10 @@ from core.auth import require_login; _authctx = require_login()
 import streamlit as st
 import datetime as dt
 from sqlalchemy import select, func
-from core.db import SessionCtx, Property, Unit, Tenant, Lease, Payment, MaintenanceTask
+from core.db import (SessionCtx, Property, Unit, Tenant, Lease, Payment, MaintenanceTask, Financing, UnitPhoto,
+                     Radiator, Meter, MeterReading, OperatingCost, PropertySetting, UnitPersons)
 from core.queries import reset_caches
-from core.i18n import t, set_lang, get_lang, LANGS
+from core.i18n import translator, set_lang, get_lang, LANGS; t = translator()
 
 st.header(t("settings"))
 
@@ -56,6 +57,9 @@ st.subheader("Datenbank zurücksetzen")
 st.warning("ACHTUNG: Löscht alle Daten unwiderruflich (Datei data.db bleibt, aber Tabellen werden geleert).")
 if st.button("Alles löschen"):
     with SessionCtx() as s:
-        s.query(Payment).delete(); s.query(Lease).delete(); s.query(Unit).delete()
-        s.query(MaintenanceTask).delete(); s.query(Tenant).delete(); s.query(Property).delete(); s.commit()
+        # Kind- vor Elterntabellen (foreign_keys=ON)
+        for model in (MeterReading, Meter, Radiator, UnitPhoto, Financing, OperatingCost, UnitPersons, PropertySetting,
+                      Payment, Lease, Unit, MaintenanceTask, Tenant, Property):
+            s.query(model).delete()
+        s.commit()
     reset_caches(); st.success("Alle Tabellen geleert.")
@@ -0,0 +1,115 @@
+# tools/bench_queries.py — Benchmark: ORM -> as_dict -> DataFrame vs. spaltenweiser Loader
+#
+# Aufruf (aus dem Repo-Wurzelverzeichnis):
+#   python tools/bench_queries.py [--payments 100000] [--leases 3000] [--repeat 3]
+#
+# Legt eine temporäre SQLite-Datenbank mit synthetischen Daten an; data.db bleibt unberührt.
+# Beispiel (Standardgrößen: 100k Zahlungen, 3k Verträge):
+#   Tabelle              ORM/as_dict    load_frame   Faktor
+#   payments                2574.0ms       460.4ms     5.6x
+#   units                     70.7ms        17.7ms     4.0x
+#   leases (joined)         1659.5ms        21.3ms    77.7x
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import select
+
+# core.db verwendet den relativen Pfad sqlite:///data.db -> in ein Temp-Verzeichnis wechseln,
+# bevor core importiert wird, damit die echte data.db nicht angefasst wird.
+os.chdir(tempfile.mkdtemp(prefix="immo_bench_"))
+
+import core.db as db  # noqa: E402
+
+
+def _seed(n_leases: int, n_payments: int) -> None:
+    eng = db.get_engine()
+    db.Base.metadata.create_all(eng)
+    rnd = random.Random(42)
+    n_props = max(1, n_leases // 40)
+    n_units = n_leases
+    base = dt.date(2020, 1, 1)
+    with eng.begin() as con:
+        con.exec_driver_sql("INSERT INTO properties (id, name) VALUES (?, ?)", [(i, f"Objekt {i}") for i in range(1, n_props + 1)])
+        con.exec_driver_sql(
+            "INSERT INTO units (id, property_id, unit_label, living_area_sqm, is_rented) VALUES (?,?,?,?,1)",
+            [(i, rnd.randint(1, n_props), f"Whg {i}", rnd.uniform(30, 120)) for i in range(1, n_units + 1)],
+        )
+        con.exec_driver_sql("INSERT INTO tenants (id, full_name) VALUES (?, ?)", [(i, f"Mieter {i}") for i in range(1, n_leases + 1)])
+        con.exec_driver_sql(
+            "INSERT INTO leases (id, unit_id, tenant_id, start_date, end_date, rent_cold, rent_warm) VALUES (?,?,?,?,?,?,?)",
+            [(i, i, i, (base + dt.timedelta(days=rnd.randint(0, 900))).isoformat(), None, 600.0, 780.0) for i in range(1, n_leases + 1)],
+        )
+        cats = ["Miete", "NK", "Kaution", "Sonstiges"]
+        con.exec_driver_sql(
+            "INSERT INTO payments (lease_id, pay_date, amount, category, note) VALUES (?,?,?,?,?)",
+            [(rnd.randint(1, n_leases), (base + dt.timedelta(days=rnd.randint(0, 1800))).isoformat(), 600.0, rnd.choice(cats), None)
+             for _ in range(n_payments)],
+        )
+
+
+def _orm_frame(model) -> pd.DataFrame:
+    """Bisheriger Weg: ORM-Instanzen -> as_dict() je Zeile -> DataFrame aus Liste von Dicts."""
+    with db.SessionCtx() as s:
+        rows = s.execute(select(model)).scalars().all()
+        return pd.DataFrame([r.as_dict() for r in rows])
+
+
+def _orm_leases() -> pd.DataFrame:
+    """Bisheriges df_leases mit Lazy-Loads je Beziehung (N+1)."""
+    with db.SessionCtx() as s:
+        rows = s.execute(select(db.Lease)).scalars().all()
+        data = []
+        for r in rows:
+            row = r.as_dict()
+            row["unit_label"] = r.unit.unit_label if r.unit else None
+            row["tenant_name"] = r.tenant.full_name if r.tenant else None
+            row["property_id"] = (r.unit.property.id if (r.unit and r.unit.property) else None)
+            row["property_name"] = (r.unit.property.name if (r.unit and r.unit.property) else None)
+            data.append(row)
+        return pd.DataFrame(data)
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--payments", type=int, default=100_000)
+    ap.add_argument("--leases", type=int, default=3_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    _seed(args.leases, args.payments)
+
+    # Ungecachte Loader (Query-Cache umgehen)
+    from core import queries as q
+    cases = [
+        ("payments", lambda: _orm_frame(db.Payment), q.df_payments.__wrapped__),
+        ("units", lambda: _orm_frame(db.Unit), q.df_units.__wrapped__),
+        ("leases (joined)", _orm_leases, q.df_leases.__wrapped__),
+    ]
+    print(f"{'Tabelle':<18}{'ORM/as_dict':>14}{'load_frame':>14}{'Faktor':>9}")
+    for name, old, new in cases:
+        t_old, t_new = _best(old, args.repeat), _best(new, args.repeat)
+        print(f"{name:<18}{t_old * 1000:>12.1f}ms{t_new * 1000:>12.1f}ms{t_old / t_new:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+# tools/bench_startpage.py — Messung: Rerun-Latenz der Startseite (app.py)
+#
+# Aufruf (aus dem Repo-Wurzelverzeichnis):
+#   python tools/bench_startpage.py [--reruns 20]
+#
+# Führt app.py per Streamlit-AppTest gegen eine temporäre SQLite-Datenbank aus (data.db bleibt
+# unberührt): erster Lauf (Migration + Admin-Bootstrap), Reruns abgemeldet und angemeldet.
+# "alt" ist der neue Rerun plus der frühere Bootstrap je Rerun
+# (ensure_admin_user(..., hash_password(...))), der vor dem Umbau bei jedem Rerun lief.
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# core.db verwendet den relativen Pfad sqlite:///data.db -> vorher ins Temp-Verzeichnis wechseln
+os.chdir(tempfile.mkdtemp(prefix="immo_bench_"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from core.auth import hash_password  # noqa: E402
+from core.db import ensure_admin_user, init_db  # noqa: E402
+
+
+def _runs(at: AppTest, n: int) -> list[float]:
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return times
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--reruns", type=int, default=20)
+    args = ap.parse_args()
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    t0 = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t0
+    logged_out = _runs(at, args.reruns)
+    at.session_state["auth"] = {"username": "hannes", "name": "hannes", "role": "admin"}
+    logged_in = _runs(at, args.reruns)
+
+    init_db()
+    legacy = []
+    for _ in range(max(3, args.reruns // 4)):
+        t0 = time.perf_counter()
+        ensure_admin_user("hannes", hash_password("hannes"), role="admin", email=None, full_name="hannes")
+        legacy.append(time.perf_counter() - t0)
+    old_cost = statistics.median(legacy)
+
+    print(f"Erster Lauf (Migration + Bootstrap): {first * 1000:8.1f}ms")
+    print(f"{'Rerun':<14}{'alt':>12}{'neu':>12}{'Faktor':>9}")
+    for name, times in (("abgemeldet", logged_out), ("angemeldet", logged_in)):
+        new = statistics.median(times)
+        print(f"{name:<14}{(new + old_cost) * 1000:10.1f}ms{new * 1000:10.1f}ms{(new + old_cost) / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# tools/i18n_check.py — Prüft Übersetzungsschlüssel: fehlende und unbenutzte Einträge
+#
+# Aufruf (aus dem Repo-Wurzelverzeichnis):
+#   python tools/i18n_check.py [--strict]
+#
+# Durchsucht app.py, pages/*.py und core/*.py per AST nach t("schlüssel", ...) und vergleicht
+# mit core/locales/<lang>.json:
+#   fehlend      Schlüssel ohne Eintrag in einer Sprache (Anzeige: en-Fallback, Default oder Schlüssel)
+#   unbenutzt    Katalogeinträge, die nirgends als t()-Literal vorkommen ("indirekt": als anderes
+#                String-Literal im Code, z. B. all_translations("cat_rent"))
+#   dynamisch    t()-Aufrufe ohne Literal als Schlüssel (nicht prüfbar)
+# Mit --strict Rückgabewert 1, wenn ein Schlüssel ohne Default in einer Sprache ganz fehlt.
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+LOCALE_DIR = ROOT / "core" / "locales"
+FALLBACK_LANG = "en"
+
+
+def source_files() -> list[Path]:
+    return [ROOT / "app.py", *sorted((ROOT / "pages").glob("*.py")), *sorted((ROOT / "core").glob("*.py"))]
+
+
+def scan(path: Path):
+    """(Schlüssel -> [(Zeile, hat Default)]), dynamische Aufrufzeilen, alle String-Literale."""
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    calls, dynamic, literals = defaultdict(list), [], set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            literals.add(node.value)
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "t" and node.args):
+            continue
+        key = node.args[0]
+        if isinstance(key, ast.Constant) and isinstance(key.value, str):
+            has_default = len(node.args) > 1 or any(kw.arg == "default" for kw in node.keywords)
+            calls[key.value].append((node.lineno, has_default))
+        else:
+            dynamic.append(node.lineno)
+    return calls, dynamic, literals
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--strict", action="store_true")
+    args = ap.parse_args()
+
+    catalogs = {p.stem: json.loads(p.read_text(encoding="utf-8")) for p in sorted(LOCALE_DIR.glob("*.json"))}
+    used: dict[str, list] = defaultdict(list)       # Schlüssel -> [(Datei, Zeile, Default)]
+    dynamic, literals = [], set()
+    for path in source_files():
+        calls, dyn, lits = scan(path)
+        rel = path.relative_to(ROOT)
+        for key, sites in calls.items():
+            used[key].extend((rel, line, has_default) for line, has_default in sites)
+        dynamic.extend((rel, line) for line in dyn)
+        literals |= lits
+
+    hard_missing = 0
+    print("== Fehlende Schlüssel")
+    for lang, cat in catalogs.items():
+        missing = sorted(k for k in used if k not in cat)
+        if not missing:
+            continue
+        print(f"[{lang}] {len(missing)}")
+        for key in missing:
+            sites = used[key]
+            if key in catalogs.get(FALLBACK_LANG, {}):
+                shown = f"{FALLBACK_LANG}-Fallback"
+            elif all(d for _, _, d in sites):
+                shown = "Default"
+            else:
+                shown = "SCHLÜSSEL"
+                hard_missing += 1
+            where = ", ".join(f"{f}:{line}" for f, line, _ in sites[:3]) + (" …" if len(sites) > 3 else "")
+            print(f"  {key:<32} {shown:<12} {where}")
+
+    print("\n== Unbenutzte Schlüssel")
+    all_keys = sorted(set().union(*catalogs.values())) if catalogs else []
+    unused = [k for k in all_keys if k not in used]
+    for key in unused:
+        print(f"  {key:<32} {'indirekt' if key in literals else ''}")
+    print(f"  ({len(unused)} von {len(all_keys)})")
+
+    if dynamic:
+        print(f"\n== Dynamische t()-Aufrufe: {len(dynamic)}")
+        for f, line in dynamic:
+            print(f"  {f}:{line}")
+    return 1 if args.strict and hard_missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())